@@ -0,0 +1,96 @@
+'''
+Offline connector benchmark.
+
+Runs each registered connector through the full litfetch pipeline against the local mock server
+(benchmarks/mock_server.py) and reports records per second, requests, connections opened, bytes
+transferred and peak memory. Nothing goes to the live services, so the numbers are repeatable on a
+machine with no network.
+Each connector runs twice in a scratch directory with an empty cache: once timed, once under
+tracemalloc for the peak memory.
+
+--years narrows the date window, the synthetic records cycle through 2005-2014.
+
+Usage: python benchmarks/bench_connectors.py [--records N] [--latency MS] [--error-rate P] [--years 2008-2010] [--fixtures DIR] [connector ...]
+'''
+
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import litfetch
+from mock_server import MockServer
+
+def benchConfig(server, cacheDir, years):
+    # Credentials are placeholders, the mock ignores them. The real rate limits would time the limiter,
+    # not the connector, so every host is opened up.
+    config = {'replay': server.url, 'cacheDir': cacheDir, 'sdKey': 'bench', 'springerKey': 'bench', 'maxRetries': '10'}
+    for connector in litfetch.connectors.values():
+        config['rate.'+connector.host] = '100000'
+    (config['startYear'], config['endYear']) = years.split('-')
+    return config
+
+def runOnce(name, server, records, years, traced):
+    # One run in a scratch directory, returns (seconds, records written, server stats, peak bytes)
+    with tempfile.TemporaryDirectory() as directory:
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            lf = litfetch.Litfetch(benchConfig(server, os.path.join(directory, 'cache'), years), interactive=False)
+            lf.searchLimit = records
+            # Retries are immediate, the injected failures come with Retry-After: 0
+            lf.http.backoff = 0
+
+            server.reset()
+            if traced:
+                tracemalloc.start()
+            start = time.perf_counter()
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                lf.runConnector(name)
+            elapsed = time.perf_counter()-start
+            peak = 0
+            if traced:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+            with open(litfetch.connectors[name].fileName, encoding='utf-8') as f:
+                written = sum(1 for line in f)-1
+        finally:
+            os.chdir(cwd)
+
+    return (elapsed, written, server.stats(), peak)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the litfetch connectors against the local mock server.')
+    parser.add_argument('connectors', nargs='*', help='connector names, all by default: '+', '.join(litfetch.connectors))
+    parser.add_argument('--records', type=int, default=1000, help='searchLimit for every connector')
+    parser.add_argument('--latency', type=float, default=0, help='milliseconds added to every response')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests answered with 503')
+    parser.add_argument('--years', default='2005-2014', help='date window, first-last')
+    parser.add_argument('--fixtures', help='directory of responses recorded with "record: <dir>"')
+    args = parser.parse_args()
+
+    names = args.connectors or list(litfetch.connectors)
+    unknown = [name for name in names if name not in litfetch.connectors]
+    if unknown:
+        parser.error('unknown connector(s): '+', '.join(unknown))
+
+    server = MockServer(args.fixtures, latency=args.latency/1000, errorRate=args.error_rate, total=max(args.records, 1)).start()
+    print('{:<14} {:>8} {:>10} {:>9} {:>12} {:>7} {:>11} {:>9}'.format('connector', 'records', 'records/s', 'requests', 'connections', 'errors', 'KB', 'peak MB'))
+    try:
+        for name in names:
+            (elapsed, written, stats, peak) = runOnce(name, server, args.records, args.years, False)
+            peak = runOnce(name, server, args.records, args.years, True)[3]
+            print('{:<14} {:>8} {:>10.0f} {:>9} {:>12} {:>7} {:>11.1f} {:>9.1f}'.format(
+                name, written, written/elapsed if elapsed else 0, stats['requests'], stats['connections'], stats['errors'], stats['bytes']/1024, peak/1024/1024))
+    finally:
+        server.stop()
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
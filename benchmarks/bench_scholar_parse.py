@@ -0,0 +1,89 @@
+'''
+Google Scholar page parsing benchmark.
+
+Times the original full-tree BeautifulSoup parse against the SoupStrainer and lxml XPath parsers in
+litfetch/sources.py over the saved result pages in benchmarks/fixtures, and checks all three return the same
+records.
+
+Usage: python benchmarks/bench_scholar_parse.py [repeats]
+'''
+
+import glob
+import os
+import re
+import sys
+import time
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import litfetch
+
+def parseFullSoup(body):
+    # The parser litfetch used before, building the whole page tree for every request
+    results = []
+    for paper in BeautifulSoup(body, "lxml").find_all("div", { "class" : "gs_ri" }):
+        paperTitle = '-'
+        paperAuthors = '-'
+        paperSource = '-'
+
+        for h3 in paper.find_all('h3'):
+            for title in h3.find_all('a', href=True):
+                paperTitle = title.text
+                paperSource = title['href']
+
+        for author in paper.find_all("div", { "class" : "gs_a" }):
+            paperAuthors = author.text
+
+        findYear = re.findall(r'.*([1-3][0-9]{3})', paperAuthors)
+        results.append((paperTitle, paperSource, paperAuthors, findYear[0] if findYear else '0000'))
+
+    return results
+
+def timeParser(parser, pages, repeats):
+    # Best of three runs, in milliseconds per page
+    best = None
+    for run in range(3):
+        start = time.perf_counter()
+        for i in range(repeats):
+            for body in pages:
+                parser(body)
+        elapsed = (time.perf_counter()-start)*1000/(repeats*len(pages))
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    fixtures = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'scholar-*.html')))
+    pages = []
+    for fixture in fixtures:
+        with open(fixture, 'rb') as f:
+            pages.append(f.read())
+
+    if not pages:
+        print('No Scholar fixtures found')
+        return 1
+
+    parsers = [
+        ('BeautifulSoup full tree', parseFullSoup),
+        ('BeautifulSoup SoupStrainer', litfetch.parseScholarPageSoup),
+        ('lxml XPath', litfetch.parseScholarPage),
+    ]
+
+    # Every parser has to find the same records
+    expected = [parseFullSoup(body) for body in pages]
+    for (name, parser) in parsers:
+        if [parser(body) for body in pages] != expected:
+            print(name+' returned different records')
+            return 1
+
+    print(str(len(pages))+' page(s), '+str(sum(len(records) for records in expected))+' results, '+str(repeats)+' repeats')
+    baseline = None
+    for (name, parser) in parsers:
+        elapsed = timeParser(parser, pages, repeats)
+        baseline = baseline or elapsed
+        print('{:<28} {:8.3f} ms/page {:6.1f}x'.format(name, elapsed, baseline/elapsed))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+'''
+Startup time benchmark.
+
+Imports litfetch in fresh interpreters, the way every batch worker and short-lived job starts, and reports the
+time the import took (best of the repeats, the interpreter's own startup is left out). Each
+case has a budget in milliseconds and a list of modules it must not load. Exits with 1 when a case is over
+its budget or loads one of them, so it can run as a check.
+
+Usage: python benchmarks/bench_startup.py [--repeats N] [--scale X]
+'''
+
+import argparse
+import os
+import subprocess
+import sys
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# (name, statement, budget in ms, modules that must stay unloaded)
+heavy = ['bs4', 'lxml', 'xml.etree.ElementTree', 'urllib.request', 'multiprocessing']
+# The single-file litfetch.py took about 230 ms to import, 100 of them in bs4
+cases = [
+    ('import litfetch', 'import litfetch', 10, heavy+['litfetch.app', 'litfetch.sources', 'sqlite3', 'asyncio']),
+    ('from litfetch import Litfetch', 'from litfetch import Litfetch', 200, heavy+['asyncio']),
+    ('from litfetch import Deduplicator', 'from litfetch import Deduplicator', 80, heavy+['litfetch.app', 'litfetch.sources', 'asyncio']),
+    ('command line parser', 'from litfetch.cli import main', 200, heavy+['asyncio']),
+]
+
+def importTime(statement, forbidden):
+    # Milliseconds the statement took in a fresh interpreter, and the forbidden modules it loaded
+    check = ('import sys, time\nstart = time.perf_counter()\n'+statement+'\nelapsed = time.perf_counter()-start\n'
+             'print(elapsed*1000)\nprint(",".join(name for name in '+repr(forbidden)+' if name in sys.modules))')
+    result = subprocess.run([sys.executable, '-c', check], cwd=root, capture_output=True, text=True, check=True)
+    (elapsed, loaded) = result.stdout.split('\n')[:2]
+    return (float(elapsed), [name for name in loaded.split(',') if name])
+
+def main():
+    parser = argparse.ArgumentParser(description='Time importing litfetch in fresh interpreters.')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--scale', type=float, default=1, help='multiply every budget, for slow machines')
+    args = parser.parse_args()
+
+    failed = False
+    print('{:<36} {:>9} {:>9}  {}'.format('case', 'ms', 'budget', 'loaded'))
+    for (name, statement, budget, forbidden) in cases:
+        runs = [importTime(statement, forbidden) for i in range(args.repeats)]
+        elapsed = min(run[0] for run in runs)
+        loaded = sorted(set(module for run in runs for module in run[1]))
+        over = elapsed > budget*args.scale or loaded
+        failed = failed or over
+        print('{:<36} {:>9.1f} {:>9.0f}  {}{}'.format(name, elapsed, budget*args.scale, ', '.join(loaded) or '-', '  OVER' if over else ''))
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,340 @@
+'''
+Local mock of the database APIs used by litfetch, for offline runs and benchmarks.
+
+Requests arrive in litfetch's replay form, <server>/<scheme>/<host>/<path>?<query>. A response recorded
+with "record: <dir>" in .config is served when there is one; otherwise a synthetic response is generated
+in the shape of the real API, so the connectors can be run with no recordings at all. The date filters each
+connector sends (Crossref pub-date, PubMed mindate/maxdate, Elsevier date, Springer year, arXiv submittedDate,
+Zenodo publication_date) are applied to the synthetic records, which cycle through 2005-2014. Latency and failed
+responses (503 with Retry-After) can be injected to exercise the retry path.
+
+Usage: python benchmarks/mock_server.py [--fixtures DIR] [--port 8765] [--latency MS] [--error-rate P]
+then set "replay: http://127.0.0.1:8765" in .config.
+'''
+
+import argparse
+import gzip
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from litfetch import FixtureStore
+
+scholarPage = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'scholar-results.html')
+
+# Synthetic records, the same for a given index on every run
+topics = ['activity prediction', 'behaviour forecasting', 'ambient intelligence', 'smart home sensing', 'routine learning', 'occupancy prediction']
+methods = ['hidden Markov models', 'recurrent neural networks', 'sequence mining', 'Bayesian networks', 'decision trees', 'reinforcement learning']
+surnames = ['Cook', 'Rashidi', 'Augusto', 'Nazerfard', 'Mozer', 'Riboni', 'Bettini', 'Holder', 'Aztiria', 'Chikhaoui']
+givenNames = ['Diane', 'Parisa', 'Juan', 'Ehsan', 'Michael', 'Daniele', 'Claudio', 'Lawrence', 'Asier', 'Belkacem']
+
+def syntheticRecord(index):
+    title = topics[index % len(topics)].capitalize()+' in smart environments using '+methods[(index//len(topics)) % len(methods)]+' ('+str(index)+')'
+    authors = [(surnames[(index+i) % len(surnames)], givenNames[(index+i) % len(givenNames)]) for i in range(1+index % 4)]
+    year = 2005+index % 10
+    date = str(year)+'-'+str(1+index % 12).zfill(2)+'-'+str(1+index % 28).zfill(2)
+    abstract = 'We study '+topics[index % len(topics)]+' with '+methods[(index//len(topics)) % len(methods)]+' on data from '+str(1+index % 9)+' homes.'
+    return {'index': index, 'title': title, 'authors': authors, 'year': year, 'date': date, 'doi': '10.5555/synthetic.'+str(index),
+            'abstract': abstract, 'venue': 'Journal of Synthetic Environments'}
+
+def syntheticReferences(index, total):
+    # A fixed citation graph over the synthetic records, 2 to 6 references each
+    return [(index*37+k*101+7) % total for k in range(2+index % 5)]
+
+def syntheticCitations(index, total):
+    return [(index*53+k*29+11) % total for k in range(index % 4)]
+
+class MockApi():
+    # Builds a synthetic response for a request, by host. total is the size of every result set.
+    def __init__(self, total=5000):
+        self.total = total
+
+    def respond(self, host, path, query):
+        # Returns (content type, body), or None for a request the mock does not know
+        handler = getattr(self, host.replace('.', '_').replace('-', '_'), None)
+        if handler is None:
+            return None
+        return handler(path, query)
+
+    def records(self, start, count, years=None):
+        # With a (first, last) window only the records published in those years, as the APIs filter on date
+        if years is None:
+            return [syntheticRecord(i) for i in range(start, min(self.total, start+count))]
+        return [syntheticRecord(i) for i in self.matching(years)[start:start+count]]
+
+    def matching(self, years):
+        # Indexes of the records in the window, the synthetic years cycle from 2005
+        return [i for i in range(self.total) if years[0] <= 2005+i % 10 <= years[1]]
+
+    def window(self, pattern, text):
+        # The (first, last) years of a date filter in the request, None without one
+        found = re.findall(pattern, text or '')
+        if not found:
+            return None
+        years = [int(year) for match in found for year in (match if isinstance(match, tuple) else (match,))]
+        return (min(years), max(years))
+
+    def jsonBody(self, data):
+        return ('application/json', json.dumps(data).encode('utf-8'))
+
+    def api_crossref_org(self, path, query):
+        # Cursor paging, the cursor is the offset of the next page. Enrichment lookups either filter on a list of
+        # DOIs or search one title with query.bibliographic, matched on the number ending every synthetic title.
+        start = int(query.get('cursor', '*').replace('*', '0'))
+        rows = int(query.get('rows', 20))
+        years = self.window(r'(?:from|until)-pub-date:(\d{4})', query.get('filter'))
+        total = len(self.matching(years)) if years else self.total
+        if query.get('filter', '').startswith('doi:'):
+            dois = [doi[4:] for doi in query['filter'].split(',') if doi.startswith('doi:')]
+            indexes = [int(doi.rsplit('.', 1)[1]) for doi in dois if doi.lower().startswith('10.5555/synthetic.')]
+            records = [syntheticRecord(index) for index in indexes if index < self.total]
+        elif 'query.bibliographic' in query:
+            found = re.search(r'\(?(\d+)\)?\s*$', query['query.bibliographic'])
+            records = [syntheticRecord(int(found.group(1)))] if found and int(found.group(1)) < self.total else []
+        else:
+            records = self.records(start, rows, years)
+
+        items = [{
+            'title': [record['title']],
+            'author': [{'family': family, 'given': given} for (family, given) in record['authors']],
+            'created': {'date-parts': [[record['year'], 1, 1]]},
+            'link': [{'URL': 'https://doi.org/'+record['doi']}],
+            'DOI': record['doi'],
+            'abstract': '<jats:p>'+record['abstract']+'</jats:p>',
+            'container-title': [record['venue']],
+            'reference': [{'key': 'ref'+str(i), 'DOI': '10.5555/synthetic.'+str(index)} for (i, index) in enumerate(syntheticReferences(record['index'], self.total))],
+        } for record in records]
+        return self.jsonBody({'status': 'ok', 'message': {'total-results': total, 'items': items, 'next-cursor': str(start+len(items))}})
+
+    def api_opencitations_net(self, path, query):
+        # Citations of one DOI, /index/v2/citations/doi:<doi>, the citing paper's identifiers in one string
+        found = re.search(r'/citations/doi:10\.5555/synthetic\.(\d+)$', urllib.parse.unquote(path).lower())
+        if not found or int(found.group(1)) >= self.total:
+            return self.jsonBody([])
+        cited = int(found.group(1))
+        return self.jsonBody([{
+            'oci': str(citing)+'-'+str(cited),
+            'citing': 'omid:br/06'+str(citing)+' doi:10.5555/synthetic.'+str(citing),
+            'cited': 'omid:br/06'+str(cited)+' doi:10.5555/synthetic.'+str(cited),
+            'creation': str(syntheticRecord(citing)['year']),
+        } for citing in syntheticCitations(cited, self.total)])
+
+    def eutils_ncbi_nlm_nih_gov(self, path, query):
+        # The publication date window is kept in the WebEnv for esummary
+        if path.endswith('esearch.fcgi'):
+            years = self.window(r'^(\d{4})', query.get('mindate')) if query.get('datetype') == 'pdat' else None
+            if years:
+                years = (years[0], int(query['maxdate'][:4]))
+            webEnv = 'MCID_synthetic'+('_'+str(years[0])+'_'+str(years[1]) if years else '')
+            return self.jsonBody({'esearchresult': {'count': str(len(self.matching(years)) if years else self.total), 'webenv': webEnv, 'querykey': '1'}})
+
+        start = int(query.get('retstart', 0))
+        records = self.records(start, int(query.get('retmax', 20)), self.window(r'_(\d{4})_(\d{4})$', query.get('WebEnv')))
+        result = {'uids': [str(10000000+record['index']) for record in records]}
+        for record in records:
+            result[str(10000000+record['index'])] = {
+                'uid': str(10000000+record['index']),
+                'title': record['title'],
+                'authors': [{'name': family+' '+given[0]} for (family, given) in record['authors']],
+                'pubdate': str(record['year'])+' Jan',
+                'articleids': [{'idtype': 'pubmed', 'value': str(10000000+record['index'])}, {'idtype': 'doi', 'value': record['doi']}],
+                'fulljournalname': record['venue'],
+            }
+        return self.jsonBody({'result': result})
+
+    def api_elsevier_com(self, path, query):
+        entries = [{
+            'dc:title': record['title'],
+            'authors': {'author': [{'surname': family, 'given-name': given} for (family, given) in record['authors']]},
+            'prism:coverDate': [{'$': record['date']}],
+            'link': [{'@href': 'https://api.elsevier.com/content/article/doi/'+record['doi']}],
+            'prism:doi': record['doi'],
+        } for record in self.records(0, int(query.get('count', 25)), self.window(r'^(\d{4})-(\d{4})$', query.get('date')))]
+        return self.jsonBody({'search-results': {'entry': entries}})
+
+    def api_springer_com(self, path, query):
+        records = [{
+            'title': record['title'],
+            'creators': [{'creator': family+', '+given} for (family, given) in record['authors']],
+            'publicationDate': record['date'],
+            'url': [{'value': 'http://dx.doi.org/'+record['doi']}],
+            'doi': record['doi'],
+        } for record in self.records(0, int(query.get('p', 10)), self.window(r'year:(\d{4})', query.get('q')))]
+        return self.jsonBody({'records': records})
+
+    def scholar_google_co_uk(self, path, query):
+        # Every page is the saved results page
+        with open(scholarPage, 'rb') as f:
+            return ('text/html', f.read())
+
+    def www_researchgate_net(self, path, query):
+        start = int(query.get('offset', 0))
+        items = [{
+            'title': record['title'],
+            'authors': [{'name': given+' '+family} for (family, given) in record['authors']],
+            'metaItems': [{'label': record['date']}],
+            'type': 'Article',
+            'urls': {'CTA': 'publication/'+str(record['index'])},
+        } for record in self.records(start, int(query.get('limit', 10)))]
+        return self.jsonBody({'result': {'searchSearch': {'publication': {'items': items}}}})
+
+    def export_arxiv_org(self, path, query):
+        start = int(query.get('start', 0))
+        years = self.window(r'submittedDate:\[(\d{4})\d* TO (\d{4})', query.get('search_query'))
+        entries = []
+        for record in self.records(start, int(query.get('max_results', 10)), years):
+            authors = ''.join('<author><name>'+escape(given+' '+family)+'</name></author>' for (family, given) in record['authors'])
+            entries.append('<entry><id>http://arxiv.org/abs/'+str(1000+record['index'])+'v1</id><published>'+record['date']+'T00:00:00Z</published>'
+                           '<title>'+escape(record['title'])+'</title><summary>'+escape(record['title'])+'.</summary>'+authors+'</entry>')
+        feed = ('<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">'
+                '<title>arXiv Query</title><opensearch:totalResults>'+str(len(self.matching(years)) if years else self.total)+'</opensearch:totalResults>'
+                '<opensearch:startIndex>'+str(start)+'</opensearch:startIndex>'+''.join(entries)+'</feed>')
+        return ('application/atom+xml', feed.encode('utf-8'))
+
+    def zenodo_org(self, path, query):
+        years = self.window(r'publication_date:\[(\d{4})\S* TO (\d{4})', query.get('q'))
+        hits = [{
+            'metadata': {
+                'title': record['title'],
+                'creators': [{'name': family+', '+given} for (family, given) in record['authors']],
+                'publication_date': record['date'],
+                'resource_type': {'subtype': 'article'},
+                'doi': record['doi'],
+                'description': '<p>'+record['abstract']+'</p>',
+            },
+            'links': {'html': 'https://zenodo.org/record/'+str(record['index'])},
+        } for record in self.records(0, int(query.get('size', 10)), years)]
+        return self.jsonBody({'hits': {'hits': hits, 'total': len(self.matching(years)) if years else self.total}})
+
+class MockServer():
+    # Threaded HTTP server in the background. stats() counts requests, injected errors and bytes sent.
+    def __init__(self, fixtures=None, port=0, latency=0, errorRate=0, total=5000, synthetic=True, seed=0):
+        self.fixtures = FixtureStore(fixtures) if fixtures else None
+        self.api = MockApi(total) if synthetic else None
+        self.latency = latency
+        self.errorRate = errorRate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+        mock = self
+        class Handler(BaseHTTPRequestHandler):
+            # Connections are kept alive, as the real APIs do. Headers and body go out as separate writes,
+            # which without TCP_NODELAY stall on delayed ACKs on a kept-alive connection.
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                mock.count(connections=1)
+
+            def do_GET(self):
+                mock.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.url = 'http://127.0.0.1:'+str(self.server.server_address[1])
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset(self):
+        with self.lock:
+            self.counts = {'requests': 0, 'errors': 0, 'bytes': 0, 'recorded': 0, 'synthetic': 0, 'missing': 0, 'connections': 0, 'compressed': 0}
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts)
+
+    def count(self, **counts):
+        with self.lock:
+            for (name, value) in counts.items():
+                self.counts[name] += value
+
+    def handle(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self.lock:
+            fail = self.random.random() < self.errorRate
+        if fail:
+            self.count(requests=1, errors=1)
+            self.send(request, 503, 'text/plain', b'Injected failure', {'Retry-After': '0'})
+            return
+
+        # /<scheme>/<host>/<path>?<query> back to the URL litfetch asked for
+        parts = urllib.parse.urlsplit(request.path)
+        (scheme, host, path) = (parts.path.lstrip('/').split('/', 2)+['', ''])[:3]
+        url = scheme+'://'+host+'/'+path+('?'+parts.query if parts.query else '')
+
+        body = self.fixtures.lookup(url) if self.fixtures else None
+        if body is not None:
+            self.count(requests=1, recorded=1)
+            self.send(request, 200, 'application/octet-stream', body)
+            return
+
+        response = self.api.respond(host, '/'+path, dict(urllib.parse.parse_qsl(parts.query))) if self.api else None
+        if response is None:
+            self.count(requests=1, missing=1)
+            self.send(request, 404, 'text/plain', b'No fixture for '+url.encode('utf-8'))
+            return
+
+        (contentType, body) = response
+        self.count(requests=1, synthetic=1)
+        self.send(request, 200, contentType, body)
+
+    def send(self, request, status, contentType, body, headers=None):
+        # Bodies are gzipped for clients that accept it, bytes counts what goes over the wire
+        headers = dict(headers or {})
+        if status == 200 and 'gzip' in request.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, 6)
+            headers['Content-Encoding'] = 'gzip'
+            self.count(compressed=1)
+        self.count(bytes=len(body))
+
+        request.send_response(status)
+        request.send_header('Content-Type', contentType)
+        request.send_header('Content-Length', str(len(body)))
+        for (name, value) in headers.items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(body)
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded or synthetic database responses for litfetch.')
+    parser.add_argument('--fixtures', help='directory of responses recorded with "record: <dir>"')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0, help='milliseconds added to every response')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests answered with 503')
+    parser.add_argument('--total', type=int, default=5000, help='size of every synthetic result set')
+    parser.add_argument('--no-synthetic', action='store_true', help='only serve recorded responses, 404 otherwise')
+    args = parser.parse_args()
+
+    server = MockServer(args.fixtures, args.port, args.latency/1000, args.error_rate, args.total, not args.no_synthetic)
+    print('Serving on '+server.url+', set "replay: '+server.url+'" in .config. Ctrl+C to stop.')
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(server.stats()))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+@author: rob.dunne@manchester.ac.uk
+Fetch a list of research papers from computer science research literature databases based on specified search terms.
+Databases: Google Scholar, ACM digital library, IEEE Xplore, ScienceDirect, SpringerLink, and Wiley Online Library.
+
+Useful list of APIs for further expansion: https://libraries.mit.edu/scholarly/publishing/apis-for-scholarly-resources/
+
+Run with python -m litfetch. Importing the package has no side effects and loads nothing else: each name below
+is imported from its submodule the first time it is used, so a worker that only needs the cache or the
+de-duplication does not pay for the connectors, and lxml and BeautifulSoup are only loaded when Scholar runs.
+"""
+
+import importlib
+
+# Public names by submodule
+exports = {
+    'app': ['Litfetch'],
+    'cli': ['batchHeader', 'main', 'readBatch', 'runBatch', 'runBatchJob'],
+    'dedup': ['DedupIndex', 'Deduplicator', 'SqliteDedupIndex', 'identifier', 'normaliseTitle'],
+    'enrich': ['Enricher', 'EnrichmentCache'],
+    'fetch': ['CacheMissError', 'FetchEngine', 'FixtureStore', 'HttpClient', 'RateLimiter', 'ResponseCache', 'Transport'],
+    'metrics': ['Metrics'],
+    'query': ['Screener', 'SearchQuery'],
+    'sources': ['Arxiv', 'AcmDL', 'Connector', 'Crossref', 'GoogleScholar', 'IeeeXplore', 'Paper', 'PubMed', 'ResearchGate', 'ScienceDirect',
+                'SpringerLink', 'WileyOL', 'Zenodo', 'connectors', 'parseScholarPage', 'parseScholarPageSoup', 'registerConnector'],
+    'snowball': ['SnowballStore', 'Snowballer'],
+    'storage': ['Checkpoint', 'CorpusStore', 'ResultWriter', 'Watermarks'],
+}
+modules = {name: module for (module, names) in exports.items() for name in names}
+
+__all__ = sorted(modules)
+
+def __getattr__(name):
+    if name not in modules:
+        raise AttributeError("module 'litfetch' has no attribute '"+name+"'")
+    value = getattr(importlib.import_module('.'+modules[name], __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
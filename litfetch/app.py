@@ -0,0 +1,714 @@
+"""
+The search itself: the menu actions, the pipeline every source runs through and de-duplication of the CSVs.
+"""
+
+import csv
+import functools
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+from .dedup import Deduplicator, SqliteDedupIndex
+from .enrich import Enricher, EnrichmentCache
+from .fetch import FetchEngine, FixtureStore, HttpClient, RateLimiter, ResponseCache, Transport
+from .metrics import Metrics
+from .query import Screener, SearchQuery
+from .snowball import SnowballStore, Snowballer
+from .sources import Paper, connectors
+from .storage import Checkpoint, CorpusStore, ResultWriter, Watermarks
+
+class Litfetch():
+    # Output schemas for the primary databases and the grey literature
+    primaryHeader = ['searched','title','authors','published','database','source','doi','abstract','venue']
+    yearPattern = re.compile(r'.*([1-3][0-9]{3})')
+    greyHeader = ['Searched','Title','Authors','Published','Type','Include?','Exclusion code','Database','Source','DOI','Abstract','Venue']
+    mergeHeader = ['kept title','kept source','merged title','merged source','stage','score']
+
+    # Inclusion criteria 1, IC1
+    defaultCriteria = [('IC1', ['predict', 'forecast'])]
+    #defaultCriteria = [('IC1', ['arousal']), ('IC2', ['detect', 'predict', 'captur', 'sens', 'measur'])] # Inclusion criteria
+
+    # Menu options and the matching command line actions
+    menuActions = {'0': 'search', '1': 'dedupe', '2': 'grey', '3': 'dedupe-grey', '5': 'refresh', '6': 'corpus', '8': 'stream', '9': 'stream-grey', '10': 'snowball'}
+
+    # Constructor, the benchmarks pass their own config and skip the menu
+    def __init__(self, config=None, interactive=True):
+        # Print the notice
+        if interactive:
+            self.programNotice()
+
+        # Set the search terms
+        self.config = self.getConfig() if config is None else config
+        self.searchLimit = int(self.config.get('searchLimit', 1000))
+        self.startYear = self.config.get('startYear', '2005')
+        self.endYear = self.config.get('endYear', '2014')
+        #self.searchString = '((predict OR predicting OR prediction) AND arousal) OR ((detect OR detecting OR detection) AND arousal) OR ((sense OR sensing) AND arousal) OR ((measure OR measuring) AND arousal) OR ((capture OR capturing) AND arousal)'
+        self.searchString = self.config.get('searchString', '(human OR people OR person) AND (behaviour OR behavior OR action OR activity) AND (prediction OR predicting OR forecast OR forecasting) AND (algorithm OR method OR technique OR learning) AND ("smart home" OR "smart environment" OR "smart homes" OR "smart environments" OR "ambient intelligence")')
+        #self.searchString = 'behaviour prediction smart home'
+
+        # "searchTerms: primary" (or secondary) builds the search from ./searchterms instead, see getSearchString.
+        # The query is parsed once and each database gets it in its own syntax.
+        if self.config.get('searchTerms'):
+            self.searchString = self.getSearchString(self.config['searchTerms'], 'elsevier')
+        self.query = SearchQuery(self.searchString)
+
+        # Databases whose results are checked against the whole query locally, e.g. "localMatch: acm, ieee, wiley"
+        # for the Crossref sources, which only rank by the keywords
+        self.localMatch = set(re.split(r'[\s,]+', self.config.get('localMatch', '').strip())) - {''}
+
+        # Document types each database is asked to filter on where it can, e.g. "documentTypes: article, conference",
+        # see Connector.documentTypes. The date window goes to every database that takes one.
+        self.documentTypes = [name for name in re.split(r'[\s,]+', self.config.get('documentTypes', '').strip().lower()) if name]
+
+        # Screening against the inclusion and exclusion criteria as papers are parsed, IC1 unless .config has rules.
+        # Grey literature is screened by hand unless "screenGrey: yes".
+        self.screener = Screener.fromConfig(self.config, self.defaultCriteria) if self.configFlag('screen', 'yes') else Screener()
+        self.screenGrey = self.configFlag('screenGrey')
+
+        # Every output file goes under outputDir, a batch run gives each query its own
+        self.outputDir = self.config.get('outputDir', '.')
+        os.makedirs(self.outputDir, exist_ok=True)
+
+        # Every harvested record, screened out or not, also goes to the local corpus database. "corpus: no" turns it off.
+        self.corpus = CorpusStore(self.output('review-search-corpus.sqlite')) if self.configFlag('corpus', 'yes') else None
+
+        # Concurrency limits for the fetch engine, overridable in .config
+        self.maxConcurrency = int(self.config.get('maxConcurrency', 8))
+        self.maxPerHost = int(self.config.get('maxPerHost', 2))
+        self.engine = FetchEngine(self.maxConcurrency, self.maxPerHost)
+
+        # Response cache, set "offline: yes" in .config to only use cached responses
+        self.cache = ResponseCache(self.config.get('cacheDir', '.litfetch-cache'), int(self.config.get('cacheSize', 500))*1024*1024, self.configFlag('offline'))
+
+        # Rate limits per host and retries for 429/5xx responses
+        rates = {}
+        if self.config.get('ncbiKey'):
+            rates['eutils.ncbi.nlm.nih.gov'] = (10, 10)
+        for (key, value) in self.config.items():
+            if key.startswith('rate.'):
+                rates[key[5:]] = (float(value), max(1, float(value)))
+        # Run metrics, "progress: yes" shows a live progress line with an ETA instead of the titles
+        self.metrics = Metrics(self.configFlag('progress'))
+
+        # "record: <dir>" keeps every response as a fixture, "replay: <url>" sends all requests to a mock server
+        recorder = FixtureStore(self.config['record']) if self.config.get('record') else None
+        # One pool of kept-alive connections for every source, httpPoolSize connections per host, timeouts in seconds
+        transport = Transport(int(self.config.get('httpPoolSize', 8)), float(self.config.get('connectTimeout', 10)), float(self.config.get('readTimeout', 60)))
+        self.http = HttpClient(self.cache, RateLimiter(rates, int(self.config.get('rateShare', 1))), int(self.config.get('maxRetries', 5)), transport=transport, recorder=recorder, replay=self.config.get('replay'), metrics=self.metrics)
+
+        # PubMed esummary batch size and arXiv page size
+        self.pubmedBatch = int(self.config.get('pubmedBatch', 500))
+        self.arxivPageSize = int(self.config.get('arxivPageSize', 500))
+
+        # Request the next Crossref page while the current one is processed
+        self.crossrefPrefetch = self.configFlag('crossrefPrefetch', 'yes')
+
+        # Metadata enrichment from Crossref, cached per identifier next to the response cache. "enrich: no" turns it
+        # off and "enrichTitles: no" stops papers without a DOI being resolved by title.
+        self.enricher = None
+        if self.configFlag('enrich', 'yes'):
+            self.enricher = self.getEnricher()
+
+        # Incremental refreshes, see getWatermark
+        self.incremental = False
+        # Every source checkpoints its progress after each page, "resume: yes" (or --resume) carries on from the
+        # checkpoints of an interrupted run instead of starting the search again
+        self.resume = self.configFlag('resume')
+        self.watermarks = Watermarks(self.output('review-search-watermarks.json'))
+        self.runDate = time.strftime('%Y-%m-%d')
+        self.searchedDate = time.strftime("%d/%m/%Y")
+
+        # Perform the search
+        if interactive:
+            self.fetchPapers()
+
+    def fetchPapers(self):
+        # Databases selection
+        selection = input('\nPlease select an option:\n 0. run search\n 1. de-duplicate papers\n 2. grey literature\n 3. de-duplicate grey literature\n 4. exit\n 5. refresh search and grey literature (incremental)\n 6. load the CSVs into the local corpus\n 7. search the local corpus\n 8. search and de-duplicate in one pass\n 9. grey literature and de-duplicate in one pass\n 10. snowball the de-duplicated papers through their references and citations\n\n> ')
+        print('You selected: '+selection)
+
+        if selection == '4':
+            print('Goodbye.')
+            exit()
+
+        if selection == '7':
+            self.findPapers(input('Full-text query, e.g. arousal AND wearable:\n> '))
+            return
+
+        if selection not in self.menuActions:
+            print('Uh oh, I don\'t know what '+selection+' is?')
+            return
+
+        self.runAction(self.menuActions[selection])
+        self.writeMetrics()
+
+    def runAction(self, action):
+        # Run one of the actions, from the menu or the command line. Returns {source: error} for the sources
+        # that failed, or the number of de-duplicated papers.
+        if action == 'search':
+            # Run every database at once, the run takes as long as the slowest source
+            print('Searching Google Scholar, ACM Digital Library, IEEE Xplore, ScienceDirect, SpringerLink, Wiley Online Library and PubMed...')
+            print('Google Scholar page results are retrieved with a 5 second delay to prevent blocking of the web scraper.')
+            return self.engine.run(self.primarySources())
+
+        elif action == 'dedupe':
+            # Write a de-duplicated list as a CSV
+            print('De-duplicating list of papers...')
+            return self.deDuplicatePapers()
+
+        elif action == 'grey':
+            # Search grey literature
+            print('Searching grey literature...')
+            return self.engine.run(self.greySources())
+
+        elif action == 'dedupe-grey':
+            # De-duplicate grey literature
+            print('De-duplicating grey literature...')
+            return self.deDuplicateGrey()
+
+        elif action == 'refresh':
+            # Only fetch records newer than each source's watermark and append them to the existing CSVs
+            print('Refreshing search and grey literature...')
+            self.incremental = True
+            return self.engine.run(self.primarySources()+self.greySources())
+
+        elif action == 'stream':
+            # Search and de-duplicate in one pass, the de-duplicated list grows while the databases are searched
+            print('Searching and de-duplicating in one pass...')
+            return self.streamDeduplicated(False)
+
+        elif action == 'stream-grey':
+            print('Searching and de-duplicating grey literature in one pass...')
+            return self.streamDeduplicated(True)
+
+        elif action == 'snowball':
+            # Backward and forward snowballing from the de-duplicated papers
+            print('Snowballing from the de-duplicated papers...')
+            return self.snowball()
+
+        elif action == 'corpus':
+            # Bulk load the existing CSVs into the corpus database
+            print('Loading the CSVs into review-search-corpus.sqlite...')
+            return self.loadCorpus()
+
+        raise ValueError('Unknown action: '+action)
+
+    def loadCorpus(self):
+        if self.corpus is None:
+            print('The corpus is turned off in .config')
+            return 0
+
+        start = time.time()
+        loaded = 0
+        for connector in connectors.values():
+            for (fileName, grey) in ((connector.fileName, connector.grey), (connector.fileName.replace('.csv', '-excluded.csv'), True)):
+                path = self.output(fileName)
+                if not os.path.exists(path):
+                    continue
+                with open(path, newline='', encoding='utf-8') as f:
+                    for row in csv.reader(f):
+                        if not row or row[0].lower() == 'searched':
+                            continue
+                        self.corpus.add(self.csvPaper(row, grey), connector.name)
+                        loaded += 1
+                print('Loaded '+fileName)
+
+        self.corpus.flush()
+        print('Done. '+str(loaded)+' rows loaded in '+str(round(time.time()-start, 1))+'s, '+str(self.corpus.count())+' papers in the corpus.')
+        return loaded
+
+    def csvPaper(self, row, grey):
+        # A Paper back from a primary or grey CSV row. The DOI, abstract and venue columns are missing from
+        # CSVs written before enrichment.
+        if grey:
+            paper = Paper(row[1], row[2], row[3], row[4], row[7], row[8], *row[9:12])
+            (paper.include, paper.exclusionCode) = (row[5], row[6])
+        else:
+            paper = Paper(row[1], row[2], row[3], '-', row[4], row[5], *row[6:9])
+        paper.searched = row[0]
+        findYear = self.yearPattern.match(paper.published)
+        paper.year = findYear.group(1) if findYear else '0000'
+        return paper
+
+    def findPapers(self, query, limit=50):
+        # Full-text search of the local corpus, no API calls
+        if self.corpus is None:
+            print('The corpus is turned off in .config')
+            return []
+
+        start = time.time()
+        try:
+            papers = self.corpus.find(query, limit)
+        except sqlite3.OperationalError as e:
+            print('Cannot search for '+query+': '+str(e))
+            return []
+
+        for (title, authors, year, database, url, exclusionCode) in papers:
+            print(year+'  '+title+' ('+database+(', excluded '+exclusionCode if exclusionCode else '')+')\n      '+url)
+        print(str(len(papers))+' papers found in '+str(round((time.time()-start)*1000, 1))+'ms.')
+        return papers
+
+    def writeMetrics(self):
+        # Timings, requests and record counts for the run, "metrics: no" in .config turns the files off
+        self.metrics.report()
+        if self.configFlag('metrics', 'yes'):
+            self.metrics.write(self.output('review-search-metrics.json'), self.output('review-search-metrics.prom'))
+            print('Run metrics written to review-search-metrics.json and review-search-metrics.prom')
+
+    def primarySources(self):
+        return [(c.title, c.host, functools.partial(self.runConnector, c.name)) for c in connectors.values() if not c.grey]
+
+    def greySources(self):
+        return [(c.title, c.host, functools.partial(self.runConnector, c.name)) for c in connectors.values() if c.grey]
+
+    def runConnector(self, name, sink=None):
+        # The common pipeline for every database: fetch pages, parse, normalise, filter, enrich, screen and write.
+        # Papers failing the screening go to the source's -excluded.csv with the rule code and never reach dedup.
+        # Both CSVs are written as .partial files and a checkpoint is saved after every page, see Checkpoint.
+        # With a sink (a bounded queue, see streamPapers) every paper written is also put on it as (name, paper),
+        # waiting while the queue is full.
+        connector = connectors[name](self, self.getWatermark(name))
+        print('Searching '+connector.title+' for: '+self.searchString+'.')
+
+        search = '|'.join((self.searchString, self.startYear, self.endYear, ','.join(self.documentTypes), str(self.searchLimit), 'refresh' if self.incremental else 'search'))
+        checkpoint = Checkpoint(self.output(connector.fileName.replace('.csv', '.checkpoint')), search)
+        state = checkpoint.load() if self.resume else None
+        if state is not None and state.get('done'):
+            print(connector.title+' finished in the previous run.')
+            return
+        if state is not None:
+            (connector.position, connector.newWatermark, resumedIds, sizes) = (state['position'], state['watermark'], state['ids'], state['sizes'])
+            print('Resuming after '+str(len(resumedIds))+' records.')
+        else:
+            checkpoint.start()
+            (resumedIds, sizes) = (set(), [None, None])
+        print('Found:')
+
+        if connector.grey:
+            (header, keyColumn, row) = (self.greyHeader, 8, Paper.greyRow)
+        else:
+            (header, keyColumn, row) = (self.primaryHeader, 5, Paper.primaryRow)
+
+        # Stage timings go to the run metrics, the per-record stages are summed over each page
+        metrics = self.metrics
+        metrics.expect(name, self.searchLimit)
+        written = 0
+        rejected = 0
+        total = 0
+        screen = self.screenGrey or not connector.grey
+        excludedFile = connector.fileName.replace('.csv', '-excluded.csv')
+        with self.openResults(self.output(connector.fileName), header, keyColumn, sizes[0]) as writer, self.openResults(self.output(excludedFile), self.greyHeader, 8, sizes[1]) as excluded:
+            pages = connector.pages()
+            while True:
+                with metrics.span(name, 'fetch'):
+                    page = next(pages, None)
+                if page is None:
+                    break
+
+                timings = {'parse': 0, 'filter': 0, 'enrich': 0, 'screen': 0, 'write': 0}
+                if sink is not None:
+                    timings['queue'] = 0
+                counts = {'parsed': 0, 'skipped': 0, 'filtered': 0, 'resumed': 0, 'enriched': 0, 'excluded': 0, 'written': 0, 'existing': 0}
+                papers = []
+                ids = []
+                for item in page:
+                    start = time.perf_counter()
+                    try:
+                        paper = connector.parse(item)
+                        self.normalisePaper(paper)
+                    except Exception as exception:
+                        print(connector.title+' skipped a result: '+repr(exception))
+                        counts['skipped'] += 1
+                        continue
+                    finally:
+                        parsed = time.perf_counter()
+                        timings['parse'] += parsed-start
+                    counts['parsed'] += 1
+
+                    keep = self.filterPaper(paper, connector)
+                    recordId = checkpoint.recordId(paper) if keep else None
+                    timings['filter'] += time.perf_counter()-parsed
+                    if not keep:
+                        counts['filtered'] += 1
+                    elif recordId in resumedIds:
+                        # Written before the run was interrupted
+                        counts['resumed'] += 1
+                    else:
+                        papers.append(paper)
+                        ids.append(recordId)
+
+                # Missing DOIs, abstracts and authors are looked up for the whole page at once
+                if self.enricher is not None and connector.enrich:
+                    start = time.perf_counter()
+                    counts['enriched'] = self.enricher.enrich(papers, connector.resolveTitles)
+                    timings['enrich'] += time.perf_counter()-start
+
+                for paper in papers:
+                    start = time.perf_counter()
+                    paper.exclusionCode = self.screener.screen(paper.title+' '+paper.abstract) if screen else ''
+                    screened = time.perf_counter()
+                    timings['screen'] += screened-start
+                    if paper.exclusionCode:
+                        paper.include = 'N'
+                    if self.corpus is not None:
+                        self.corpus.add(paper, name, self.searchString)
+                    if paper.exclusionCode:
+                        excluded.writerow(paper.greyRow())
+                        counts['excluded'] += 1
+                        timings['write'] += time.perf_counter()-screened
+                        continue
+
+                    if not metrics.progress:
+                        print(paper.title)
+                    if writer.writerow(row(paper)):
+                        counts['written'] += 1
+                        if sink is not None:
+                            queued = time.perf_counter()
+                            sink.put((name, paper))
+                            timings['queue'] += time.perf_counter()-queued
+                            screened += time.perf_counter()-queued
+                    else:
+                        counts['existing'] += 1
+                    timings['write'] += time.perf_counter()-screened
+
+                checkpoint.save(connector.position, connector.newWatermark, ids, [writer.sync(), excluded.sync()])
+
+                for (stage, seconds) in timings.items():
+                    metrics.addSpan(name, stage, seconds, len(page))
+                for (outcome, records) in counts.items():
+                    metrics.count(name, outcome, records)
+                written += counts['written']
+                rejected += counts['excluded']
+                total += counts['parsed']+counts['skipped']
+
+        # The source is done, whatever it was expected to return
+        checkpoint.finish()
+        metrics.expect(name, total)
+        if self.corpus is not None:
+            self.corpus.flush()
+        self.setWatermark(name, connector.newWatermark)
+        print(connector.title+' done, '+str(written)+' papers added to '+connector.fileName+', '+str(rejected)+' excluded by screening.')
+
+    def normalisePaper(self, paper):
+        paper.searched = self.searchedDate
+        paper.title = ' '.join(str(paper.title).split()) or '-'
+        if isinstance(paper.authors, list):
+            paper.authors = ', '.join(paper.authors) if paper.authors else 'Not available'
+        findYear = self.yearPattern.match(str(paper.published))
+        paper.year = findYear.group(1) if findYear else '0000'
+
+    def filterPaper(self, paper, connector=None):
+        # Records without a title cannot be screened or de-duplicated
+        if paper.title == '-':
+            return False
+        # Outside the date window, for the databases that cannot filter on it (ResearchGate) or only by year.
+        # Records without a year are kept.
+        if connector is not None and paper.year != '0000' and not self.startYear <= paper.year <= self.endYear:
+            return False
+        # The databases in localMatch, and those sent a broader query because they cannot express one of its NOTs,
+        # are checked against the whole query
+        if connector is not None and (connector.name in self.localMatch or self.query.widened(connector.dialect)):
+            return self.query.matches(paper.title+' '+paper.abstract)
+        return True
+
+    def output(self, fileName):
+        return os.path.join(self.outputDir, fileName)
+
+    def openResults(self, fileName, header, keyColumn, resumeSize=None):
+        # A full search replaces the CSV, an incremental refresh appends the records it has not seen.
+        # resumeSize continues the .partial file of an interrupted run.
+        return ResultWriter(fileName, header, append=self.incremental, keyColumn=keyColumn if self.incremental else None, partial=True, resumeSize=resumeSize)
+
+    def getWatermark(self, source):
+        # The watermark from the previous run of this query, None for a full search
+        if not self.incremental:
+            return None
+        return self.watermarks.get(source, self.searchString+'|'+self.startYear+'-'+self.endYear)
+
+    def setWatermark(self, source, value):
+        self.watermarks.set(source, self.searchString+'|'+self.startYear+'-'+self.endYear, value)
+
+    def streamPapers(self, grey=False, onMerge=None, errors=None, onIdle=None):
+        # Searches the primary (or grey) databases and de-duplicates their records in one pass. The sources run as
+        # in a search and put every paper they write on a bounded queue of streamQueue records, blocking while it
+        # is full, so memory is bounded by the queue and one page per source. Papers are de-duplicated in the order
+        # they arrive and each unique one is yielded straight away, while the search is still running. Duplicates
+        # go to onMerge and the sources that failed to errors. onIdle is called whenever the queue runs empty.
+        records = queue.Queue(max(1, int(self.config.get('streamQueue', 1000))))
+        finished = object()
+        jobs = [(c.title, c.host, functools.partial(self.runConnector, c.name, records)) for c in connectors.values() if c.grey == grey]
+
+        def search():
+            try:
+                (errors if errors is not None else {}).update(self.engine.run(jobs))
+            finally:
+                records.put(finished)
+
+        thread = threading.Thread(target=search, daemon=True)
+        thread.start()
+        timings = {}
+        item = None
+        try:
+            with self.getDeduplicator(onMerge if onMerge is not None else (lambda merge: None)) as dedup:
+                while True:
+                    if onIdle is not None and records.empty():
+                        onIdle()
+                    item = records.get()
+                    if item is finished:
+                        break
+
+                    (name, paper) = item
+                    start = time.perf_counter()
+                    unique = dedup.add(paper.title, paper.authors, paper.source, paper.doi) is None
+                    (seconds, calls) = timings.get(name, (0, 0))
+                    timings[name] = (seconds+time.perf_counter()-start, calls+1)
+                    self.metrics.count(name, 'unique' if unique else 'merged')
+                    if unique:
+                        yield paper
+        finally:
+            # Closed early: keep taking records so the sources can finish
+            while item is not finished:
+                item = records.get()
+            thread.join()
+            for (name, (seconds, calls)) in timings.items():
+                self.metrics.addSpan(name, 'dedup', seconds, calls)
+
+    def streamDeduplicated(self, grey):
+        # The stream and stream-grey actions: the de-duplicated CSV is written from streamPapers to fileName.partial,
+        # flushed whenever the sources fall behind, so it can be read while the search runs. It is renamed over
+        # fileName when the search is done.
+        if grey:
+            (fileName, mergeFile, header, row) = ('review-search-deduped-grey.csv', 'review-search-merges-grey.csv', self.greyHeader, Paper.greyRow)
+        else:
+            (fileName, mergeFile, header, row) = ('review-search-deduped.csv', 'review-search-merges.csv', self.primaryHeader, Paper.primaryRow)
+
+        errors = {}
+        deDupedRows = 0
+        with ResultWriter(self.output(fileName), header, partial=True) as writer, ResultWriter(self.output(mergeFile), self.mergeHeader) as merges:
+            for paper in self.streamPapers(grey, merges.writerow, errors, writer.flush):
+                writer.writerow(row(paper))
+                deDupedRows += 1
+
+        print('Done. '+str(deDupedRows)+' de-duplicated papers in '+fileName+', merges in '+mergeFile+'.')
+        return errors
+
+    def snowball(self):
+        # Snowballing from the seed set in review-search-deduped.csv (or snowballSeeds) through Crossref references
+        # (backward) and OpenCitations citations (forward) to snowballDepth levels, see Snowballer. The papers found
+        # are screened like search results and written to review-search-snowball.csv with their level, direction and
+        # the paper they were reached from, the citations to review-search-snowball-citations.csv. The state is kept
+        # in review-search-snowball.sqlite and "resume: yes" (or --resume) carries on an interrupted run.
+        seedsFile = self.output(self.config.get('snowballSeeds', 'review-search-deduped.csv'))
+        if not os.path.exists(seedsFile):
+            print('No seed papers, '+seedsFile+' not found. Run the search and de-duplication first.')
+            return 0
+        depth = int(self.config.get('snowballDepth', 1))
+        direction = self.config.get('snowballDirection', 'both')
+        enricher = self.enricher or self.getEnricher()
+
+        # Seeds are resolved to DOIs from the CSV, the source URL or, failing those, Crossref by title
+        with open(seedsFile, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        grey = bool(rows) and rows[0][0] == 'Searched'
+        papers = [self.csvPaper(row, grey) for row in rows[1:] if row]
+        for paper in papers:
+            keys = enricher.keys(paper)
+            if not paper.doi and keys and keys[0].startswith('doi:'):
+                paper.doi = keys[0][4:]
+        enricher.enrich([paper for paper in papers if not paper.doi])
+        seeds = list(dict.fromkeys(Snowballer.normaliseDoi(paper.doi) for paper in papers if paper.doi))
+        print(str(len(seeds))+' seed papers with a DOI, '+str(len(papers)-len(seeds))+' without one are left out.')
+
+        store = SnowballStore(self.output('review-search-snowball.sqlite'), os.path.basename(seedsFile)+'|'+direction, self.resume)
+        if store.resumed:
+            print('Resuming after '+str(store.count())+' papers.')
+        snowballer = Snowballer(enricher, store, int(self.config.get('snowballWorkers', 8)), direction, self.config.get('opencitationsKey'), self.metrics)
+        with self.metrics.span('snowball', 'fetch'):
+            found = snowballer.run(seeds, depth)
+
+        header = self.primaryHeader+['depth','direction','via']
+        written = 0
+        rejected = 0
+        unknown = 0
+        with self.metrics.span('snowball', 'write'), ResultWriter(self.output('review-search-snowball.csv'), header) as writer, ResultWriter(self.output('review-search-snowball-excluded.csv'), self.greyHeader) as excluded:
+            for (doi, level, how, via, metadata) in store.papers():
+                if not metadata:
+                    # Not in Crossref, or not looked up yet
+                    unknown += 1
+                    continue
+                paper = Paper(metadata['title'], metadata['authors'] or 'Not available', metadata.get('year', ''), '-', 'Snowballing', 'https://doi.org/'+doi, doi, metadata['abstract'], metadata['venue'])
+                self.normalisePaper(paper)
+                if not self.filterPaper(paper):
+                    unknown += 1
+                    continue
+                paper.exclusionCode = self.screener.screen(paper.title+' '+paper.abstract)
+                if self.corpus is not None:
+                    self.corpus.add(paper, 'snowball', seedsFile)
+                if paper.exclusionCode:
+                    paper.include = 'N'
+                    excluded.writerow(paper.greyRow())
+                    rejected += 1
+                else:
+                    writer.writerow(paper.primaryRow()+[level, how, via])
+                    written += 1
+        with ResultWriter(self.output('review-search-snowball-citations.csv'), ['citing','cited']) as citations:
+            citations.writerows(store.citations())
+        store.close()
+        if self.corpus is not None:
+            self.corpus.flush()
+
+        self.metrics.count('snowball', 'written', written)
+        self.metrics.count('snowball', 'excluded', rejected)
+        print('Done. '+str(found)+' papers found, '+str(written)+' written to review-search-snowball.csv, '+str(rejected)+' excluded by screening, '+str(unknown)+' without Crossref metadata.')
+        if snowballer.failed:
+            print(str(snowballer.failed)+' papers could not be looked up, run again with --resume to retry them.')
+        return written
+
+    def deDuplicatePapers(self):
+        totalRows = 0
+        deDupedRows = 0
+
+        # Combine and remove duplicates from the database CSVs. Write one file.
+        sources = [c for c in connectors.values() if not c.grey]
+
+        with ResultWriter(self.output('review-search-deduped.csv'), self.primaryHeader) as writer, ResultWriter(self.output('review-search-merges.csv'), self.mergeHeader) as merges, self.getDeduplicator(merges.writerow) as dedup:
+            print('Adding de-duplicated papers to review-search-deduped.csv')
+            for source in sources:
+                csvData = self.output(source.fileName)
+                if not os.path.exists(csvData):
+                    print('Skipping '+csvData+', the database has not been searched')
+                    continue
+                with open(csvData, newline='', encoding='utf-8') as csvfile1, self.metrics.span(source.name, 'dedup'):
+                    print('Deduplicating '+csvData)
+                    data1 = csv.reader(csvfile1, delimiter=',', quotechar='"')
+                    for entry in data1:
+                        # Skip the header
+                        # The inclusion criteria were applied when the papers were fetched, see runConnector
+                        if entry[0].lower() != 'searched':
+                            # Filter by year
+                            #if int(entry[3]) > 2004 and int(entry[3]) < 2015:
+                            # Only the first copy of a paper is written, later copies are recorded as merges
+                            if dedup.add(entry[1], entry[2], entry[5], entry[6] if len(entry) > 6 else '') is None:
+                                writer.writerow(entry)
+                                deDupedRows = deDupedRows+1
+                                self.metrics.count(source.name, 'unique')
+                            else:
+                                self.metrics.count(source.name, 'merged')
+
+                            totalRows = totalRows+1
+
+        print('Done.')
+        print('Merged papers: '+str(dedup.mergeCount)+', see review-search-merges.csv')
+        print('Total papers: '+str(totalRows))
+        print('De-duplicated papers: '+str(deDupedRows))
+
+        return deDupedRows
+
+    def deDuplicateGrey(self):
+        totalRows = 0
+        deDupedRows = 0
+
+        # Combine and remove duplicates from the database CSVs. Write one file.
+        sources = [c for c in connectors.values() if c.grey]
+
+        with ResultWriter(self.output('review-search-deduped-grey.csv'), self.greyHeader) as writer, ResultWriter(self.output('review-search-merges-grey.csv'), self.mergeHeader) as merges, self.getDeduplicator(merges.writerow) as dedup:
+            print('Adding de-duplicated grey literature to review-search-deduped-grey.csv')
+            for source in sources:
+                csvData = self.output(source.fileName)
+                if not os.path.exists(csvData):
+                    print('Skipping '+csvData+', the database has not been searched')
+                    continue
+                with open(csvData, newline='', encoding='utf-8') as csvfile1, self.metrics.span(source.name, 'dedup'):
+                    print('Deduplicating '+csvData)
+                    data1 = csv.reader(csvfile1, delimiter=',', quotechar='"')
+                    for entry in data1:
+                        # Skip the header
+                        if entry[0].lower() != 'searched':
+                            if dedup.add(entry[1], entry[2], entry[8], entry[9] if len(entry) > 9 else '') is None:
+                                writer.writerow(entry)
+                                deDupedRows = deDupedRows+1
+                                self.metrics.count(source.name, 'unique')
+                            else:
+                                self.metrics.count(source.name, 'merged')
+
+                            totalRows = totalRows+1
+
+        print('Done.')
+        print('Merged grey literature papers: '+str(dedup.mergeCount)+', see review-search-merges-grey.csv')
+        print('Total grey literature papers: '+str(totalRows))
+        print('De-duplicated grey literature papers: '+str(deDupedRows))
+
+        return deDupedRows
+
+    def getDeduplicator(self, onMerge=None):
+        # De-duplication stages and thresholds, overridable in .config. A near threshold of 0 turns off the fuzzy stage.
+        # "dedupMode: disk" keeps the lookup tables in a temporary SQLite file, using at most dedupMemory MB of cache.
+        index = None
+        if self.config.get('dedupMode', 'memory') == 'disk':
+            index = SqliteDedupIndex(self.output('review-search-dedup.sqlite'), int(self.config.get('dedupMemory', 64))*1024*1024)
+
+        return Deduplicator(
+            useIds=self.configFlag('dedupIds', 'yes'),
+            useTitles=self.configFlag('dedupTitles', 'yes'),
+            nearThreshold=float(self.config.get('dedupNear', 0.8)),
+            authorThreshold=float(self.config.get('dedupAuthors', 0.2)),
+            index=index,
+            onMerge=onMerge,
+        )
+
+    def getSearchString(self, primaryOrSecondary, database):
+        # Return a boolean search string for the database specified.
+        # primaryOrSecondary determines whether to use just the primary search terms or combine them with the secondaryTerms
+        # Search terms are contained in files ./searchterms/primary.csv and ./searchterms/secondary.csv. Each row is one
+        # concept: the terms on a row are ORed and the rows are ANDed. Without the files the searchString is used.
+        files = ['primary.csv'] if primaryOrSecondary == 'primary' else ['primary.csv', 'secondary.csv']
+        groups = []
+        for fileName in files:
+            path = os.path.join('searchterms', fileName)
+            if not os.path.exists(path):
+                continue
+            with open(path, newline='', encoding='utf-8') as f:
+                for row in csv.reader(f):
+                    terms = [term.strip() for term in row if term.strip()]
+                    if terms and not terms[0].startswith('#'):
+                        groups.append('('+' OR '.join(self.quoteTerm(term) for term in terms)+')')
+
+        if not groups:
+            return SearchQuery(self.searchString).emit(database)
+        return SearchQuery(' AND '.join(groups)).emit(database)
+
+    def quoteTerm(self, term):
+        # Multi-word terms and operator words are phrases
+        if ' ' in term or term in SearchQuery.operators:
+            return '"'+term.replace('"', '')+'"'
+        return term
+
+    def getEnricher(self):
+        # Metadata from a replay server is kept in its own file, apart from the metadata of live runs. Offline only the
+        # cached metadata is used.
+        fileName = 'enrichment-replay.sqlite' if self.config.get('replay') else 'enrichment.sqlite'
+        cache = EnrichmentCache(os.path.join(self.cache.directory, fileName))
+        return Enricher(self.http, cache, int(self.config.get('enrichWorkers', 4)), self.configFlag('enrichTitles', 'yes'), self.config.get('crossrefMailto'), self.configFlag('offline'))
+
+    def configFlag(self, key, default='no'):
+        return self.config.get(key, default).lower() in ('yes', 'true', '1')
+
+    @staticmethod
+    def getConfig(fileName='.config'):
+        # Get the config file details
+        d = {}
+        with open(fileName) as f:
+            for line in f:
+                (key, val) = line.split(':', 1)
+                d[key] = val.replace('\n', '').strip()
+
+            return d
+
+    def programNotice(self):
+        print('****************************************************************')
+        print('*** Computer Science database search script. UoM CS, 2018    ***')
+        print('*** This software is provided as is, under an MIT licence    ***')
+        print('****************************************************************')
@@ -0,0 +1,164 @@
+"""
+The command line and batch runs of many queries on a process pool.
+"""
+
+import argparse
+import contextlib
+import csv
+import os
+import re
+import time
+
+from .app import Litfetch
+from .storage import ResultWriter
+
+# Batch runs. Each query runs in a worker process with its own output directory, all of them sharing the response
+# cache, so a URL asked for by overlapping queries is only fetched once.
+batchHeader = ['name','searchString','actions','status','seconds','written','deduped','requests','cached','KB','failed','outputDir']
+
+def readBatch(fileName, defaults):
+    # A CSV of query definitions: name and searchString, then optional startYear, endYear, searchLimit and
+    # actions (space separated). Blank rows and rows starting with # are skipped.
+    jobs = []
+    names = set()
+    with open(fileName, newline='', encoding='utf-8') as f:
+        for (number, row) in enumerate(csv.DictReader(f), 1):
+            row = {key.strip(): (value or '').strip() for (key, value) in row.items() if key}
+            if not row.get('searchString') or row.get('name', '').startswith('#'):
+                continue
+
+            name = re.sub(r'[^A-Za-z0-9._-]+', '-', row.get('name') or 'query-'+str(number)).strip('-.')
+            if name in names:
+                raise ValueError('Duplicate query name in '+fileName+': '+name)
+            names.add(name)
+
+            job = {'name': name, 'searchString': row['searchString'], 'actions': (row.get('actions') or defaults['actions']).split()}
+            for key in ('startYear', 'endYear', 'searchLimit'):
+                job[key] = row.get(key) or defaults.get(key)
+            jobs.append(job)
+
+    return jobs
+
+def runBatchJob(job):
+    # Runs in a worker process. The log goes to the query's output directory and a summary row comes back.
+    config = dict(job['config'])
+    config['searchString'] = job['searchString']
+    config['outputDir'] = job['outputDir']
+    config['progress'] = 'no'
+    for key in ('startYear', 'endYear', 'searchLimit'):
+        if job.get(key):
+            config[key] = job[key]
+
+    os.makedirs(job['outputDir'], exist_ok=True)
+    start = time.time()
+    status = 'ok'
+    failed = []
+    deduped = ''
+    with open(os.path.join(job['outputDir'], 'litfetch.log'), 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        try:
+            lf = Litfetch(config, interactive=False)
+            for action in job['actions']:
+                result = lf.runAction(action)
+                if isinstance(result, dict):
+                    failed += [name for (name, error) in result.items() if error is not None]
+                else:
+                    deduped = result
+            lf.writeMetrics()
+            summary = lf.metrics.summary()
+        except Exception as e:
+            status = 'failed: '+repr(e)
+            summary = {'hosts': {}, 'sources': {}}
+
+    hosts = summary['hosts'].values()
+    return {
+        'name': job['name'],
+        'searchString': job['searchString'],
+        'actions': ' '.join(job['actions']),
+        'status': status if not failed else 'partial',
+        'seconds': round(time.time()-start, 1),
+        'written': sum(entry['records'].get('written', 0) for entry in summary['sources'].values()),
+        'deduped': deduped,
+        'requests': sum(counters['requests'] for counters in hosts),
+        'cached': sum(counters['cached'] for counters in hosts),
+        'KB': round(sum(counters['bytes'] for counters in hosts)/1024),
+        'failed': ' '.join(failed),
+        'outputDir': job['outputDir'],
+    }
+
+def runBatch(args, config):
+    defaults = {'actions': ' '.join(args.action or ['search']), 'startYear': args.start_year, 'endYear': args.end_year, 'searchLimit': args.limit}
+    jobs = readBatch(args.batch, defaults)
+    if not jobs:
+        print('No queries in '+args.batch)
+        return 1
+
+    # Workers share the cache and split every host's rate limit between them
+    workers = max(1, min(args.workers, len(jobs)))
+    config = dict(config)
+    config['cacheDir'] = os.path.abspath(config.get('cacheDir', '.litfetch-cache'))
+    config['rateShare'] = str(workers*int(config.get('rateShare', 1)))
+    for job in jobs:
+        job['config'] = config
+        job['outputDir'] = os.path.join(args.output, job['name'])
+
+    print('Running '+str(len(jobs))+' queries on '+str(workers)+' workers, output in '+args.output)
+    import multiprocessing
+    rows = []
+    with multiprocessing.Pool(workers) as pool:
+        for row in pool.imap_unordered(runBatchJob, jobs):
+            print(row['name']+': '+row['status']+', '+str(row['written'])+' papers, '+str(row['requests'])+' requests, '+str(row['cached'])+' cached, '+str(row['seconds'])+'s')
+            rows.append(row)
+
+    # Combined summary in the order of the batch file
+    order = {job['name']: i for (i, job) in enumerate(jobs)}
+    rows.sort(key=lambda row: order[row['name']])
+    with ResultWriter(os.path.join(args.output, 'batch-summary.csv'), batchHeader) as writer:
+        writer.writerows([row[column] for column in batchHeader] for row in rows)
+
+    print('Done. '+str(sum(row['written'] for row in rows))+' papers, '+str(sum(row['requests'] for row in rows))+' requests, '+str(sum(row['cached'] for row in rows))+' served from the shared cache.')
+    print('Summary written to '+os.path.join(args.output, 'batch-summary.csv'))
+    return 0 if all(row['status'] == 'ok' for row in rows) else 1
+
+def main(argv=None):
+    # With no arguments the interactive menu runs, as before
+    parser = argparse.ArgumentParser(description='Search the computer science literature databases.')
+    parser.add_argument('action', nargs='*', help='actions to run without the menu, in order: '+', '.join(Litfetch.menuActions.values()))
+    parser.add_argument('--query', help='search string, instead of the one in .config')
+    parser.add_argument('--start-year')
+    parser.add_argument('--end-year')
+    parser.add_argument('--limit', help='maximum results per database')
+    parser.add_argument('--output', help='output directory')
+    parser.add_argument('--config', default='.config', help='config file, default .config')
+    parser.add_argument('--batch', help='CSV of queries (name, searchString, startYear, endYear, searchLimit, actions) run on a process pool')
+    parser.add_argument('--workers', type=int, default=4, help='worker processes for --batch')
+    parser.add_argument('--find', help='full-text search of the local corpus, e.g. "arousal AND wearable"')
+    parser.add_argument('--resume', action='store_true', help='carry on from the checkpoints of an interrupted run')
+    parser.add_argument('--depth', help='snowballing levels, instead of snowballDepth in .config')
+    args = parser.parse_args(argv)
+    for action in args.action:
+        if action not in Litfetch.menuActions.values():
+            parser.error('unknown action: '+action)
+
+    if not args.action and not args.batch and not args.find:
+        Litfetch()
+        return 0
+
+    config = Litfetch.getConfig(args.config)
+    if args.resume:
+        config['resume'] = 'yes'
+    if args.batch:
+        args.output = args.output or 'batch'
+        return runBatch(args, config)
+
+    for (key, value) in (('searchString', args.query), ('startYear', args.start_year), ('endYear', args.end_year), ('searchLimit', args.limit), ('outputDir', args.output), ('snowballDepth', args.depth)):
+        if value:
+            config[key] = value
+
+    lf = Litfetch(config, interactive=False)
+    for action in args.action:
+        lf.runAction(action)
+    if args.find:
+        lf.findPapers(args.find)
+    if args.action:
+        lf.writeMetrics()
+    return 0
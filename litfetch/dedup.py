@@ -0,0 +1,260 @@
+"""
+De-duplication of the harvested records, by identifier, normalised title and MinHash/LSH over the title.
+"""
+
+import contextlib
+import hashlib
+import html
+import os
+import re
+import sqlite3
+import struct
+import unicodedata
+import urllib.parse
+
+# Identifiers and title normalisation, shared by de-duplication, checkpoints, the corpus and enrichment
+doiPattern = re.compile(r'10\.\d{4,9}/[^\s&?#"]+', re.IGNORECASE)
+pubmedPattern = re.compile(r'ncbi\.nlm\.nih\.gov/pubmed/(\d+)')
+arxivPattern = re.compile(r'arxiv\.org/abs/([^\s?#]+?)(?:v\d+)?$')
+markupPattern = re.compile(r'<[^>]+>')
+punctuationPattern = re.compile(r'[\W_]+')
+
+def normaliseTitle(title):
+    # Case, accents, HTML entities, markup and punctuation removed
+    title = html.unescape(title)
+    # Most titles are plain ASCII and have no accents to strip
+    if not title.isascii():
+        title = unicodedata.normalize('NFKD', title)
+        title = ''.join(c for c in title if not unicodedata.combining(c))
+    title = title.casefold()
+    title = markupPattern.sub(' ', title)
+    return ' '.join(punctuationPattern.sub(' ', title).split())
+
+def identifier(source):
+    # Best identifier found in the source URL
+    source = html.unescape(source or '').strip()
+    doi = doiPattern.search(urllib.parse.unquote(source))
+    if doi:
+        return 'doi:'+doi.group(0).rstrip('.').lower()
+    pubmed = pubmedPattern.search(source)
+    if pubmed:
+        return 'pmid:'+pubmed.group(1)
+    arxiv = arxivPattern.search(source)
+    if arxiv:
+        return 'arxiv:'+arxiv.group(1)
+    if source.startswith('http'):
+        return 'url:'+source.split('://', 1)[1].rstrip('/').lower()
+    return None
+
+class DedupIndex():
+    # In-memory lookup tables for the Deduplicator
+    def __init__(self):
+        self.keys = {}
+        self.buckets = {}
+        self.records = []
+
+    def getKey(self, key):
+        return self.keys.get(key)
+
+    def putKey(self, key, recordId):
+        self.keys.setdefault(key, recordId)
+
+    def getBuckets(self, bands):
+        candidates = set()
+        for band in bands:
+            candidates.update(self.buckets.get(band, ()))
+        return candidates
+
+    def putBuckets(self, bands, recordId):
+        for band in bands:
+            self.buckets.setdefault(band, []).append(recordId)
+
+    def addRecord(self, record):
+        # record is (title, source, signature, authorTokens, doi)
+        self.records.append(record)
+        return len(self.records)-1
+
+    def getRecord(self, recordId):
+        return self.records[recordId]
+
+    def close(self):
+        pass
+
+class SqliteDedupIndex():
+    # Disk-backed lookup tables for the Deduplicator, for merges that do not fit in memory.
+    # Memory use is bounded by the SQLite page cache (cacheSize bytes) whatever the number of records.
+    def __init__(self, fileName, cacheSize=64*1024*1024, commitEvery=10000):
+        self.fileName = fileName
+        self.commitEvery = commitEvery
+        self.pending = 0
+
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(fileName)
+        self.db = sqlite3.connect(fileName, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode = OFF')
+        self.db.execute('PRAGMA synchronous = OFF')
+        self.db.execute('PRAGMA cache_size = '+str(-(cacheSize//1024)))
+        self.db.execute('CREATE TABLE keys (key TEXT PRIMARY KEY, id INTEGER) WITHOUT ROWID')
+        self.db.execute('CREATE TABLE buckets (band INTEGER, id INTEGER)')
+        self.db.execute('CREATE INDEX bucketsBand ON buckets (band)')
+        self.db.execute('CREATE TABLE records (id INTEGER PRIMARY KEY, title TEXT, source TEXT, signature BLOB, authors TEXT, doi TEXT)')
+
+    def getKey(self, key):
+        row = self.db.execute('SELECT id FROM keys WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def putKey(self, key, recordId):
+        self.db.execute('INSERT OR IGNORE INTO keys VALUES (?, ?)', (key, recordId))
+
+    def getBuckets(self, bands):
+        return [row[0] for row in self.db.execute('SELECT DISTINCT id FROM buckets WHERE band IN ('+','.join('?'*len(bands))+')', bands)]
+
+    def putBuckets(self, bands, recordId):
+        self.db.executemany('INSERT INTO buckets VALUES (?, ?)', [(band, recordId) for band in bands])
+
+    def addRecord(self, record):
+        (title, source, signature, authorTokens, doi) = record
+        if signature is not None:
+            signature = struct.pack('<'+str(len(signature))+'I', *signature)
+        recordId = self.db.execute('INSERT INTO records (title, source, signature, authors, doi) VALUES (?, ?, ?, ?, ?)', (title, source, signature, '\t'.join(authorTokens), doi)).lastrowid
+
+        # Commit in batches to keep the transaction small
+        self.pending += 1
+        if self.pending >= self.commitEvery:
+            self.db.commit()
+            self.pending = 0
+
+        return recordId
+
+    def getRecord(self, recordId):
+        (title, source, signature, authors, doi) = self.db.execute('SELECT title, source, signature, authors, doi FROM records WHERE id = ?', (recordId,)).fetchone()
+        if signature is not None:
+            signature = struct.unpack('<'+str(len(signature)//4)+'I', signature)
+        return (title, source, signature, frozenset(authors.split('\t')) if authors else frozenset(), doi)
+
+    def close(self):
+        self.db.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.fileName)
+
+class Deduplicator():
+    # Three stage de-duplication, each stage can be switched off or tuned:
+    #  1. exact match on an identifier taken from the source URL (DOI, PubMed id, arXiv id or the URL itself)
+    #  2. exact match on the normalised title (case, accents, HTML entities, markup and punctuation removed)
+    #  3. near duplicates: MinHash signatures of the title shingles are bucketed with LSH and a candidate is a
+    #     duplicate when the estimated title similarity reaches nearThreshold and, where both records list
+    #     authors, the author overlap reaches authorThreshold. Two records with different DOIs are never near
+    #     duplicates, however alike their titles.
+    # Each record is only compared with the few records sharing a key or bucket, so the merge is linear in
+    # the number of records. The first record seen is kept and every merge is passed to onMerge, or kept
+    # in self.merges when there is no onMerge. The lookup tables live in index, a DedupIndex in memory
+    # or a SqliteDedupIndex on disk.
+    def __init__(self, useIds=True, useTitles=True, nearThreshold=0.8, authorThreshold=0.2, numPerm=64, bands=16, index=None, onMerge=None):
+        self.useIds = useIds
+        self.useTitles = useTitles
+        self.nearThreshold = nearThreshold
+        self.authorThreshold = authorThreshold
+        self.numPerm = numPerm
+        self.bands = bands
+        self.rows = numPerm//bands
+        self.index = index if index is not None else DedupIndex()
+        self.merges = []
+        self.onMerge = onMerge if onMerge is not None else self.merges.append
+        self.mergeCount = 0
+        # Near duplicates kept apart because their DOIs differ
+        self.rejected = 0
+
+        self.unpackFormat = '<'+str(numPerm)+'I'
+
+    def signature(self, words):
+        # MinHash over word unigrams and bigrams of the normalised title
+        shingles = set(words)
+        shingles.update(a+' '+b for (a, b) in zip(words, words[1:]))
+        # One extendable-output hash per shingle gives numPerm independent 32 bit hash values
+        hashes = [struct.unpack(self.unpackFormat, hashlib.shake_128(shingle.encode('utf-8')).digest(4*self.numPerm)) for shingle in shingles]
+        return tuple(map(min, zip(*hashes)))
+
+    def authorTokens(self, authors):
+        tokens = set(normaliseTitle(authors or '').split())
+        tokens.discard('not')
+        tokens.discard('available')
+        return frozenset(token for token in tokens if len(token) > 2 and not token.isdigit())
+
+    def add(self, title, authors='', source='', doi=''):
+        # Check a record against everything kept so far. Returns None when it is new (and keeps it),
+        # otherwise (keptTitle, keptSource, stage, score) for the record it duplicates.
+        found = 'doi:'+doi.strip().lower() if doi.strip() else identifier(source)
+        recordDoi = found[4:] if found and found.startswith('doi:') else ''
+        key = found if self.useIds else None
+        if key:
+            keptId = self.index.getKey(key)
+            if keptId is not None:
+                return self.merge(keptId, title, source, 'id', 1.0)
+
+        normalised = normaliseTitle(title)
+        titleKey = 'title:'+normalised
+        if self.useTitles and normalised:
+            keptId = self.index.getKey(titleKey)
+            if keptId is not None:
+                return self.merge(keptId, title, source, 'title', 1.0)
+
+        words = normalised.split()
+        signature = None
+        authorTokens = frozenset()
+        bands = []
+        if self.nearThreshold and len(words) >= 3:
+            signature = self.signature(words)
+            authorTokens = self.authorTokens(authors)
+            bands = [hash((band,)+signature[band*self.rows:(band+1)*self.rows]) for band in range(self.bands)]
+
+            for candidateId in sorted(self.index.getBuckets(bands)):
+                score = self.similarity(signature, authorTokens, self.index.getRecord(candidateId), title, recordDoi)
+                if score is not None:
+                    return self.merge(candidateId, title, source, 'near', score)
+
+        # A new record
+        recordId = self.index.addRecord((title, source, signature, authorTokens, recordDoi))
+        if key:
+            self.index.putKey(key, recordId)
+        if self.useTitles and normalised:
+            self.index.putKey(titleKey, recordId)
+        if bands:
+            self.index.putBuckets(bands, recordId)
+
+        return None
+
+    def similarity(self, signature, authorTokens, candidate, title='', doi=''):
+        # The estimated similarity of a record (its title and DOI given for the log) to a candidate, None when
+        # the candidate is not a near duplicate
+        (candidateTitle, source, candidateSignature, candidateAuthors, candidateDoi) = candidate
+        if candidateSignature is None:
+            return None
+
+        score = sum(1 for (a, b) in zip(signature, candidateSignature) if a == b)/self.numPerm
+        if score < self.nearThreshold:
+            return None
+
+        if doi and candidateDoi and doi != candidateDoi:
+            self.rejected += 1
+            print('Not merged, different DOIs: '+title+' ('+doi+') and '+candidateTitle+' ('+candidateDoi+'), similarity '+str(round(score, 3)))
+            return None
+
+        if authorTokens and candidateAuthors:
+            overlap = len(authorTokens & candidateAuthors)/min(len(authorTokens), len(candidateAuthors))
+            if overlap < self.authorThreshold:
+                return None
+
+        return score
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, traceback):
+        self.index.close()
+
+    def merge(self, keptId, title, source, stage, score):
+        (keptTitle, keptSource, signature, authorTokens, keptDoi) = self.index.getRecord(keptId)
+        match = (keptTitle, keptSource, stage, round(score, 3))
+        self.onMerge((keptTitle, keptSource, title, source, stage, round(score, 3)))
+        self.mergeCount += 1
+        return match
@@ -0,0 +1,196 @@
+"""
+Metadata enrichment from Crossref for records missing a DOI, abstract or author list.
+"""
+
+import functools
+import html
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from .dedup import identifier, normaliseTitle
+from .fetch import CacheMissError
+
+class EnrichmentCache():
+    # Persistent metadata per record for the Enricher, keyed on 'doi:', 'pmid:', 'arxiv:' and 'title:' identifiers.
+    # An empty entry records a failed lookup so it is not repeated. The file sits in the response cache directory
+    # and is shared by every run and every query of a batch.
+    def __init__(self, fileName):
+        os.makedirs(os.path.dirname(fileName) or '.', exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(fileName, timeout=30, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        with self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS records (key TEXT PRIMARY KEY, value TEXT, stored REAL)')
+
+    def get(self, keys):
+        # {key: metadata} for the keys that are cached
+        found = {}
+        keys = list(keys)
+        with self.lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i+500]
+                for (key, value) in self.db.execute('SELECT key, value FROM records WHERE key IN ('+','.join('?' for key in chunk)+')', chunk):
+                    found[key] = json.loads(value)
+        return found
+
+    def put(self, entries):
+        # entries is a list of (key, metadata)
+        now = time.time()
+        with self.lock, self.db:
+            self.db.executemany('INSERT OR REPLACE INTO records (key, value, stored) VALUES (?, ?, ?)', [(key, json.dumps(value), now) for (key, value) in entries])
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+class Enricher():
+    # Fills in the DOI, abstract, venue and full author list of a page of papers from Crossref. Papers with a DOI are
+    # looked up in batches with filter=doi:..., papers with only a title (Google Scholar, ResearchGate) are resolved
+    # with a bibliographic query and accepted when the titles agree. Lookups run concurrently, the rate limiter keeps
+    # them within Crossref's limits, and every result, found or not, is cached by identifier across runs. A lookup that
+    # fails is not cached and is tried again next time. Offline only the cached metadata is used.
+    batchSize = 50
+    titleThreshold = 0.9
+    tagPattern = re.compile(r'<[^>]+>')
+
+    def __init__(self, http, cache, workers=4, resolveTitles=True, mailto=None, offline=False):
+        self.http = http
+        self.cache = cache
+        self.workers = workers
+        self.resolveTitles = resolveTitles
+        self.mailto = mailto
+        self.offline = offline
+
+    def keys(self, paper):
+        # Every identifier the paper is known by, best first
+        keys = []
+        if paper.doi:
+            keys.append('doi:'+paper.doi.lower())
+        found = identifier(paper.source)
+        if found and not found.startswith('url:') and found not in keys:
+            keys.append(found)
+        normalised = normaliseTitle(paper.title)
+        if normalised:
+            keys.append('title:'+normalised)
+        return keys
+
+    def needs(self, paper):
+        return not (paper.doi and paper.abstract and self.hasAuthors(paper))
+
+    def hasAuthors(self, paper):
+        # Google Scholar and ResearchGate give a shortened author line
+        authors = str(paper.authors)
+        return authors not in ('', '-', 'Not available') and '…' not in authors and ' - ' not in authors
+
+    def enrich(self, papers, resolveTitles=True):
+        # Returns the number of papers that were filled in. resolveTitles False leaves papers without a DOI to the
+        # cache, for sources whose records carry their own identifiers.
+        resolveTitles = resolveTitles and self.resolveTitles
+        papers = [paper for paper in papers if self.needs(paper)]
+        if not papers:
+            return 0
+
+        keysByPaper = [self.keys(paper) for paper in papers]
+        found = self.cache.get(key for keys in keysByPaper for key in keys)
+
+        # What the cache cannot answer: DOIs for the batch lookups, titles to resolve
+        dois = []
+        titles = []
+        for keys in keysByPaper:
+            if not keys or any(key in found for key in keys):
+                continue
+            if keys[0].startswith('doi:'):
+                if keys[0][4:] not in dois:
+                    dois.append(keys[0][4:])
+            elif resolveTitles and keys[-1].startswith('title:') and keys[-1] not in titles:
+                titles.append(keys[-1])
+
+        if (dois or titles) and not self.offline:
+            # Each job is the keys it asks for and the lookup
+            jobs = [(['doi:'+doi for doi in dois[i:i+self.batchSize]], functools.partial(self.lookupDois, dois[i:i+self.batchSize])) for i in range(0, len(dois), self.batchSize)]
+            jobs += [([key], functools.partial(self.resolveTitle, key[6:])) for key in titles]
+            results = {}
+            answered = []
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for ((keys, job), entries) in zip(jobs, executor.map(lambda job: job[1](), jobs)):
+                    # A failed lookup is asked again next time
+                    if entries is not None:
+                        answered += keys
+                        results.update(entries)
+            # Not found is cached empty
+            for key in answered:
+                results.setdefault(key, {})
+            self.cache.put(list(results.items()))
+            found.update(results)
+
+        filled = 0
+        aliases = []
+        for (paper, keys) in zip(papers, keysByPaper):
+            metadata = next((found[key] for key in keys if found.get(key)), None)
+            if metadata:
+                self.apply(paper, metadata)
+                filled += 1
+                # The paper's other identifiers find the same record next time
+                aliases += [(key, metadata) for key in keys if key not in found]
+        if aliases:
+            self.cache.put(aliases)
+
+        return filled
+
+    def apply(self, paper, metadata):
+        paper.doi = paper.doi or metadata.get('doi', '')
+        paper.abstract = paper.abstract or metadata.get('abstract', '')
+        paper.venue = paper.venue or metadata.get('venue', '')
+        if metadata.get('authors') and not self.hasAuthors(paper):
+            paper.authors = metadata['authors']
+
+    def lookupDois(self, dois):
+        params = {'filter': ','.join('doi:'+doi for doi in dois), 'rows': len(dois)}
+        found = self.query(params)
+        if found is None:
+            return None
+        return [('doi:'+metadata['doi'], metadata) for metadata in found]
+
+    def resolveTitle(self, title):
+        # title is normalised. Accept the best bibliographic match only when its title agrees.
+        wanted = set(title.split())
+        found = self.query({'query.bibliographic': title, 'rows': 1})
+        if found is None:
+            return None
+        for metadata in found:
+            got = set(normaliseTitle(metadata['title']).split())
+            if wanted and len(wanted & got)/len(wanted | got) >= self.titleThreshold:
+                return [('doi:'+metadata['doi'], metadata), ('title:'+title, metadata)]
+        return []
+
+    def query(self, params):
+        # The metadata of the items found, None when the lookup failed
+        if self.mailto:
+            params['mailto'] = self.mailto
+        try:
+            items = json.loads(self.http.get('https://api.crossref.org/works?'+urllib.parse.urlencode(params)))['message']['items']
+        except CacheMissError:
+            # Offline or replaying and not cached, the paper is left as it is
+            return None
+        except (urllib.error.URLError, ValueError, KeyError) as e:
+            print('Crossref enrichment lookup failed: '+str(e))
+            return None
+        return [self.metadata(item) for item in items if item.get('DOI')]
+
+    def metadata(self, item):
+        authors = [(author.get('family', '')+','+author.get('given', '')).strip(',') for author in item.get('author', [])]
+        return {
+            'doi': item['DOI'].lower(),
+            'title': (item.get('title') or [''])[0],
+            'authors': ', '.join(authors),
+            'abstract': ' '.join(self.tagPattern.sub(' ', html.unescape(item.get('abstract', ''))).split()),
+            'venue': (item.get('container-title') or [''])[0],
+            'year': str(((item.get('issued') or item.get('created') or {}).get('date-parts') or [[None]])[0][0] or ''),
+        }
@@ -0,0 +1,451 @@
+"""
+Fetching: the concurrent engine that runs the sources, the response cache, per-host rate limits and the HTTP
+client with retries.
+"""
+
+import contextlib
+import email.utils
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from .metrics import Metrics
+
+class FetchEngine():
+    # Runs the blocking database fetchers concurrently on an asyncio event loop.
+    # maxConcurrency caps the number of sources in flight, maxPerHost caps the sources sharing one host
+    # (e.g. ACM, IEEE and Wiley all go through api.crossref.org).
+    def __init__(self, maxConcurrency=8, maxPerHost=2):
+        self.maxConcurrency = max(1, maxConcurrency)
+        self.maxPerHost = max(1, maxPerHost)
+
+    def run(self, jobs):
+        # jobs is a list of (name, host, function) tuples. Returns {name: exception or None}.
+        # asyncio is imported by the methods that use it, so importing litfetch does not load it.
+        import asyncio
+        with ThreadPoolExecutor(max_workers=self.maxConcurrency) as executor:
+            return asyncio.run(self.runAll(jobs, executor))
+
+    async def runAll(self, jobs, executor):
+        import asyncio
+        globalLimit = asyncio.Semaphore(self.maxConcurrency)
+        hostLimits = {}
+        for (name, host, function) in jobs:
+            hostLimits.setdefault(host, asyncio.Semaphore(self.maxPerHost))
+
+        start = time.time()
+        results = await asyncio.gather(*[self.runJob(name, function, executor, globalLimit, hostLimits[host]) for (name, host, function) in jobs])
+        print('All sources finished in '+str(round(time.time()-start, 1))+'s.')
+
+        return dict(results)
+
+    async def runJob(self, name, function, executor, globalLimit, hostLimit):
+        import asyncio
+        # Wait for the host slot first so a queued source never holds a global slot
+        async with hostLimit:
+            async with globalLimit:
+                start = time.time()
+                try:
+                    await asyncio.get_running_loop().run_in_executor(executor, function)
+                except Exception as e:
+                    print(name+' failed because: '+str(e))
+                    return (name, e)
+
+                print(name+' finished in '+str(round(time.time()-start, 1))+'s.')
+                return (name, None)
+
+class CacheMissError(Exception):
+    pass
+
+class ResponseCache():
+    # Persistent on-disk cache of HTTP responses, used by every database through HttpClient.
+    # Entries are gzip-compressed and keyed on the normalised URL and parameters. Each host has its own
+    # time to live and the least recently used entries are evicted once the cache grows past maxSize bytes.
+    # In offline mode only the cache is used, expired entries included, and a miss raises CacheMissError.
+    # A lock file next to an entry marks a URL being fetched, so processes sharing the cache (a batch run)
+    # wait for each other's download instead of asking the same question twice.
+
+    # Seconds to keep a response, by host. The NCBI entry is kept under the ~8 hour life of a WebEnv.
+    ttls = {
+        'scholar.google.co.uk': 7*86400,
+        'api.crossref.org': 7*86400,
+        'api.elsevier.com': 7*86400,
+        'api.springer.com': 7*86400,
+        'eutils.ncbi.nlm.nih.gov': 6*3600,
+        'www.researchgate.net': 86400,
+        'export.arxiv.org': 86400,
+        'zenodo.org': 86400,
+    }
+    defaultTtl = 86400
+
+    # Credentials are left out of the key so rotating an API key keeps the cache
+    secretParams = ('apikey', 'api_key')
+
+    # Seconds after which a lock file is taken to be left over from a killed process
+    lockTimeout = 600
+
+    def __init__(self, directory='.litfetch-cache', maxSize=500*1024*1024, offline=False):
+        self.directory = directory
+        self.maxSize = maxSize
+        self.offline = offline
+        self.lock = threading.Lock()
+        self.size = None
+
+    def key(self, url, params=None):
+        # Normalise the URL: lower case scheme and host, sorted query parameters merged with params
+        parts = urllib.parse.urlsplit(url)
+        query = urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if params:
+            for (name, value) in params.items():
+                if isinstance(value, dict):
+                    value = ','.join(k+':'+str(v) for (k, v) in sorted(value.items()))
+                query.append((name, str(value)))
+        query = sorted((name, value) for (name, value) in query if name.lower() not in self.secretParams)
+
+        return parts.scheme.lower()+'://'+parts.netloc.lower()+parts.path+'?'+urllib.parse.urlencode(query)
+
+    def path(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest+'.gz')
+
+    def fetch(self, url, loader, params=None, maxAge=None):
+        # Return the cached body for url, or call loader() for the bytes and store them. maxAge (seconds) shortens
+        # the host's time to live, 0 always fetches again.
+        key = self.key(url, params)
+        path = self.path(key)
+
+        entry = self.entry(url, params, maxAge)
+        if entry is not None:
+            return entry[1]
+
+        if self.offline:
+            raise CacheMissError('Offline and not cached: '+key)
+
+        with self.claim(path) as waited:
+            # Another process fetched it while this one waited
+            entry = self.read(path) if waited else None
+            if entry is not None:
+                return entry[1]
+
+            body = loader()
+            self.store(path, key, body)
+
+        return body
+
+    def entry(self, url, params=None, maxAge=None):
+        # (time stored, body) for a cached response still within its time to live, otherwise None
+        path = self.path(self.key(url, params))
+        host = urllib.parse.urlsplit(url).netloc.lower()
+        ttl = self.ttls.get(host, self.defaultTtl)
+        if maxAge is not None:
+            ttl = min(ttl, maxAge)
+
+        entry = self.read(path)
+        if entry is None or not (self.offline or time.time()-entry[0] < ttl):
+            return None
+        # Touch the entry, the modification time is the LRU order
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        return entry
+
+    @contextlib.contextmanager
+    def claim(self, path):
+        # Hold the lock file for path while the body is fetched. Yields True if another holder had to be waited for.
+        lock = path+'.lock'
+        os.makedirs(os.path.dirname(lock), exist_ok=True)
+        waited = False
+        while True:
+            try:
+                os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                waited = True
+                with contextlib.suppress(OSError):
+                    if time.time()-os.path.getmtime(lock) > self.lockTimeout:
+                        os.remove(lock)
+                        continue
+                time.sleep(0.1)
+
+        try:
+            yield waited
+        finally:
+            with contextlib.suppress(OSError):
+                os.remove(lock)
+
+    def read(self, path):
+        try:
+            with gzip.open(path, 'rb') as f:
+                meta = json.loads(f.readline().decode('utf-8'))
+                return (meta['stored'], f.read())
+        except (OSError, ValueError, KeyError, EOFError):
+            return None
+
+    def store(self, path, key, body):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = path+'.'+str(threading.get_ident())+'.tmp'
+        with gzip.open(temp, 'wb') as f:
+            f.write(json.dumps({'url': key, 'stored': time.time()}).encode('utf-8')+b'\n')
+            f.write(body)
+        os.replace(temp, path)
+
+        with self.lock:
+            if self.size is None:
+                self.size = sum(size for (mtime, size, entry) in self.entries())
+            else:
+                self.size += os.path.getsize(path)
+
+            if self.size > self.maxSize:
+                self.evict()
+
+    def entries(self):
+        for (root, dirs, files) in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.gz'):
+                    path = os.path.join(root, name)
+                    with contextlib.suppress(OSError):
+                        stat = os.stat(path)
+                        yield (stat.st_mtime, stat.st_size, path)
+
+    def evict(self):
+        # Remove the least recently used entries until the cache is back under 90% of maxSize
+        entries = sorted(self.entries())
+        self.size = sum(size for (mtime, size, path) in entries)
+        for (mtime, size, path) in entries:
+            if self.size <= self.maxSize*0.9:
+                break
+            with contextlib.suppress(OSError):
+                os.remove(path)
+                self.size -= size
+
+class FixtureStore(ResponseCache):
+    # Recorded responses for offline runs and benchmarks, replayed by benchmarks/mock_server.py. The same
+    # layout as the response cache, keyed on the URL without credentials, but entries never expire or get evicted.
+    def __init__(self, directory):
+        super().__init__(directory, maxSize=float('inf'), offline=True)
+
+    def record(self, url, body):
+        key = self.key(url)
+        self.store(self.path(key), key, body)
+
+    def lookup(self, url):
+        entry = self.read(self.path(self.key(url)))
+        return entry[1] if entry else None
+
+class RateLimiter():
+    # Token bucket per host. Each host gets (requests per second, burst) from its provider's published limits,
+    # overridable in .config as "rate.<host>: requests per second". A Retry-After pauses every request to that host.
+    defaultRates = {
+        'scholar.google.co.uk': (0.2, 1),        # one page every 5 seconds to prevent blocking of the web scraper
+        'api.crossref.org': (50, 10),            # X-Rate-Limit-Limit: 50 per second
+        'api.elsevier.com': (2, 2),              # ScienceDirect Search: 2 per second
+        'api.springer.com': (100/60, 1),         # 100 per minute
+        'eutils.ncbi.nlm.nih.gov': (3, 3),       # 3 per second, 10 with an API key
+        'www.researchgate.net': (0.5, 1),
+        'export.arxiv.org': (1/3, 1),            # one request every 3 seconds
+        'zenodo.org': (0.5, 1),                  # 30 searches per minute for guests
+        'api.opencitations.net': (5, 5),         # no published limit, kept low for snowballing
+    }
+    defaultRate = (1, 1)
+
+    def __init__(self, rates=None, share=1):
+        self.rates = dict(self.defaultRates)
+        self.rates.update(rates or {})
+        # Processes running side by side (a batch run) each get an equal share of every host's limit
+        if share > 1:
+            self.rates = {host: (rate/share, max(1, burst/share)) for (host, (rate, burst)) in self.rates.items()}
+        self.lock = threading.Lock()
+        # host: [tokens, last refill, paused until]
+        self.buckets = {}
+
+    def bucket(self, host):
+        (rate, burst) = self.rates.get(host, self.defaultRate)
+        return self.buckets.setdefault(host, [burst, time.time(), 0])
+
+    def acquire(self, host):
+        # Block until host has a token
+        while True:
+            with self.lock:
+                (rate, burst) = self.rates.get(host, self.defaultRate)
+                bucket = self.bucket(host)
+                now = time.time()
+                bucket[0] = min(burst, bucket[0]+(now-bucket[1])*rate)
+                bucket[1] = now
+                if now >= bucket[2] and bucket[0] >= 1:
+                    bucket[0] -= 1
+                    return
+                wait = max(bucket[2]-now, (1-bucket[0])/rate)
+
+            time.sleep(wait)
+
+    def pause(self, host, seconds):
+        with self.lock:
+            bucket = self.bucket(host)
+            bucket[2] = max(bucket[2], time.time()+seconds)
+
+class Transport():
+    # The one HTTP connection pool behind every request: a requests Session shared by all the sources and threads,
+    # keeping up to poolSize connections alive per host, so PubMed's or arXiv's hundreds of pages reuse a few
+    # connections instead of a TCP and TLS handshake each. Responses are asked for compressed (gzip and deflate,
+    # br and zstd too when urllib3 can decode them) and decoded as they are read. requests is imported with the
+    # first request. Network failures and timeouts are raised as urllib.error.URLError.
+    def __init__(self, poolSize=8, connectTimeout=10, readTimeout=60):
+        self.poolSize = poolSize
+        self.connectTimeout = connectTimeout
+        self.readTimeout = readTimeout
+        self.session = None
+        self.proxies = {}
+        # host: proxies for that host, after NO_PROXY
+        self.hostProxies = {}
+        self.lock = threading.Lock()
+
+    def getSession(self):
+        with self.lock:
+            if self.session is None:
+                import http.cookiejar
+                import requests
+                import requests.adapters
+                import urllib.request
+                import urllib3.util.request
+
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=32, pool_maxsize=self.poolSize, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['Accept-Encoding'] = urllib3.util.request.ACCEPT_ENCODING
+                # No cookies, every request stands alone as it did with urllib
+                session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+                # Proxies are read from the environment once, not looked up again for every request, and hosts in
+                # NO_PROXY (the mock server on 127.0.0.1, intranet hosts) are reached directly. trust_env would also
+                # send .netrc credentials.
+                session.trust_env = False
+                self.proxies = {scheme: proxy for (scheme, proxy) in urllib.request.getproxies().items() if scheme != 'no'}
+                self.hostProxies = {}
+                self.session = session
+            return self.session
+
+    def get(self, url, headers=None):
+        # Returns (status, reason, headers, body), following redirects
+        session = self.getSession()
+        import requests
+        try:
+            response = session.get(url, headers=headers, proxies=self.proxiesFor(url), timeout=(self.connectTimeout, self.readTimeout))
+            return (response.status_code, response.reason, response.headers, response.content)
+        except requests.RequestException as e:
+            raise urllib.error.URLError(e)
+
+    def proxiesFor(self, url):
+        # The environment's proxies, or none for a host NO_PROXY bypasses
+        host = urllib.parse.urlsplit(url).netloc
+        proxies = self.hostProxies.get(host)
+        if proxies is None:
+            from urllib.request import proxy_bypass
+            proxies = {} if not self.proxies or proxy_bypass(host) else self.proxies
+            self.hostProxies[host] = proxies
+        return proxies
+
+    def close(self):
+        with self.lock:
+            if self.session is not None:
+                self.session.close()
+                self.session = None
+
+class HttpClient():
+    # Every database request goes through here: the response cache first, then the host's rate limit, then
+    # the pooled Transport. 429 and 5xx responses and connection errors are retried with exponential backoff and full jitter,
+    # waiting at least as long as the server's Retry-After. The error is raised once maxRetries is used up.
+    # With a recorder every response is also kept as a fixture, with replay every request goes to a mock server.
+    retryStatuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, cache, limiter, maxRetries=5, backoff=1, maxBackoff=60, transport=None, recorder=None, replay=None, metrics=None):
+        self.cache = cache
+        self.metrics = metrics or Metrics()
+        self.limiter = limiter
+        self.maxRetries = maxRetries
+        self.backoff = backoff
+        self.maxBackoff = maxBackoff
+        self.transport = transport or Transport()
+        self.recorder = recorder
+        self.replay = replay.rstrip('/') if replay else None
+
+    def get(self, url, headers=None, maxAge=None):
+        # Cached under the URL actually requested, so a replayed response is never served to a live run.
+        # maxAge shortens the cache's time to live for this request, 0 always goes to the server.
+        body = self.cache.fetch(self.route(url), lambda: self.load(url, headers), maxAge=maxAge)
+        self.received(url, body)
+        return body
+
+    def cached(self, url):
+        # (time stored, body) when the response to url is in the cache, None otherwise. Never makes a request.
+        entry = self.cache.entry(self.route(url))
+        if entry is not None:
+            self.received(url, entry[1])
+        return entry
+
+    def received(self, url, body):
+        self.metrics.response(urllib.parse.urlsplit(url).netloc.lower(), len(body))
+        if self.recorder:
+            self.recorder.record(url, body)
+
+    def route(self, url):
+        # In replay mode https://host/path?query is requested as <replay>/https/host/path?query
+        if not self.replay:
+            return url
+        parts = urllib.parse.urlsplit(url)
+        return self.replay+'/'+parts.scheme+'/'+parts.netloc+parts.path+('?'+parts.query if parts.query else '')
+
+    def load(self, url, headers=None):
+        host = urllib.parse.urlsplit(url).netloc.lower()
+        attempt = 0
+        while True:
+            self.limiter.acquire(host)
+            retryAfter = None
+            start = time.perf_counter()
+            try:
+                (status, statusReason, responseHeaders, body) = self.transport.get(self.route(url), headers)
+                if status < 400:
+                    self.metrics.request(host, status, time.perf_counter()-start, len(body))
+                    return body
+
+                # Failed responses are raised as urllib did
+                self.metrics.request(host, status, time.perf_counter()-start, 0)
+                if status not in self.retryStatuses or attempt >= self.maxRetries:
+                    raise urllib.error.HTTPError(url, status, statusReason, responseHeaders, None)
+                retryAfter = self.retryAfter(responseHeaders.get('Retry-After'))
+                reason = 'HTTP '+str(status)
+            except urllib.error.HTTPError:
+                raise
+            except (urllib.error.URLError, ConnectionError, TimeoutError) as e:
+                self.metrics.request(host, 'error', time.perf_counter()-start, 0)
+                if attempt >= self.maxRetries:
+                    raise
+                reason = str(e)
+
+            delay = random.uniform(0, min(self.maxBackoff, self.backoff*2**attempt))
+            if retryAfter is not None:
+                delay = max(delay, retryAfter)
+                self.limiter.pause(host, retryAfter)
+
+            attempt += 1
+            self.metrics.retry(host)
+            print(host+' '+reason+', retry '+str(attempt)+' of '+str(self.maxRetries)+' in '+str(round(delay, 1))+'s')
+            time.sleep(delay)
+
+    def retryAfter(self, value):
+        # Retry-After is either a number of seconds or an HTTP date
+        if not value:
+            return None
+        try:
+            return max(0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0, email.utils.parsedate_to_datetime(value).timestamp()-time.time())
+        except (TypeError, ValueError):
+            return None
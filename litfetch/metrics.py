@@ -0,0 +1,180 @@
+"""
+Run metrics: per-host request counters, stage timings and record counts, with JSON and Prometheus output.
+"""
+
+import contextlib
+import json
+import sys
+import threading
+import time
+
+class Metrics():
+    # Run-level instrumentation shared by every source. HttpClient reports each request attempt (latency, status,
+    # bytes, retries) and the pipeline reports span timings for the fetch, parse, filter, dedup and write stages.
+    # summary() is written as JSON and prometheus() in the Prometheus text exposition format at the end of a run.
+    # With progress on, a live line with the records so far and an ETA against the expected totals goes to stderr.
+    # Outcomes that count towards the progress line: parsed by a source, or read by de-duplication
+    processed = ('parsed', 'unique', 'merged')
+
+    def __init__(self, progress=False, interval=1):
+        self.progress = progress
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.lastProgress = 0
+        # host: counters, (host, status): requests
+        self.hosts = {}
+        self.statuses = {}
+        # (source, stage): [calls, seconds]
+        self.stages = {}
+        # source: {outcome: records}
+        self.records = {}
+        # source: records the source is expected to return
+        self.expected = {}
+
+    def host(self, host):
+        return self.hosts.setdefault(host, {'requests': 0, 'retries': 0, 'errors': 0, 'bytes': 0, 'seconds': 0, 'maxSeconds': 0, 'responses': 0, 'responseBytes': 0})
+
+    def request(self, host, status, seconds, size):
+        # One attempt over the network, status is the HTTP status or 'error' for a connection failure
+        with self.lock:
+            counters = self.host(host)
+            counters['requests'] += 1
+            counters['bytes'] += size
+            counters['seconds'] += seconds
+            counters['maxSeconds'] = max(counters['maxSeconds'], seconds)
+            if status == 'error' or status >= 400:
+                counters['errors'] += 1
+            self.statuses[(host, str(status))] = self.statuses.get((host, str(status)), 0)+1
+
+    def retry(self, host):
+        with self.lock:
+            self.host(host)['retries'] += 1
+
+    def response(self, host, size):
+        # A body handed to a source, from the network or the cache
+        with self.lock:
+            counters = self.host(host)
+            counters['responses'] += 1
+            counters['responseBytes'] += size
+
+    @contextlib.contextmanager
+    def span(self, source, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addSpan(source, stage, time.perf_counter()-start)
+
+    def addSpan(self, source, stage, seconds, calls=1):
+        # Per-record stages are timed locally and added a page at a time
+        with self.lock:
+            span = self.stages.setdefault((source, stage), [0, 0])
+            span[0] += calls
+            span[1] += seconds
+
+    def count(self, source, outcome, records=1):
+        with self.lock:
+            counts = self.records.setdefault(source, {})
+            counts[outcome] = counts.get(outcome, 0)+records
+        self.showProgress()
+
+    def expect(self, source, records):
+        with self.lock:
+            self.expected[source] = records
+
+    def showProgress(self, force=False):
+        if not self.progress:
+            return
+        now = time.time()
+        with self.lock:
+            if not force and now-self.lastProgress < self.interval:
+                return
+            self.lastProgress = now
+            done = sum(counts.get(outcome, 0) for counts in self.records.values() for outcome in self.processed)
+            expected = sum(max(self.expected.get(source, 0), self.records.get(source, {}).get('parsed', 0)) for source in set(self.expected) | set(self.records))
+            requests = sum(counters['requests'] for counters in self.hosts.values())
+
+        elapsed = now-self.started
+        line = str(done)+' records, '+str(requests)+' requests, '+str(round(done/elapsed if elapsed else 0))+' records/s'
+        if expected and done:
+            remaining = elapsed*(expected-done)/done
+            line += ', '+str(round(100*done/expected))+'%, ETA '+time.strftime('%H:%M:%S', time.gmtime(remaining))
+        sys.stderr.write('\r'+line.ljust(79))
+        sys.stderr.flush()
+
+    def summary(self):
+        with self.lock:
+            elapsed = time.time()-self.started
+            hosts = {}
+            for (host, counters) in self.hosts.items():
+                hosts[host] = dict(counters)
+                # Every successful attempt hands one body to a source, the rest came from the cache
+                hosts[host]['cached'] = max(0, counters['responses']-(counters['requests']-counters['errors']))
+                hosts[host]['cachedBytes'] = max(0, counters['responseBytes']-counters['bytes'])
+                hosts[host]['meanSeconds'] = counters['seconds']/counters['requests'] if counters['requests'] else 0
+                hosts[host]['statuses'] = {status: count for ((name, status), count) in self.statuses.items() if name == host}
+
+            sources = {}
+            for ((source, stage), (calls, seconds)) in self.stages.items():
+                sources.setdefault(source, {'stages': {}, 'records': {}})['stages'][stage] = {'calls': calls, 'seconds': seconds}
+            for (source, counts) in self.records.items():
+                entry = sources.setdefault(source, {'stages': {}, 'records': {}})
+                entry['records'] = dict(counts)
+                fetch = entry['stages'].get('fetch', {}).get('seconds', 0)
+                total = sum(stage['seconds'] for stage in entry['stages'].values())
+                entry['recordsPerSecond'] = counts.get('parsed', 0)/total if total else 0
+                entry['fetchShare'] = fetch/total if total else 0
+
+            return {'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)), 'seconds': elapsed, 'hosts': hosts, 'sources': sources}
+
+    def prometheus(self):
+        summary = self.summary()
+        lines = []
+
+        def metric(name, kind, help, samples):
+            # samples are (suffix, labels, value)
+            lines.append('# HELP litfetch_'+name+' '+help)
+            lines.append('# TYPE litfetch_'+name+' '+kind)
+            for (suffix, labels, value) in samples:
+                label = ','.join(key+'="'+str(val).replace('\\', '\\\\').replace('"', '\\"')+'"' for (key, val) in labels)
+                lines.append('litfetch_'+name+suffix+('{'+label+'}' if label else '')+' '+repr(float(value)))
+
+        hosts = sorted(summary['hosts'].items())
+        sources = sorted(summary['sources'].items())
+        metric('run_seconds', 'gauge', 'Wall time of the run.', [('', (), summary['seconds'])])
+        metric('http_requests_total', 'counter', 'HTTP request attempts by host and status.',
+               [('', (('host', host), ('status', status)), count) for (host, counters) in hosts for (status, count) in sorted(counters['statuses'].items())])
+        metric('http_retries_total', 'counter', 'Retried HTTP requests.', [('', (('host', host),), counters['retries']) for (host, counters) in hosts])
+        metric('http_response_bytes_total', 'counter', 'Bytes received over the network.', [('', (('host', host),), counters['bytes']) for (host, counters) in hosts])
+        metric('http_cache_hits_total', 'counter', 'Responses served from the cache.', [('', (('host', host),), counters['cached']) for (host, counters) in hosts])
+        metric('http_request_seconds', 'summary', 'HTTP request latency.',
+               [(suffix, (('host', host),), value) for (host, counters) in hosts for (suffix, value) in (('_sum', counters['seconds']), ('_count', counters['requests']))])
+        metric('http_request_seconds_max', 'gauge', 'Slowest HTTP request.', [('', (('host', host),), counters['maxSeconds']) for (host, counters) in hosts])
+        metric('stage_seconds_total', 'counter', 'Time spent in each pipeline stage.',
+               [('', (('source', source), ('stage', stage)), values['seconds']) for (source, entry) in sources for (stage, values) in sorted(entry['stages'].items())])
+        metric('stage_calls_total', 'counter', 'Calls of each pipeline stage.',
+               [('', (('source', source), ('stage', stage)), values['calls']) for (source, entry) in sources for (stage, values) in sorted(entry['stages'].items())])
+        metric('records_total', 'counter', 'Records by source and outcome.',
+               [('', (('source', source), ('outcome', outcome)), count) for (source, entry) in sources for (outcome, count) in sorted(entry['records'].items())])
+
+        return '\n'.join(lines)+'\n'
+
+    def write(self, jsonFile, prometheusFile):
+        if self.progress:
+            self.showProgress(True)
+            sys.stderr.write('\n')
+        with open(jsonFile, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2, sort_keys=True)
+        with open(prometheusFile, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus())
+
+    def report(self):
+        # Where the time went, slowest source first
+        summary = self.summary()
+        for (source, entry) in sorted(summary['sources'].items(), key=lambda item: -sum(stage['seconds'] for stage in item[1]['stages'].values())):
+            stages = ', '.join(stage+' '+str(round(values['seconds'], 1))+'s' for (stage, values) in sorted(entry['stages'].items()))
+            records = ', '.join(str(count)+' '+outcome for (outcome, count) in sorted(entry['records'].items()) if count)
+            print(source+': '+records+'; '+stages)
+        for (host, counters) in sorted(summary['hosts'].items()):
+            print(host+': '+str(counters['requests'])+' requests, '+str(counters['retries'])+' retries, '+str(counters['cached'])+' cached, '+str(round(counters['bytes']/1024))+' KB, '+str(round(counters['meanSeconds'], 2))+'s mean latency')
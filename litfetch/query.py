@@ -0,0 +1,278 @@
+"""
+The boolean search string and the inclusion/exclusion screening rules.
+"""
+
+import re
+
+class SearchQuery():
+    # Boolean search string compiled once into a tree and written out in each database's syntax. Terms are words
+    # (a trailing * is a wildcard) or "quoted phrases", combined with AND, OR, NOT and parentheses. Adjacent terms
+    # are ANDed and -term is NOT term. Nodes are ('term', text, phrase), ('and', children), ('or', children) and
+    # ('not', child). matches() is a local matcher for the same expression, for databases that cannot apply it.
+    tokenPattern = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+    operators = ('AND', 'OR', 'NOT')
+
+    # Per dialect: term template, phrase template, AND, OR, AND NOT. None for AND NOT means the database has
+    # no exclusion, the NOT is left to the local matcher. A NOT that cannot be sent is left out in a way that only
+    # broadens the query (an OR with such a branch is dropped as a whole) and widened() tells the caller to match
+    # the results locally.
+    dialects = {
+        'arxiv': ('all:{}', 'all:"{}"', ' AND ', ' OR ', ' ANDNOT '),
+        'elsevier': ('{}', '"{}"', ' AND ', ' OR ', ' AND NOT '),
+        'pubmed': ('{}[tiab]', '"{}"[tiab]', ' AND ', ' OR ', ' NOT '),
+        'springer': ('{}', '"{}"', ' AND ', ' OR ', ' NOT '),
+        'zenodo': ('{}', '"{}"', ' AND ', ' OR ', ' AND NOT '),
+        'scholar': ('{}', '"{}"', ' ', ' OR ', ' -'),
+    }
+    # Databases without wildcards get the stem
+    noWildcards = ('arxiv', 'springer', 'scholar')
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = self.tokenise(text)
+        self.position = 0
+        self.tree = self.parseOr() if self.tokens else ('and', [])
+        if self.position < len(self.tokens):
+            raise ValueError('Unexpected '+self.tokens[self.position][1]+' in query: '+text)
+        # Only exclusions leave the databases nothing to search for
+        if self.tokens and not self.keywords():
+            raise ValueError('No term to search for in query: '+text)
+        self.matcher = None
+        self.widenedDialects = {}
+
+    def tokenise(self, text):
+        tokens = []
+        position = 0
+        text = text.strip()
+        while position < len(text):
+            match = self.tokenPattern.match(text, position)
+            if match is None or match.end() == position:
+                raise ValueError('Cannot parse query: '+text)
+            position = match.end()
+            if match.group(1):
+                tokens.append(('(', '('))
+            elif match.group(2):
+                tokens.append((')', ')'))
+            elif match.group(3) is not None:
+                tokens.append(('phrase', ' '.join(match.group(3).split())))
+            elif match.group(4) in self.operators:
+                tokens.append((match.group(4), match.group(4)))
+            else:
+                tokens.append(('word', match.group(4)))
+        return tokens
+
+    def peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def parseOr(self):
+        children = [self.parseAnd()]
+        while self.peek() == 'OR':
+            self.position += 1
+            children.append(self.parseAnd())
+        return self.node('or', children)
+
+    def parseAnd(self):
+        children = [self.parseUnary()]
+        while self.peek() in ('AND', 'NOT', '(', 'word', 'phrase'):
+            if self.peek() == 'AND':
+                self.position += 1
+            children.append(self.parseUnary())
+        return self.node('and', children)
+
+    def parseUnary(self):
+        kind = self.peek()
+        if kind == 'NOT':
+            self.position += 1
+            return ('not', self.parseUnary())
+        if kind == '(':
+            self.position += 1
+            node = self.parseOr()
+            if self.peek() != ')':
+                raise ValueError('Unbalanced parentheses in query: '+self.text)
+            self.position += 1
+            return node
+        if kind == 'phrase':
+            self.position += 1
+            return ('term', self.tokens[self.position-1][1], True)
+        if kind == 'word':
+            self.position += 1
+            word = self.tokens[self.position-1][1]
+            if word.startswith('-') and len(word) > 1:
+                return ('not', ('term', word[1:], False))
+            return ('term', word, False)
+        raise ValueError('Expected a term in query: '+self.text)
+
+    def node(self, kind, children):
+        # Flatten (a AND (b AND c)) and drop single child groups
+        flat = []
+        for child in children:
+            flat += child[1] if child[0] == kind else [child]
+        return flat[0] if len(flat) == 1 else (kind, flat)
+
+    def emit(self, dialect):
+        # The query in a database's syntax. 'keywords' is the positive terms as a plain bag of words, for
+        # relevance ranked APIs such as Crossref that ignore boolean operators.
+        if dialect == 'keywords':
+            return ' '.join(self.keywords())
+        syntax = self.dialects[dialect]
+        text = self.render(self.tree, dialect, syntax)
+        if not text:
+            # Nothing is left to send (every branch of an OR has a NOT), the broadest query is any of the keywords
+            text = syntax[3].join(syntax[0].format(word) for word in self.keywords())
+        return text
+
+    def widened(self, dialect):
+        # True when emit(dialect) is broader than the query because a NOT could not be sent, so the results have to
+        # be checked with matches(). The keywords dialect never carries the boolean structure, see localMatch.
+        if dialect == 'keywords':
+            return False
+        if dialect not in self.widenedDialects:
+            self.widenedDialects[dialect] = not self.expressible(self.tree, dialect)
+        return self.widenedDialects[dialect]
+
+    def expressible(self, node, dialect):
+        if node[0] == 'term':
+            return True
+        if node[0] == 'not':
+            return False
+        if node[0] == 'or':
+            return all(self.expressible(child, dialect) for child in node[1])
+        positive = [child for child in node[1] if child[0] != 'not']
+        excluded = [child[1] for child in node[1] if child[0] == 'not']
+        if not all(self.expressible(child, dialect) for child in positive):
+            return False
+        if excluded and (not positive or not self.dialects[dialect][4]):
+            return False
+        for child in excluded:
+            sent = self.exclusions(child, dialect)
+            if not sent or not all(self.expressible(part, dialect) for part in sent):
+                return False
+        return True
+
+    def render(self, node, dialect, syntax):
+        (termFormat, phraseFormat, andText, orText, notText) = syntax
+        if node[0] == 'term':
+            text = node[1].rstrip('*') if dialect in self.noWildcards else node[1]
+            return (phraseFormat if node[2] else termFormat).format(text)
+
+        if node[0] == 'not':
+            # A NOT on its own cannot be sent, only "x AND NOT y". '' stands for a part that matches anything.
+            return ''
+
+        if node[0] == 'or':
+            parts = [self.group(child, 'or', dialect, syntax) for child in node[1]]
+            # A branch that matches anything makes the whole OR match anything
+            return orText.join(parts) if all(parts) else ''
+
+        positive = [self.group(child, 'and', dialect, syntax) for child in node[1] if child[0] != 'not']
+        text = andText.join(part for part in positive if part)
+        if text and notText:
+            for child in node[1]:
+                if child[0] == 'not':
+                    for excluded in self.exclusions(child[1], dialect):
+                        excludedText = self.group(excluded, 'not', dialect, syntax)
+                        if excludedText:
+                            text += notText+excludedText
+        return text
+
+    def exclusions(self, node, dialect):
+        # Scholar only excludes single terms, NOT (a OR b) becomes -a -b
+        if dialect == 'scholar':
+            if node[0] == 'term':
+                return [node]
+            if node[0] == 'or' and all(child[0] == 'term' for child in node[1]):
+                return node[1]
+            return []
+        return [node]
+
+    def group(self, node, parent, dialect, syntax):
+        text = self.render(node, dialect, syntax)
+        if node[0] in ('and', 'or') and node[0] != parent and len(node[1]) > 1 and text:
+            return '('+text+')'
+        return text
+
+    def keywords(self):
+        words = []
+        def collect(node):
+            if node[0] == 'term':
+                if node[1].rstrip('*') not in words:
+                    words.append(node[1].rstrip('*'))
+            elif node[0] in ('and', 'or'):
+                for child in node[1]:
+                    collect(child)
+        collect(self.tree)
+        return words
+
+    def matches(self, text):
+        # True if text satisfies the whole expression, matching whole words without case
+        if self.matcher is None:
+            self.matcher = self.compile(self.tree)
+        return self.matcher(text)
+
+    def compile(self, node):
+        if node[0] == 'term':
+            words = [re.escape(word.rstrip('*'))+(r'\w*' if word.endswith('*') else '') for word in node[1].split()]
+            pattern = re.compile(r'\b'+r'[\s\-]+'.join(words)+r'\b', re.IGNORECASE)
+            return lambda text: pattern.search(text) is not None
+        if node[0] == 'not':
+            child = self.compile(node[1])
+            return lambda text: not child(text)
+        children = [self.compile(child) for child in node[1]]
+        if node[0] == 'and':
+            return lambda text: all(child(text) for child in children)
+        return lambda text: any(child(text) for child in children)
+
+class Screener():
+    # Inclusion and exclusion criteria, each rule compiled into one regular expression over its terms and matched on
+    # its own, so a term of one rule never hides an overlapping term of another. A rule is a code and its terms.
+    # A paper has to match at least one term of every inclusion rule and none of any exclusion rule. screen()
+    # returns '' for an included paper, otherwise the code of the first inclusion rule it misses or the first
+    # exclusion rule it matches. Words are lightly stemmed, so "prediction" matches predict, predicted, predicting
+    # and predictive. A trailing * is a wildcard.
+    # -ies and a -y after a consonant both come off, so activity and activities share the stem activit (survey keeps
+    # its y)
+    suffixes = ('ations', 'ation', 'ings', 'ing', 'ions', 'ion', 'ives', 'ive', 'ers', 'er', 'ed', 'ies', 'es', 's', 'ly', 'y')
+    minStem = 4
+
+    def __init__(self, include=None, exclude=None):
+        # include and exclude are lists of (code, [terms]), kept as (code, pattern). A rule without terms never matches.
+        self.include = [(code, self.rulePattern(terms)) for (code, terms) in include or []]
+        self.exclude = [(code, self.rulePattern(terms)) for (code, terms) in exclude or []]
+
+    @classmethod
+    def fromConfig(cls, config, defaultInclude=None):
+        # "include.IC1: predict, forecast" and "exclude.EC1: survey, systematic review" in .config
+        rules = {'include': [], 'exclude': []}
+        for (key, value) in config.items():
+            (kind, dot, code) = key.partition('.')
+            if kind in rules and dot and code:
+                rules[kind].append((code, [term.strip() for term in value.split(',') if term.strip()]))
+        if not rules['include'] and not rules['exclude']:
+            rules['include'] = defaultInclude or []
+        return cls(rules['include'], rules['exclude'])
+
+    def stem(self, word):
+        for suffix in self.suffixes:
+            if word.endswith(suffix) and len(word)-len(suffix) >= self.minStem:
+                if suffix == 'y' and word[-2] in 'aeiou':
+                    continue
+                return word[:-len(suffix)]
+        return word
+
+    def rulePattern(self, terms):
+        return re.compile('|'.join(self.termPattern(term) for term in terms), re.IGNORECASE) if terms else None
+
+    def termPattern(self, term):
+        words = [re.escape(self.stem(word.rstrip('*').lower()))+r'\w*' for word in term.split()]
+        return r'\b'+r'[\s\-]+'.join(words)
+
+    def screen(self, text):
+        if not self.include and not self.exclude:
+            return ''
+        for (code, pattern) in self.include:
+            if pattern is None or not pattern.search(text):
+                return code
+        for (code, pattern) in self.exclude:
+            if pattern is not None and pattern.search(text):
+                return code
+        return ''
@@ -0,0 +1,237 @@
+"""
+Citation snowballing: backward through Crossref reference lists and forward through OpenCitations citations.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from .fetch import CacheMissError
+
+class SnowballStore():
+    # The state of a snowballing run in one SQLite file, committed after every batch so an interrupted run carries
+    # on where it stopped. papers holds every DOI reached, with its depth, how it was first reached (seed, backward
+    # or forward) and from which paper, whether it has been expanded and its metadata ('{}' when Crossref does not
+    # know it). citations holds the (citing, cited) edges found. The visited set is held in memory as 64-bit hashes
+    # of the DOIs rather than the DOI strings, and is rebuilt from the file on resume. A file written for a different
+    # search is started again.
+    def __init__(self, fileName, search, resume=False):
+        self.fileName = fileName
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(fileName, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        with self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS papers (doi TEXT PRIMARY KEY, depth INTEGER, direction TEXT, via TEXT, expanded INTEGER DEFAULT 0, metadata TEXT)')
+            self.db.execute('CREATE TABLE IF NOT EXISTS citations (citing TEXT, cited TEXT, PRIMARY KEY (citing, cited)) WITHOUT ROWID')
+            self.db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS papersDepth ON papers (depth, expanded)')
+
+        stored = self.db.execute("SELECT value FROM meta WHERE key = 'search'").fetchone()
+        self.resumed = resume and stored is not None and stored[0] == search
+        if not self.resumed:
+            with self.db:
+                for table in ('papers', 'citations', 'meta'):
+                    self.db.execute('DELETE FROM '+table)
+                self.db.execute("INSERT INTO meta (key, value) VALUES ('search', ?)", (search,))
+
+        self.visited = set(self.fingerprint(doi) for (doi,) in self.db.execute('SELECT doi FROM papers'))
+
+    @staticmethod
+    def fingerprint(doi):
+        return int.from_bytes(hashlib.blake2b(doi.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    def insertNew(self, papers):
+        # papers is a list of (doi, depth, direction, via), the ones already visited are skipped. Called in a transaction.
+        new = []
+        for paper in papers:
+            fingerprint = self.fingerprint(paper[0])
+            if fingerprint not in self.visited:
+                self.visited.add(fingerprint)
+                new.append(paper)
+        self.db.executemany('INSERT OR IGNORE INTO papers (doi, depth, direction, via) VALUES (?, ?, ?, ?)', new)
+        return len(new)
+
+    def add(self, papers):
+        with self.lock, self.db:
+            return self.insertNew(papers)
+
+    def frontier(self, depth):
+        # The DOIs at depth that have not been expanded yet
+        with self.lock:
+            return [doi for (doi,) in self.db.execute('SELECT doi FROM papers WHERE depth = ? AND expanded = 0 ORDER BY rowid', (depth,))]
+
+    def unresolved(self, depth):
+        # The DOIs at depth with no metadata yet
+        with self.lock:
+            return [doi for (doi,) in self.db.execute('SELECT doi FROM papers WHERE depth = ? AND metadata IS NULL ORDER BY rowid', (depth,))]
+
+    def saveBatch(self, metadata, references=(), citations=(), nextDepth=None):
+        # One batch in one transaction: the metadata of its papers, and for an expanded batch its (citing, cited)
+        # edges and the papers they reach at nextDepth. Returns the number of new papers.
+        with self.lock, self.db:
+            expanded = 1 if nextDepth is not None else 0
+            self.db.executemany('UPDATE papers SET metadata = ?, expanded = MAX(expanded, ?) WHERE doi = ?', [(json.dumps(value), expanded, doi) for (doi, value) in metadata.items()])
+            if nextDepth is None:
+                return 0
+            self.db.executemany('INSERT OR IGNORE INTO citations (citing, cited) VALUES (?, ?)', list(references)+list(citations))
+            papers = [(cited, nextDepth, 'backward', citing) for (citing, cited) in references]
+            papers += [(citing, nextDepth, 'forward', cited) for (citing, cited) in citations]
+            return self.insertNew(papers)
+
+    def papers(self):
+        # (doi, depth, direction, via, metadata) for every paper beyond the seeds, level by level
+        with self.lock:
+            rows = self.db.execute('SELECT doi, depth, direction, via, metadata FROM papers WHERE depth > 0 ORDER BY depth, rowid').fetchall()
+        for (doi, depth, direction, via, metadata) in rows:
+            yield (doi, depth, direction, via, json.loads(metadata) if metadata else None)
+
+    def citations(self):
+        with self.lock:
+            return self.db.execute('SELECT citing, cited FROM citations ORDER BY citing, cited').fetchall()
+
+    def count(self):
+        return len(self.visited)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+class Snowballer():
+    # Breadth-first snowballing from a list of seed DOIs, to depth levels. A level is expanded in batches: one
+    # Crossref filter=doi: request gives the metadata and reference lists of batchSize papers (backward), and the
+    # OpenCitations index gives the papers citing each of them (forward). DOIs not visited yet make up the next
+    # level, and the papers at the last level only have their metadata looked up, from the EnrichmentCache when it
+    # has them. Batches run on workers threads within each host's rate limit and every finished batch is committed
+    # to the SnowballStore, so an interrupted run only repeats the batches in flight. Every Crossref record fetched
+    # is added to the EnrichmentCache for later runs.
+    batchSize = 50
+    citationsUrl = 'https://api.opencitations.net/index/v2/citations/doi:'
+    # The citing paper's identifiers, "omid:br/... doi:10.1234/abc pmid:..."
+    citingPattern = re.compile(r'(?:^|\s)doi:(10\.\S+)')
+
+    def __init__(self, enricher, store, workers=8, direction='both', token=None, metrics=None):
+        self.enricher = enricher
+        self.http = enricher.http
+        self.store = store
+        self.workers = workers
+        self.backward = direction in ('both', 'backward')
+        self.forward = direction in ('both', 'forward')
+        self.token = token
+        self.metrics = metrics
+        self.failed = 0
+
+    @staticmethod
+    def normaliseDoi(doi):
+        doi = doi.strip().lower()
+        for prefix in ('https://doi.org/', 'http://doi.org/', 'https://dx.doi.org/', 'http://dx.doi.org/', 'doi:'):
+            if doi.startswith(prefix):
+                doi = doi[len(prefix):]
+        return doi
+
+    def run(self, seeds, depth):
+        # Returns the number of papers found beyond the seeds
+        self.store.add([(doi, 0, 'seed', '') for doi in seeds])
+        for level in range(depth):
+            frontier = self.store.frontier(level)
+            if frontier:
+                print('Level '+str(level+1)+': expanding '+str(len(frontier))+' papers...')
+                found = self.process(frontier, level+1)
+                print('Level '+str(level+1)+': '+str(found)+' new papers, '+str(self.store.count())+' visited.')
+
+        # The last level is not expanded, only its metadata is needed
+        unresolved = self.store.unresolved(depth)
+        if unresolved:
+            print('Looking up '+str(len(unresolved))+' papers at level '+str(depth)+'...')
+            self.process(unresolved, None)
+        return self.store.count()-len(seeds)
+
+    def process(self, dois, nextDepth):
+        # Expands the DOIs into nextDepth, or with nextDepth None only looks up their metadata
+        if nextDepth is None:
+            cached = self.enricher.cache.get('doi:'+doi for doi in dois)
+            self.store.saveBatch({doi: cached['doi:'+doi] for doi in dois if 'doi:'+doi in cached})
+            dois = [doi for doi in dois if 'doi:'+doi not in cached]
+
+        found = 0
+        batches = [dois[i:i+self.batchSize] for i in range(0, len(dois), self.batchSize)]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.expandBatch if nextDepth is not None else self.lookup, batch) for batch in batches]
+            for (index, batch) in enumerate(batches):
+                future = futures[index]
+                futures[index] = None
+                try:
+                    result = future.result()
+                except (urllib.error.URLError, ValueError, KeyError, CacheMissError) as e:
+                    # Left unexpanded for the next run, as is a batch an offline or replay run has no response for
+                    print('Snowballing failed for '+str(len(batch))+' papers: '+str(e))
+                    self.failed += len(batch)
+                    continue
+
+                if nextDepth is None:
+                    metadata = {doi: result.get(doi, ({}, []))[0] for doi in batch}
+                    self.store.saveBatch(metadata)
+                else:
+                    (metadata, references, citations) = result
+                    found += self.store.saveBatch(metadata, references, citations, nextDepth)
+                    if self.metrics is not None:
+                        self.metrics.count('snowball', 'references', len(references))
+                        self.metrics.count('snowball', 'citations', len(citations))
+                # Not found is cached too, as enrichment does
+                self.enricher.cache.put([('doi:'+doi, value) for (doi, value) in metadata.items()])
+                if self.metrics is not None:
+                    self.metrics.count('snowball', 'expanded' if nextDepth is not None else 'resolved', len(batch))
+        return found
+
+    def expandBatch(self, dois):
+        # Returns ({doi: metadata}, references, citations), the last two as (citing, cited) pairs
+        found = self.lookup(dois)
+        metadata = {doi: found.get(doi, ({}, []))[0] for doi in dois}
+        references = []
+        citations = []
+        if self.backward:
+            references = [(doi, cited) for doi in dois if doi in found for cited in found[doi][1] if cited != doi]
+        if self.forward:
+            for doi in dois:
+                citations += [(citing, doi) for citing in self.citations(doi) if citing != doi]
+        return (metadata, references, citations)
+
+    def lookup(self, dois):
+        # {doi: (metadata, [referenced DOIs])} for the DOIs Crossref knows
+        params = {'filter': ','.join('doi:'+doi for doi in dois), 'rows': len(dois)}
+        if self.enricher.mailto:
+            params['mailto'] = self.enricher.mailto
+        start = time.perf_counter()
+        items = json.loads(self.http.get('https://api.crossref.org/works?'+urllib.parse.urlencode(params)))['message']['items']
+        found = {}
+        for item in items:
+            if item.get('DOI'):
+                metadata = self.enricher.metadata(item)
+                found[metadata['doi']] = (metadata, [self.normaliseDoi(reference['DOI']) for reference in item.get('reference', []) if reference.get('DOI')])
+        if self.metrics is not None:
+            self.metrics.addSpan('snowball', 'crossref', time.perf_counter()-start, 1)
+        return found
+
+    def citations(self, doi):
+        # The DOIs of the papers citing doi
+        start = time.perf_counter()
+        try:
+            body = self.http.get(self.citationsUrl+urllib.parse.quote(doi, safe='/'), {'authorization': self.token} if self.token else None)
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return []
+            raise
+        dois = []
+        for citation in json.loads(body):
+            found = self.citingPattern.search(citation.get('citing', ''))
+            if found:
+                dois.append(self.normaliseDoi(found.group(1)))
+        if self.metrics is not None:
+            self.metrics.addSpan('snowball', 'citations', time.perf_counter()-start, 1)
+        return dois
@@ -0,0 +1,572 @@
+"""
+The databases. Each connector builds its requests and parses the results into Papers. lxml, BeautifulSoup and
+ElementTree are only imported when a source that parses HTML or XML runs.
+"""
+
+import html
+import io
+import json
+import re
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from .enrich import Enricher
+
+class Paper():
+    # One search result, normalised by Litfetch.normalisePaper. __slots__ keeps each record to a fixed
+    # set of attributes instead of a per-instance dict.
+    __slots__ = ('searched', 'title', 'authors', 'published', 'year', 'type', 'include', 'exclusionCode', 'database', 'source', 'doi', 'abstract', 'venue')
+
+    def __init__(self, title='-', authors='-', published='', type='-', database='', source='', doi='', abstract='', venue=''):
+        self.searched = ''
+        self.title = title
+        # A string, or a list of names joined by normalisePaper
+        self.authors = authors
+        self.published = published
+        self.year = ''
+        self.type = type
+        self.include = ''
+        self.exclusionCode = ''
+        self.database = database
+        self.source = source
+        self.doi = doi
+        self.abstract = abstract
+        self.venue = venue
+
+    def primaryRow(self):
+        return [self.searched, self.title, self.authors, self.year, self.database, self.source, self.doi, self.abstract, self.venue]
+
+    def greyRow(self):
+        return [self.searched, self.title, self.authors, self.published, self.type, self.include, self.exclusionCode, self.database, self.source, self.doi, self.abstract, self.venue]
+
+# Registered database connectors by name, in de-duplication order
+connectors = {}
+
+def registerConnector(connector):
+    connectors[connector.name] = connector
+    return connector
+
+class Connector():
+    # A database. Subclasses only build the requests (pages) and turn each raw result into a Paper (parse),
+    # Litfetch.runConnector normalises, filters and writes them.
+    name = None
+    title = None
+    host = None
+    fileName = None
+    database = None
+    grey = False
+    # Query syntax, see SearchQuery.dialects
+    dialect = 'keywords'
+    # Whether the Enricher looks up missing metadata, Crossref results are already complete. Papers without a DOI are
+    # resolved by title unless the source has its own identifiers (resolveTitles False).
+    enrich = True
+    resolveTitles = True
+    # The source's own filter values for the documentTypes in .config (article, conference, chapter, book, preprint,
+    # thesis, report, dataset). Types a source has no filter for do not constrain it.
+    documentTypes = {}
+
+    def __init__(self, litfetch, watermark=None):
+        self.litfetch = litfetch
+        # The watermark from the previous run for an incremental refresh, otherwise None
+        self.watermark = watermark
+        self.newWatermark = litfetch.runDate
+        # Where to carry on from when a search is resumed, None for the first page. pages() sets it to the
+        # position after each page before yielding it, and it is saved in the source's checkpoint.
+        self.position = None
+
+    def searchQuery(self):
+        return self.litfetch.query.emit(self.dialect)
+
+    def firstYear(self):
+        # The start of the date window. A refresh of a database that only filters on the publication year starts at
+        # the year of the previous run, the records published before it were harvested then.
+        if self.watermark:
+            return max(self.litfetch.startYear, self.watermark[:4])
+        return self.litfetch.startYear
+
+    def typeFilters(self):
+        # Native values for the document types asked for, without repeats
+        return list(dict.fromkeys(self.documentTypes[name] for name in self.litfetch.documentTypes if name in self.documentTypes))
+
+    def pages(self):
+        # Yield lists of raw results
+        raise NotImplementedError
+
+    def parse(self, item):
+        raise NotImplementedError
+
+# Scholar result parsing. Both parsers return (title, href, authors line, year) for each gs_ri block.
+scholarYearPattern = re.compile(r'.*([1-3][0-9]{3})')
+scholarResultsXPath = "//div[contains(concat(' ', normalize-space(@class), ' '), ' gs_ri ')]"
+scholarAuthorsXPath = ".//div[contains(concat(' ', normalize-space(@class), ' '), ' gs_a ')]"
+
+def parseScholarPage(body):
+    # lxml XPath straight over the page, the fastest option
+    import lxml.html
+    results = []
+    for result in lxml.html.fromstring(body).xpath(scholarResultsXPath):
+        paperTitle = '-'
+        paperSource = '-'
+        paperAuthors = '-'
+        for title in result.xpath('.//h3//a[@href]'):
+            paperTitle = title.text_content()
+            paperSource = title.get('href')
+        for author in result.xpath(scholarAuthorsXPath):
+            paperAuthors = author.text_content()
+
+        findYear = scholarYearPattern.match(paperAuthors)
+        results.append((paperTitle, paperSource, paperAuthors, findYear.group(1) if findYear else '0000'))
+
+    return results
+
+def parseScholarPageSoup(body):
+    # BeautifulSoup only building the gs_ri blocks, for when lxml XPath is not wanted
+    from bs4 import BeautifulSoup, SoupStrainer
+    results = []
+    for result in BeautifulSoup(body, "lxml", parse_only=SoupStrainer("div", class_="gs_ri")).find_all("div", class_="gs_ri"):
+        paperTitle = '-'
+        paperSource = '-'
+        paperAuthors = '-'
+        for title in result.select('h3 a[href]'):
+            paperTitle = title.text
+            paperSource = title['href']
+        for author in result.find_all("div", class_="gs_a"):
+            paperAuthors = author.text
+
+        findYear = scholarYearPattern.match(paperAuthors)
+        results.append((paperTitle, paperSource, paperAuthors, findYear.group(1) if findYear else '0000'))
+
+    return results
+
+@registerConnector
+class GoogleScholar(Connector):
+    name = 'google'
+    title = 'Google Scholar'
+    host = 'scholar.google.co.uk'
+    fileName = 'review-search-google.csv'
+    database = 'Google Scholar'
+    dialect = 'scholar'
+
+    def pages(self):
+        lf = self.litfetch
+
+        # Scholar only filters by year, a refresh starts at the year of the previous run
+        startYear = self.firstYear()
+
+        pageResults = lf.searchLimit/10
+        for i in range(self.position or 0, int(pageResults)):
+            page = 10*i
+            searchURL = 'https://scholar.google.co.uk/scholar?q='+urllib.parse.quote_plus(self.searchQuery())+'&hl=en&as_sdt=0%2C5&as_ylo='+startYear+'&as_yhi='+lf.endYear+'&start='+str(page)
+            user_agent = 'Mozilla/4.0 (compatible; MSIE 5.5; Windows NT)'
+            headers = { 'User-Agent': user_agent }
+            results = parseScholarPage(lf.http.get(searchURL, headers))
+            self.position = i+1
+            yield results
+
+    def parse(self, result):
+        (paperTitle, paperSource, paperAuthors, paperYear) = result
+        return Paper(paperTitle, paperAuthors, paperYear, database=self.database, source=paperSource)
+
+@registerConnector
+class ScienceDirect(Connector):
+    # https://api.elsevier.com/content/search/scidir?apiKey='+self.config['sdKey']+'&query=
+    name = 'sciencedirect'
+    title = 'ScienceDirect'
+    host = 'api.elsevier.com'
+    fileName = 'review-search-sciencedirect.csv'
+    database = 'ScienceDirect'
+    dialect = 'elsevier'
+
+    def pages(self):
+        lf = self.litfetch
+        searchLimit = min(lf.searchLimit, 500)
+        # One request returns every result
+        if self.position == 'end':
+            return
+
+        # The date window is a year range, a refresh starts at the year of the previous run
+        startYear = self.firstYear()
+        if startYear > lf.endYear:
+            return
+        searchURL = 'https://api.elsevier.com/content/search/scidir?apiKey='+lf.config['sdKey']+'&count='+str(searchLimit)+'&sort=-date&date='+startYear+'-'+lf.endYear+'&httpAccept=application%2Fjson&query='+urllib.parse.quote_plus(self.searchQuery())
+        data = json.loads(lf.http.get(searchURL))
+        self.position = 'end'
+        yield data['search-results']['entry']
+
+    def parse(self, paper):
+        authors = [author['surname']+','+author['given-name'] for author in paper['authors']['author']]
+        return Paper(paper['dc:title'], authors, paper['prism:coverDate'][0]['$'], database=self.database, source=paper['link'][0]['@href'], doi=paper.get('prism:doi', ''), venue=paper.get('prism:publicationName', ''))
+
+@registerConnector
+class SpringerLink(Connector):
+    # PUBLICATION DATES ARE INCORRECT IN THE SPRINGER API
+    name = 'springer'
+    title = 'SpringerLink'
+    host = 'api.springer.com'
+    fileName = 'review-search-springer.csv'
+    database = 'Springer'
+    dialect = 'springer'
+    documentTypes = {'article': 'Journal', 'chapter': 'Book', 'book': 'Book'}
+    # The API only filters on single years, longer windows are left to the local year filter
+    maxYears = 30
+
+    def pages(self):
+        lf = self.litfetch
+        if self.position == 'end':
+            return
+        constraints = ''
+        # A refresh starts at the year of the previous run
+        years = range(int(self.firstYear()), int(lf.endYear)+1)
+        if not years:
+            return
+        if len(years) <= self.maxYears:
+            constraints += ' ('+' OR '.join('year:'+str(year) for year in years)+')'
+        types = self.typeFilters()
+        if types:
+            constraints += ' ('+' OR '.join('type:'+documentType for documentType in types)+')'
+        searchURL = 'http://api.springer.com/metadata/json?api_key='+lf.config['springerKey']+'&p='+str(lf.searchLimit)+'&q='+urllib.parse.quote_plus('('+self.searchQuery()+')'+constraints+' sort:date')
+        data = json.loads(lf.http.get(searchURL))
+        self.position = 'end'
+        yield data['records']
+
+    def parse(self, paper):
+        authors = [author['creator'] for author in paper['creators']]
+        return Paper(paper['title'], authors, paper['publicationDate'], database=self.database, source=paper['url'][0]['value'], doi=paper.get('doi', ''), abstract=paper.get('abstract', ''), venue=paper.get('publicationName', ''))
+
+class CursorExpired(Exception):
+    # A Crossref page is not cached and the cursor that leads to it is too old to send
+    pass
+
+class Crossref(Connector):
+    # Crossref REST API with cursor deep paging: https://github.com/CrossRef/rest-api-doc#deep-paging-with-cursors
+    # The query is relevance ranked and ignores boolean operators, so it gets the keywords of the search.
+    host = 'api.crossref.org'
+    member = None
+    enrich = False
+    # Seconds a cursor stays valid after its last use, and rows per page (the API's maximum)
+    cursorLifetime = 300
+    pageSize = 1000
+    documentTypes = {'article': 'journal-article', 'conference': 'proceedings-article', 'chapter': 'book-chapter', 'book': 'book',
+                     'preprint': 'posted-content', 'thesis': 'dissertation', 'report': 'report', 'dataset': 'dataset'}
+
+    def pages(self):
+        # Pages are yielded lazily so only one page (two when prefetching) is held in memory.
+        # With crossrefPrefetch the next page is requested while the current one is being processed.
+        lf = self.litfetch
+
+        # The date window and document types are filters (repeated type filters are ORed). A refresh only asks for
+        # works Crossref indexed since the previous run.
+        filters = [('from-pub-date', lf.startYear), ('until-pub-date', lf.endYear+'-12-31'), ('member', self.member)]
+        filters += [('type', documentType) for documentType in self.typeFilters()]
+        if self.watermark:
+            filters.append(('from-index-date', self.watermark))
+
+        params = {'query': self.searchQuery(), 'order': 'desc', 'filter': ','.join(k+':'+v for (k, v) in filters), 'cursor': '*'}
+        if lf.config.get('crossrefMailto'):
+            # Identified requests are served from the Crossref polite pool
+            params['mailto'] = lf.config['crossrefMailto']
+
+        remaining = lf.searchLimit
+        # When the cursor in params was issued, a cursor read from a cached page is as old as that page
+        issued = None
+        if self.position and self.position['remaining'] > 0:
+            # A resumed search carries on with the saved cursor while it is valid. An expired one pages through
+            # again from the start and the records already written are skipped.
+            if time.time()-self.position['saved'] < self.cursorLifetime:
+                (params['cursor'], remaining, issued) = (self.position['cursor'], self.position['remaining'], self.position['saved'])
+        elif self.position:
+            return
+
+        # Records to drop from the front of the next pages, and whether pages must come from the server
+        skip = 0
+        live = False
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            params['rows'] = min(self.pageSize, remaining)
+            page = executor.submit(self.page, dict(params), issued, live)
+
+            while remaining > 0:
+                try:
+                    (message, issued) = page.result()
+                except CursorExpired:
+                    # The chain of cached pages broke off at a cursor that is no longer valid. The search pages
+                    # through again from the start past the cache, skipping the records already yielded.
+                    skip = lf.searchLimit-remaining
+                    (params['cursor'], params['rows'], live) = ('*', min(self.pageSize, skip+remaining), True)
+                    page = executor.submit(self.page, dict(params), None, live)
+                    continue
+
+                if 'total-results' in message:
+                    lf.metrics.expect(self.name, min(message['total-results'], lf.searchLimit))
+                items = message['items'][skip:][:remaining]
+                skip = max(0, skip-len(message['items']))
+                remaining -= len(items)
+
+                # Stop when the results run out, the last page is shorter than requested
+                if remaining > 0 and len(message['items']) == params['rows'] and message.get('next-cursor'):
+                    params['cursor'] = message['next-cursor']
+                    params['rows'] = min(self.pageSize, skip+remaining)
+                    if lf.crossrefPrefetch:
+                        page = executor.submit(self.page, dict(params), issued, live)
+                    else:
+                        page = None
+                else:
+                    remaining = 0
+
+                self.position = {'cursor': params['cursor'], 'remaining': remaining, 'saved': issued}
+                if items or remaining == 0:
+                    yield items
+
+                if remaining > 0 and page is None:
+                    page = executor.submit(self.page, dict(params), issued, live)
+
+    def page(self, params, issued, live):
+        # Returns (message, when its next-cursor was issued). A page in the cache is used whatever its cursor,
+        # a whole chain of cached pages is consistent. A page that is not cached is only asked for with a cursor
+        # that is still valid, otherwise CursorExpired is raised. With live the cache is not read at all.
+        searchURL = 'https://api.crossref.org/works?'+urllib.parse.urlencode(params)
+        http = self.litfetch.http
+        if not live:
+            entry = http.cached(searchURL)
+            if entry is not None:
+                return (json.loads(entry[1])['message'], entry[0])
+            if params['cursor'] != '*' and (issued is None or time.time()-issued >= self.cursorLifetime):
+                raise CursorExpired(params['cursor'])
+        return (json.loads(http.get(searchURL, maxAge=0 if live else None))['message'], time.time())
+
+    def parse(self, paper):
+        if 'author' in paper:
+            authors = [(author.get('family', '')+','+author.get('given', '')).strip(',') for author in paper['author']]
+        else:
+            authors = 'Not available'
+
+        try:
+            paperSource = paper['link'][0]['URL']
+        except KeyError:
+            paperSource = 'Not available'
+
+        abstract = ' '.join(Enricher.tagPattern.sub(' ', html.unescape(paper.get('abstract', ''))).split())
+        venue = (paper.get('container-title') or [''])[0]
+        # The publication year the date filters apply to, the deposit date when there is none
+        published = ((paper.get('issued') or {}).get('date-parts') or [[None]])[0][0] or paper['created']['date-parts'][0][0]
+        return Paper(paper['title'][0], authors, str(published), database=self.database, source=paperSource, doi=paper.get('DOI', ''), abstract=abstract, venue=venue)
+
+@registerConnector
+class WileyOL(Crossref):
+    name = 'wiley'
+    title = 'Wiley Online Library'
+    fileName = 'review-search-wiley.csv'
+    database = 'Wiley - Crossref'
+    member = '311'
+
+@registerConnector
+class AcmDL(Crossref):
+    name = 'acm'
+    title = 'ACM Digital Library'
+    fileName = 'review-search-acm.csv'
+    database = 'ACM - Crossref'
+    member = '320'
+
+@registerConnector
+class IeeeXplore(Crossref):
+    # http://ieeexploreapi.ieee.org/api/v1/search/articles?format=json&apikey='+self.config['ieeeKey']+'&querytext=
+    name = 'ieee'
+    title = 'IEEE Xplore'
+    fileName = 'review-search-ieee.csv'
+    database = 'IEEE - Crossref'
+    member = '263'
+
+@registerConnector
+class PubMed(Connector):
+    # Uses the E-utilities history server: esearch stores the result set on NCBI (usehistory=y)
+    # and esummary then pages through it with WebEnv/query_key in large batches.
+    name = 'pubmed'
+    title = 'PubMed'
+    host = 'eutils.ncbi.nlm.nih.gov'
+    fileName = 'review-search-pubmed.csv'
+    database = 'PubMed'
+    dialect = 'pubmed'
+    resolveTitles = False
+    eutils = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/'
+    documentTypes = {'article': 'journal article', 'conference': 'congress', 'book': 'book', 'preprint': 'preprint'}
+
+    def pages(self):
+        lf = self.litfetch
+        keyParam = ''
+        if lf.config.get('ncbiKey'):
+            keyParam = '&api_key='+lf.config['ncbiKey']
+
+        # The date window is a publication date range. A refresh only asks for records added to PubMed (Entrez
+        # date) since the previous run, and the publication years go in the term instead.
+        term = self.searchQuery()
+        types = self.typeFilters()
+        if types:
+            term = '('+term+') AND ('+' OR '.join('"'+documentType+'"[pt]' for documentType in types)+')'
+        if self.watermark:
+            term = '('+term+') AND ("'+lf.startYear+'"[dp] : "'+lf.endYear+'"[dp])'
+            dateParam = '&datetype=edat&mindate='+self.watermark.replace('-', '/')+'&maxdate=3000'
+        else:
+            dateParam = '&datetype=pdat&mindate='+lf.startYear+'&maxdate='+lf.endYear
+
+        if self.position:
+            # A resumed search pages on through the result set still stored on the history server
+            (webEnv, queryKey, total, first) = (self.position['webEnv'], self.position['queryKey'], self.position['total'], self.position['retstart'])
+        else:
+            searchURL = self.eutils+'esearch.fcgi?db=pubmed&usehistory=y&retmode=json&retmax=0&term='+urllib.parse.quote(term)+dateParam+keyParam
+            data = json.loads(lf.http.get(searchURL))
+            webEnv = data['esearchresult']['webenv']
+            queryKey = data['esearchresult']['querykey']
+            total = min(int(data['esearchresult']['count']), lf.searchLimit)
+            first = 0
+            print('PubMed found '+data['esearchresult']['count']+' papers, fetching '+str(total)+'.')
+        lf.metrics.expect(self.name, total)
+
+        for retstart in range(first, total, lf.pubmedBatch):
+            retmax = min(lf.pubmedBatch, total-retstart)
+            summaryURL = self.eutils+'esummary.fcgi?db=pubmed&retmode=json&query_key='+queryKey+'&WebEnv='+webEnv+'&retstart='+str(retstart)+'&retmax='+str(retmax)+keyParam
+            result = json.loads(lf.http.get(summaryURL))['result']
+            self.position = {'webEnv': webEnv, 'queryKey': queryKey, 'total': total, 'retstart': retstart+retmax}
+            yield [result[uid] for uid in result.get('uids', [])]
+
+    def parse(self, paper):
+        authors = [author['name'] for author in paper['authors']]
+        doi = next((articleId['value'] for articleId in paper.get('articleids', []) if articleId.get('idtype') == 'doi'), '')
+        return Paper(paper['title'], authors, paper['pubdate'], database=self.database, source='https://www.ncbi.nlm.nih.gov/pubmed/'+str(paper['uid']), doi=doi, venue=paper.get('fulljournalname', ''))
+
+@registerConnector
+class ResearchGate(Connector):
+    name = 'researchgate'
+    title = 'ResearchGate'
+    host = 'www.researchgate.net'
+    fileName = 'review-search-researchgate.csv'
+    database = 'ResearchGate'
+    grey = True
+
+    def pages(self):
+        lf = self.litfetch
+        searchURL = "https://www.researchgate.net/search.SearchBox.loadMore.html?type=publication&query="+urllib.parse.quote(self.searchQuery())+"&offset=0&limit="+str(lf.searchLimit)+"&viewId=IDlNl4Vyl3nQ7giYvShhPkj1dMkru0GibMJ3&iepl%5BgeneralViewId%5D=YQZWEQPe4YAuAN1ntHw4KLcXcJGRwZ1Eztzq&iepl%5Bcontexts%5D%5B0%5D=searchReact&subfilter"
+        if self.position == 'end':
+            return
+        data = json.loads(lf.http.get(searchURL).decode())
+        self.position = 'end'
+        yield data['result']['searchSearch']['publication']['items']
+
+    def parse(self, item):
+        authors = [author['name'] for author in item['authors']]
+        return Paper(item['title'], authors, item['metaItems'][0]['label'], item['type'], self.database, 'https://www.researchgate.net/'+item['urls']['CTA'])
+
+@registerConnector
+class Arxiv(Connector):
+    name = 'arxiv'
+    title = 'arXiv'
+    host = 'export.arxiv.org'
+    fileName = 'review-search-arxiv.csv'
+    database = 'arXiv'
+    dialect = 'arxiv'
+    grey = True
+    resolveTitles = False
+    atom = '{http://www.w3.org/2005/Atom}'
+    opensearch = '{http://a9.com/-/spec/opensearch/1.1/}'
+    arxivNs = '{http://arxiv.org/schemas/atom}'
+
+    def pages(self):
+        # Pages through the arXiv API with start/max_results. Each Atom page is parsed incrementally with iterparse
+        # and entries are cleared once read, so memory stays flat however many results there are.
+        # A refresh asks for the newest submissions first and stops at the previous newest entry.
+        import xml.etree.ElementTree as ET
+        lf = self.litfetch
+        # Only submissions in the date window
+        query = '('+self.searchQuery()+') AND submittedDate:['+lf.startYear+'01010000 TO '+lf.endYear+'12312359]'
+        #query = 'all:Human behaviour behavior predict smart home ambient intelligence'
+        # A resumed search carries on from the watermark in its checkpoint
+        if self.position is None:
+            self.newWatermark = self.watermark or ''
+
+        total = lf.searchLimit
+        start = self.position or 0
+        while start < min(total, lf.searchLimit):
+            searchURL = "http://export.arxiv.org/api/query?search_query="+urllib.parse.quote(query)+"&start="+str(start)+"&max_results="+str(min(lf.arxivPageSize, lf.searchLimit-start))
+            if self.watermark:
+                searchURL += "&sortBy=submittedDate&sortOrder=descending"
+
+            entries = []
+            found = 0
+            root = None
+            for (event, element) in ET.iterparse(io.BytesIO(lf.http.get(searchURL)), events=('start', 'end')):
+                if root is None:
+                    root = element
+                if event != 'end':
+                    continue
+
+                if element.tag == self.opensearch+'totalResults':
+                    total = int(element.text)
+                    lf.metrics.expect(self.name, min(total, lf.searchLimit))
+                elif element.tag == self.atom+'entry':
+                    found += 1
+                    entries.append({
+                        'id': element.findtext(self.atom+'id'),
+                        'title': element.findtext(self.atom+'title', ''),
+                        'author': [author.findtext(self.atom+'name') for author in element.iterfind(self.atom+'author')],
+                        'published': element.findtext(self.atom+'published'),
+                        'summary': element.findtext(self.atom+'summary', ''),
+                        'doi': element.findtext(self.arxivNs+'doi', ''),
+                        'journal': element.findtext(self.arxivNs+'journal_ref', ''),
+                    })
+                    # Drop the entry and everything parsed before it
+                    element.clear()
+                    root.clear()
+
+            if self.watermark:
+                fresh = [entry for entry in entries if entry['published'] > self.watermark]
+                if len(fresh) < len(entries):
+                    self.position = lf.searchLimit
+                    yield fresh
+                    break
+            self.position = start+found
+            yield entries
+
+            if found == 0:
+                break
+            start += found
+
+    def parse(self, entry):
+        self.newWatermark = max(self.newWatermark, entry['published'])
+        return Paper(entry['title'], entry['author'], entry['published'], database=self.database, source=entry['id'], doi=entry['doi'], abstract=' '.join(entry['summary'].split()), venue=entry['journal'])
+
+@registerConnector
+class Zenodo(Connector):
+    name = 'zenodo'
+    title = 'Zenodo'
+    host = 'zenodo.org'
+    fileName = 'review-search-zenodo.csv'
+    database = 'Zenodo'
+    dialect = 'zenodo'
+    grey = True
+    documentTypes = {'article': 'article', 'conference': 'conferencepaper', 'chapter': 'section', 'book': 'book',
+                     'preprint': 'preprint', 'thesis': 'thesis', 'report': 'report'}
+
+    def pages(self):
+        lf = self.litfetch
+
+        # Range queries on the publication date and the document type. A refresh only asks for records created since
+        # the previous run.
+        query = '('+self.searchQuery()+') AND publication_date:['+lf.startYear+'-01-01 TO '+lf.endYear+'-12-31]'
+        types = self.typeFilters()
+        if types:
+            query += ' AND resource_type.subtype:('+' OR '.join(types)+')'
+        if self.watermark:
+            query = '('+query+') AND created:['+self.watermark+' TO *]'
+
+        searchURL = "https://zenodo.org/api/records/?q="+urllib.parse.quote(query)+"&size="+str(lf.searchLimit)
+        #searchURL = "https://zenodo.org/api/records/?size=100q="+urllib.parse.quote('Human behaviour behavior predict smart home ambient intelligence')
+        if self.position == 'end':
+            return
+        data = json.loads(lf.http.get(searchURL).decode())
+        self.position = 'end'
+        yield data['hits']['hits']
+
+    def parse(self, item):
+        metadata = item['metadata']
+        authors = [creator['name'] for creator in metadata['creators']]
+        abstract = ' '.join(Enricher.tagPattern.sub(' ', html.unescape(metadata.get('description', ''))).split())
+        return Paper(metadata['title'], authors, metadata['publication_date'], metadata['resource_type']['subtype'], self.database, item['links']['html'], doi=metadata.get('doi', ''), abstract=abstract)
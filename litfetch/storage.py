@@ -0,0 +1,292 @@
+"""
+Everything written to disk: refresh watermarks, checkpoints, the CSV writer and the SQLite corpus.
+"""
+
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .dedup import identifier, normaliseTitle
+from .query import SearchQuery
+
+class Watermarks():
+    # Newest record seen per source and query, for incremental refreshes. Stored as JSON in fileName.
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.lock = threading.Lock()
+        try:
+            with open(fileName, encoding='utf-8') as f:
+                self.marks = json.load(f)
+        except FileNotFoundError:
+            self.marks = {}
+
+    def key(self, source, query):
+        return source+'|'+query
+
+    def get(self, source, query):
+        return self.marks.get(self.key(source, query), {}).get('value')
+
+    def set(self, source, query, value):
+        with self.lock:
+            self.marks[self.key(source, query)] = {'source': source, 'query': query, 'value': value, 'updated': time.strftime('%Y-%m-%d %H:%M:%S')}
+            temp = self.fileName+'.tmp'
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump(self.marks, f, indent=1, sort_keys=True)
+            os.replace(temp, self.fileName)
+
+class Checkpoint():
+    # Progress of one source through its result pages, so an interrupted search can be resumed. After every page
+    # a JSON line is appended to fileName with the connector's paging position, its watermark, the ids of the
+    # records written from that page and the sizes of the .partial output files. The first line names the search,
+    # the checkpoint of a different search is never resumed, and the last marks a source that finished.
+    def __init__(self, fileName, search):
+        self.fileName = fileName
+        self.search = search
+
+    def recordId(self, paper):
+        # The DOI, an id from the source URL, or the normalised title
+        if paper.doi:
+            return 'doi:'+paper.doi.lower()
+        return identifier(paper.source) or 'title:'+normaliseTitle(paper.title)
+
+    def load(self):
+        # The last complete checkpoint with the ids written up to it, or None
+        try:
+            with open(self.fileName, encoding='utf-8') as f:
+                lines = f.read().split('\n')
+        except FileNotFoundError:
+            return None
+
+        state = None
+        ids = set()
+        for (number, line) in enumerate(lines):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # The line being written when the run stopped
+                break
+            if number == 0:
+                if entry.get('search') != self.search:
+                    return None
+                continue
+            if entry.get('done'):
+                return {'done': True}
+            ids.update(entry['ids'])
+            state = entry
+
+        if state is not None:
+            state['ids'] = ids
+        return state
+
+    def start(self):
+        with open(self.fileName, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'search': self.search, 'started': time.strftime('%Y-%m-%d %H:%M:%S')})+'\n')
+
+    def save(self, position, watermark, ids, sizes):
+        with open(self.fileName, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'position': position, 'watermark': watermark, 'ids': ids, 'sizes': sizes})+'\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def finish(self):
+        # The source's CSVs are complete, ids are no longer needed
+        temp = self.fileName+'.tmp'
+        with open(temp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'search': self.search})+'\n'+json.dumps({'done': True, 'finished': time.strftime('%Y-%m-%d %H:%M:%S')})+'\n')
+        os.replace(temp, self.fileName)
+
+class ResultWriter():
+    # Buffered CSV output used by every database and the de-duplication steps.
+    # The file is opened once, rows are buffered and flushed every flushRows rows or flushSeconds seconds.
+    # Rows go to a temporary file next to the target which is renamed over it when the writer closes,
+    # so a crash or a failed search never leaves a half-written file (the previous results are kept).
+    # With append the existing rows are copied into the temporary file first and new rows whose keyColumn
+    # value is already in the file are skipped, so a refresh only adds records it has not seen.
+    # With partial the temporary file is fileName.partial and is kept when the writer fails, so a checkpointed
+    # search can be resumed. resumeSize carries on writing it, cut back to its size at the last checkpoint.
+    def __init__(self, fileName, header, flushRows=1000, flushSeconds=5, append=False, keyColumn=None, partial=False, resumeSize=None):
+        self.fileName = fileName
+        self.temp = fileName+('.partial' if partial else '.tmp')
+        self.partial = partial
+        self.flushRows = flushRows
+        self.flushSeconds = flushSeconds
+        self.buffer = []
+        self.lastFlush = time.time()
+        self.rows = 0
+        self.keyColumn = keyColumn
+        self.keys = set()
+
+        if resumeSize is not None and os.path.exists(self.temp):
+            # Rows written after the last checkpoint are dropped, that page is fetched again
+            with open(self.temp, 'r+b') as f:
+                f.truncate(resumeSize)
+            if keyColumn is not None:
+                with open(self.temp, newline='', encoding='utf-8') as existing:
+                    self.keys.update(row[keyColumn] for row in csv.reader(existing) if len(row) > keyColumn)
+            self.file = open(self.temp, 'a', encoding='utf-8', newline='')
+            self.writer = csv.writer(self.file)
+            return
+
+        self.file = open(self.temp, 'w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        if append and os.path.exists(fileName):
+            with open(fileName, newline='', encoding='utf-8') as existing:
+                for row in csv.reader(existing):
+                    if keyColumn is not None and len(row) > keyColumn:
+                        self.keys.add(row[keyColumn])
+                    self.writer.writerow(row)
+        else:
+            self.writer.writerow(header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, traceback):
+        self.close(commit=excType is None)
+
+    def writerow(self, row):
+        if self.keyColumn is not None:
+            if row[self.keyColumn] in self.keys:
+                return False
+            self.keys.add(row[self.keyColumn])
+
+        self.buffer.append(row)
+        self.rows += 1
+        if len(self.buffer) >= self.flushRows or time.time()-self.lastFlush >= self.flushSeconds:
+            self.flush()
+
+        return True
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def flush(self):
+        self.writer.writerows(self.buffer)
+        self.buffer = []
+        self.file.flush()
+        self.lastFlush = time.time()
+
+    def sync(self):
+        # Everything written so far on disk, returns the size of the temporary file for a checkpoint
+        self.flush()
+        os.fsync(self.file.fileno())
+        return os.fstat(self.file.fileno()).st_size
+
+    def close(self, commit=True):
+        if self.file.closed:
+            return
+
+        if commit:
+            self.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            os.replace(self.temp, self.fileName)
+        elif self.partial:
+            self.flush()
+            self.file.close()
+        else:
+            self.file.close()
+            os.remove(self.temp)
+
+class CorpusStore():
+    # Every harvested record in one SQLite database, so the corpus can be queried without re-reading the CSVs
+    # or calling the APIs again. Rows are keyed on (source, identifier), where the identifier is the DOI, PubMed
+    # or arXiv id from the URL, or the normalised title. They are buffered and written with executemany in one
+    # transaction per batch. WAL mode lets the sources write while a query reads. When SQLite has FTS5, the
+    # papersText index over titles, authors and abstracts is kept in step with triggers and serves find().
+    columns = ('source', 'key', 'url', 'database', 'searched', 'title', 'normTitle', 'authors', 'published', 'year', 'type', 'doi', 'abstract', 'venue', 'include', 'exclusionCode', 'query')
+
+    def __init__(self, fileName, batchSize=5000):
+        self.fileName = fileName
+        self.batchSize = batchSize
+        self.pending = []
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(fileName, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+
+        with self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS papers (id INTEGER PRIMARY KEY, '+', '.join(column+' TEXT' for column in self.columns)+', UNIQUE (source, key))')
+            # Columns added since the database was created
+            existing = set(column[1] for column in self.db.execute('PRAGMA table_info(papers)'))
+            for column in self.columns:
+                if column not in existing:
+                    self.db.execute('ALTER TABLE papers ADD COLUMN '+column+' TEXT')
+            self.db.execute('CREATE INDEX IF NOT EXISTS papersDoi ON papers (doi)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS papersTitle ON papers (normTitle)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS papersSource ON papers (source)')
+
+        try:
+            with self.db:
+                self.db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS papersText USING fts5(title, authors, abstract, content='papers', content_rowid='id')")
+                self.db.execute('CREATE TRIGGER IF NOT EXISTS papersInsert AFTER INSERT ON papers BEGIN '
+                                'INSERT INTO papersText (rowid, title, authors, abstract) VALUES (new.id, new.title, new.authors, new.abstract); END')
+                self.db.execute('CREATE TRIGGER IF NOT EXISTS papersDelete AFTER DELETE ON papers BEGIN '
+                                "INSERT INTO papersText (papersText, rowid, title, authors, abstract) VALUES ('delete', old.id, old.title, old.authors, old.abstract); END")
+                self.db.execute('CREATE TRIGGER IF NOT EXISTS papersUpdate AFTER UPDATE ON papers BEGIN '
+                                "INSERT INTO papersText (papersText, rowid, title, authors, abstract) VALUES ('delete', old.id, old.title, old.authors, old.abstract); "
+                                'INSERT INTO papersText (rowid, title, authors, abstract) VALUES (new.id, new.title, new.authors, new.abstract); END')
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5, find() falls back to LIKE
+            self.fts = False
+
+        updates = ', '.join(column+' = excluded.'+column for column in self.columns if column not in ('source', 'key'))
+        self.upsert = ('INSERT INTO papers ('+', '.join(self.columns)+') VALUES ('+', '.join('?' for column in self.columns)+') '
+                       'ON CONFLICT (source, key) DO UPDATE SET '+updates)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, traceback):
+        self.close()
+
+    def add(self, paper, source, query=''):
+        normTitle = normaliseTitle(paper.title)
+        key = identifier(paper.source) or 'title:'+normTitle
+        doi = paper.doi.lower() if paper.doi else (key[4:] if key.startswith('doi:') else '')
+        row = (source, key, paper.source, paper.database, paper.searched, paper.title, normTitle, paper.authors, str(paper.published),
+               paper.year, paper.type, doi, paper.abstract, paper.venue, paper.include, paper.exclusionCode, query)
+
+        with self.lock:
+            self.pending.append(row)
+            if len(self.pending) >= self.batchSize:
+                self.flushPending()
+
+    def flush(self):
+        with self.lock:
+            self.flushPending()
+
+    def flushPending(self):
+        if self.pending:
+            with self.db:
+                self.db.executemany(self.upsert, self.pending)
+            self.pending = []
+
+    def count(self):
+        self.flush()
+        return self.db.execute('SELECT COUNT(*) FROM papers').fetchone()[0]
+
+    def find(self, query, limit=50):
+        # Full-text search in FTS5 syntax, e.g. 'arousal AND wearable' or '"smart home" NOT survey', best match first
+        self.flush()
+        fields = 'p.title, p.authors, p.year, p.database, p.url, p.exclusionCode'
+        if self.fts:
+            return self.db.execute('SELECT '+fields+' FROM papersText JOIN papers p ON p.id = papersText.rowid '
+                                   'WHERE papersText MATCH ? ORDER BY rank LIMIT ?', (query, limit)).fetchall()
+
+        words = [word.strip('"') for word in query.split() if word not in SearchQuery.operators]
+        where = ' AND '.join("(p.title || ' ' || p.authors || ' ' || p.abstract) LIKE ?" for word in words) or '1'
+        return self.db.execute('SELECT '+fields+' FROM papers p WHERE '+where+' LIMIT ?', ['%'+word+'%' for word in words]+[limit]).fetchall()
+
+    def close(self):
+        with self.lock:
+            if self.db is None:
+                return
+            self.flushPending()
+            self.db.close()
+            self.db = None
@@ -0,0 +1,63 @@
+"""
+Shared by the tests: the mock database APIs served in process, and a Litfetch writing to a temporary directory.
+"""
+
+import contextlib
+import csv
+import io
+import os
+import sys
+import urllib.parse
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, 'benchmarks'))
+
+from litfetch import Litfetch
+from mock_server import MockApi
+
+class MockTransport():
+    # Stands in for the pooled Transport, answering every request from benchmarks/mock_server.MockApi without a
+    # socket. urls lists the requests made. fail(url) can be overridden to answer with an HTTP error.
+    def __init__(self, total=50):
+        self.api = MockApi(total)
+        self.urls = []
+
+    def get(self, url, headers=None):
+        self.urls.append(url)
+        failure = self.fail(url)
+        if failure is not None:
+            return failure
+        parts = urllib.parse.urlsplit(url)
+        response = self.api.respond(parts.netloc, parts.path, dict(urllib.parse.parse_qsl(parts.query)))
+        if response is None:
+            return (404, 'Not Found', {}, b'')
+        return (200, 'OK', {'Content-Type': response[0]}, response[1])
+
+    def fail(self, url):
+        return None
+
+    def requests(self, host):
+        return [url for url in self.urls if urllib.parse.urlsplit(url).netloc == host]
+
+    def close(self):
+        pass
+
+def makeLitfetch(directory, transport=None, **config):
+    # A Litfetch with every output and the cache in directory, no screening, enrichment or corpus unless asked for
+    settings = {'outputDir': directory, 'cacheDir': os.path.join(directory, 'cache'), 'startYear': '2005', 'endYear': '2014',
+                'searchString': 'smart home', 'searchLimit': '20', 'corpus': 'no', 'enrich': 'no', 'screen': 'no', 'maxRetries': '0'}
+    settings.update(config)
+    with contextlib.redirect_stdout(io.StringIO()):
+        lf = Litfetch(settings, interactive=False)
+    lf.http.transport = transport if transport is not None else MockTransport()
+    return lf
+
+def quietly(function, *args, **kwargs):
+    # Litfetch prints every title it writes
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+def readCsv(fileName):
+    with open(fileName, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
@@ -0,0 +1,83 @@
+"""
+Resuming an interrupted arXiv search from its checkpoint.
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+import urllib.error
+import urllib.parse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from litfetch import Litfetch
+
+def atomPage(total, entries):
+    # An arXiv API response with (id, title, published) entries
+    body = '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">'
+    body += '<opensearch:totalResults>'+str(total)+'</opensearch:totalResults>'
+    for (arxivId, title, published) in entries:
+        body += '<entry><id>http://arxiv.org/abs/'+arxivId+'</id><title>'+title+'</title><published>'+published+'</published>'
+        body += '<summary>Abstract</summary><author><name>A Author</name></author></entry>'
+    return (body+'</feed>').encode('utf-8')
+
+class ArxivApi():
+    # Stands in for the HttpClient, answering by the start parameter. Pages after failAfter fail as a dropped
+    # connection would.
+    def __init__(self, pages, failAfter=None):
+        self.pages = pages
+        self.failAfter = failAfter
+        self.starts = []
+
+    def get(self, url, headers=None):
+        start = int(urllib.parse.parse_qs(urllib.parse.urlparse(url).query)['start'][0])
+        self.starts.append(start)
+        if self.failAfter is not None and start > self.failAfter:
+            raise urllib.error.URLError('connection reset')
+        total = sum(len(page) for page in self.pages.values())
+        return atomPage(total, self.pages[start])
+
+class ArxivResumeTest(unittest.TestCase):
+    pages = {
+        0: [('1301.0001', 'Activity prediction in smart homes', '2013-07-01T00:00:00Z'), ('1205.0002', 'Forecasting behaviour', '2012-05-01T00:00:00Z')],
+        2: [('1001.0003', 'Ambient intelligence methods', '2010-01-01T00:00:00Z')],
+    }
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config = {'outputDir': self.directory.name, 'cacheDir': os.path.join(self.directory.name, 'cache'), 'searchLimit': '3', 'arxivPageSize': '2',
+                       'startYear': '2005', 'endYear': '2014', 'searchString': 'smart home', 'corpus': 'no', 'enrich': 'no', 'screen': 'no'}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def search(self, api, resume=False):
+        lf = Litfetch(dict(self.config, resume='yes' if resume else 'no'), interactive=False)
+        lf.http = api
+        # Litfetch prints every title
+        with contextlib.redirect_stdout(io.StringIO()):
+            lf.runConnector('arxiv')
+        return lf
+
+    def test_resume_keeps_checkpointed_watermark(self):
+        with self.assertRaises(urllib.error.URLError):
+            self.search(ArxivApi(self.pages, failAfter=0))
+
+        api = ArxivApi(self.pages)
+        lf = self.search(api, resume=True)
+        # Only the page after the checkpoint is fetched again
+        self.assertEqual(api.starts, [2])
+        # The watermark is the newest record written in either run, not the newest of the resumed pages
+        self.assertEqual(lf.watermarks.get('arxiv', lf.searchString+'|2005-2014'), '2013-07-01T00:00:00Z')
+
+        with open(os.path.join(self.directory.name, 'review-search-arxiv.csv'), encoding='utf-8') as f:
+            written = f.read()
+        for page in self.pages.values():
+            for (arxivId, title, published) in page:
+                self.assertEqual(written.count(title), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Batch runs: reading the query file and running the queries on a process pool with a shared cache.
+"""
+
+import os
+import tempfile
+import unittest
+
+from support import quietly, readCsv
+
+import litfetch
+from litfetch.cli import main, readBatch
+from mock_server import MockServer
+
+class BatchTest(unittest.TestCase):
+    defaults = {'actions': 'search', 'startYear': '2005', 'endYear': '2014', 'searchLimit': None}
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.batchFile = os.path.join(self.directory.name, 'queries.csv')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def writeBatch(self, text):
+        with open(self.batchFile, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def test_read_batch(self):
+        self.writeBatch('name,searchString,startYear,searchLimit,actions\n'
+                        'smart homes/wearables,smart home AND wearable,2010,,grey dedupe-grey\n'
+                        '#skipped,ambient intelligence,,,\n'
+                        ',,,,\n'
+                        ',activity recognition,,50,\n')
+        jobs = readBatch(self.batchFile, self.defaults)
+        self.assertEqual(jobs, [
+            {'name': 'smart-homes-wearables', 'searchString': 'smart home AND wearable', 'actions': ['grey', 'dedupe-grey'], 'startYear': '2010', 'endYear': '2014', 'searchLimit': None},
+            {'name': 'query-4', 'searchString': 'activity recognition', 'actions': ['search'], 'startYear': '2005', 'endYear': '2014', 'searchLimit': '50'},
+        ])
+
+    def test_duplicate_names_rejected(self):
+        self.writeBatch('name,searchString\nhomes,smart home\nhomes,smart homes\n')
+        with self.assertRaises(ValueError):
+            readBatch(self.batchFile, self.defaults)
+
+    def test_batch_shares_the_cache(self):
+        # The same search under two names, every response is fetched once and the other worker reads it from the cache
+        self.writeBatch('name,searchString\nfirst,smart home\nsecond,smart home\n')
+        server = MockServer(total=30).start()
+        config = os.path.join(self.directory.name, '.config')
+        settings = {'replay': server.url, 'cacheDir': os.path.join(self.directory.name, 'cache'), 'searchLimit': '10', 'maxRetries': '0',
+                    'corpus': 'no', 'enrich': 'no', 'screen': 'no'}
+        settings.update(('rate.'+connector.host, '1000') for connector in litfetch.connectors.values())
+        with open(config, 'w', encoding='utf-8') as f:
+            f.write(''.join(key+': '+value+'\n' for (key, value) in settings.items()))
+
+        output = os.path.join(self.directory.name, 'batch')
+        try:
+            status = quietly(main, ['grey', 'dedupe-grey', '--batch', self.batchFile, '--workers', '2', '--output', output, '--config', config])
+        finally:
+            server.stop()
+        self.assertEqual(status, 0)
+
+        summary = readCsv(os.path.join(output, 'batch-summary.csv'))
+        rows = [dict(zip(summary[0], row)) for row in summary[1:]]
+        self.assertEqual([(row['name'], row['status'], row['actions']) for row in rows], [('first', 'ok', 'grey dedupe-grey'), ('second', 'ok', 'grey dedupe-grey')])
+        self.assertGreater(int(rows[0]['written']), 0)
+        self.assertEqual(rows[0]['written'], rows[1]['written'])
+        self.assertEqual(rows[0]['deduped'], rows[1]['deduped'])
+        requests = sum(int(row['requests']) for row in rows)
+        self.assertEqual(requests, server.stats()['requests'])
+        self.assertEqual(sum(int(row['cached']) for row in rows), requests)
+        for row in rows:
+            self.assertTrue(os.path.exists(os.path.join(output, row['name'], 'review-search-zenodo.csv')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+The connectors against the mock database APIs: what each one sends and what it writes.
+"""
+
+import os
+import tempfile
+import unittest
+import urllib.parse
+
+from support import makeLitfetch, quietly, readCsv, root
+
+from litfetch import Connector, Paper, connectors, parseScholarPage, parseScholarPageSoup, registerConnector
+
+class ConnectorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def search(self, name, **config):
+        # Returns the Litfetch, the requests sent as (path, query) and the rows written
+        lf = makeLitfetch(self.directory.name, **config)
+        quietly(lf.runConnector, name)
+        requests = [urllib.parse.urlsplit(url) for url in lf.http.transport.urls]
+        rows = readCsv(os.path.join(self.directory.name, 'review-search-'+name+'.csv'))[1:]
+        return (lf, [(parts.path, dict(urllib.parse.parse_qsl(parts.query))) for parts in requests], rows)
+
+    def test_pubmed_summaries_in_batches(self):
+        (lf, requests, rows) = self.search('pubmed', searchLimit='25', pubmedBatch='10')
+        self.assertEqual([path.rsplit('/', 1)[1] for (path, query) in requests], ['esearch.fcgi']+['esummary.fcgi']*3)
+        (path, search) = requests[0]
+        self.assertEqual((search['usehistory'], search['retmax']), ('y', '0'))
+        self.assertEqual([(query['retstart'], query['retmax']) for (path, query) in requests[1:]], [('0', '10'), ('10', '10'), ('20', '5')])
+        self.assertTrue(all(query['WebEnv'] == requests[1][1]['WebEnv'] for (path, query) in requests[1:]))
+        self.assertEqual(len(rows), 25)
+        self.assertTrue(all(row[5].startswith('https://www.ncbi.nlm.nih.gov/pubmed/') and row[6].startswith('10.5555/') for row in rows))
+
+    def test_arxiv_pages(self):
+        (lf, requests, rows) = self.search('arxiv', searchLimit='25', arxivPageSize='10', **{'rate.export.arxiv.org': '1000'})
+        self.assertEqual([(query['start'], query['max_results']) for (path, query) in requests], [('0', '10'), ('10', '10'), ('20', '5')])
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(len(set(row[8] for row in rows)), 25)
+        self.assertTrue(all(row[8].startswith('http://arxiv.org/abs/') for row in rows))
+
+    def test_date_window_sent_to_every_database(self):
+        # What each database is asked for with startYear 2008 and endYear 2010
+        windows = {
+            'google': ('as_ylo', '2008'),
+            'sciencedirect': ('date', '2008-2010'),
+            'springer': ('q', '(smart AND home) (year:2008 OR year:2009 OR year:2010) sort:date'),
+            'wiley': ('filter', 'from-pub-date:2008,until-pub-date:2010-12-31,member:311'),
+            'acm': ('filter', 'from-pub-date:2008,until-pub-date:2010-12-31,member:320'),
+            'ieee': ('filter', 'from-pub-date:2008,until-pub-date:2010-12-31,member:263'),
+            'pubmed': ('mindate', '2008'),
+            'arxiv': ('search_query', '(all:smart AND all:home) AND submittedDate:[200801010000 TO 201012312359]'),
+            'zenodo': ('q', '(smart AND home) AND publication_date:[2008-01-01 TO 2010-12-31]'),
+        }
+        for (name, (parameter, value)) in windows.items():
+            with self.subTest(name):
+                (lf, requests, rows) = self.search(name, startYear='2008', endYear='2010', searchLimit='10', sdKey='key', springerKey='key')
+                self.assertEqual(requests[0][1][parameter], value)
+                self.assertTrue(rows)
+                self.assertTrue(all('2008' <= row[3][:4] <= '2010' for row in rows), [row[3] for row in rows])
+                # Nothing outside the window is asked for and dropped afterwards
+                self.assertEqual(len(requests), 2 if name == 'pubmed' else 1)
+
+    def test_registered_connector_runs_through_the_pipeline(self):
+        class Fixture(Connector):
+            name = 'fixture'
+            title = 'Fixture'
+            host = 'fixture.example'
+            fileName = 'review-search-fixture.csv'
+            database = 'Fixture'
+            enrich = False
+
+            def pages(self):
+                for page in ([('Smart  home\nsensing', ['A Author', 'B Author'], '2010-03-01'), ('Old smart home', [], '1999')], [('', [], '2011')]):
+                    self.position = (self.position or 0)+1
+                    yield page
+
+            def parse(self, item):
+                (title, authors, published) = item
+                return Paper(title, authors, published, database=self.database, source='https://fixture.example/'+title[:3])
+
+        registerConnector(Fixture)
+        self.addCleanup(connectors.pop, 'fixture')
+        (lf, requests, rows) = self.search('fixture')
+        # Normalised, and the records out of the date window or without a title dropped
+        self.assertEqual([row[1:6] for row in rows], [['Smart home sensing', 'A Author, B Author', '2010', 'Fixture', 'https://fixture.example/Sma']])
+
+    def test_scholar_parsers_agree(self):
+        with open(os.path.join(root, 'benchmarks', 'fixtures', 'scholar-results.html'), 'rb') as f:
+            body = f.read()
+        results = parseScholarPage(body)
+        self.assertEqual(parseScholarPageSoup(body), results)
+        self.assertEqual(len(results), 10)
+        (title, source, authors, year) = results[2]
+        self.assertEqual(title, 'A survey of human activity recognition & prediction in smart environments')
+        self.assertEqual((source, year), ('https://example.org/paper/2?x=1&y=2', '2012'))
+        self.assertTrue(authors.startswith('A Aztiria, JC Augusto'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Crossref deep paging: cursors, cached pages whose cursors have expired, and resuming.
+"""
+
+import gzip
+import json
+import os
+import tempfile
+import unittest
+import urllib.error
+import urllib.parse
+from unittest import mock
+
+from support import MockTransport, makeLitfetch, quietly, readCsv
+
+from litfetch import Crossref
+
+class CursorTransport(MockTransport):
+    # Crossref cursors as the API issues them: opaque, and refused with 400 once expire() has been called
+    def __init__(self, total=50, failAfter=None):
+        super().__init__(total)
+        self.generation = 0
+        self.sent = []
+        self.refused = []
+        self.failAfter = failAfter
+
+    def expire(self):
+        self.generation += 1
+
+    def get(self, url, headers=None):
+        parts = urllib.parse.urlsplit(url)
+        if parts.netloc != 'api.crossref.org':
+            return super().get(url, headers)
+        query = dict(urllib.parse.parse_qsl(parts.query))
+        self.sent.append(query['cursor'])
+        if query['cursor'] != '*':
+            (generation, offset) = query['cursor'].split(':')
+            if int(generation) != self.generation:
+                self.refused.append(url)
+                return (400, 'Bad Request', {}, b'Cursor expired')
+            if self.failAfter is not None and int(offset) >= self.failAfter:
+                raise urllib.error.URLError('connection reset')
+            query['cursor'] = offset
+        (status, reason, headers, body) = super().get(parts._replace(query=urllib.parse.urlencode(query)).geturl(), headers)
+        data = json.loads(body)
+        data['message']['next-cursor'] = str(self.generation)+':'+data['message']['next-cursor']
+        return (status, reason, headers, json.dumps(data).encode('utf-8'))
+
+def ageCache(directory, seconds):
+    # Makes every cached response seconds older
+    for (path, dirs, files) in os.walk(directory):
+        for name in files:
+            if name.endswith('.gz'):
+                with gzip.open(os.path.join(path, name), 'rb') as f:
+                    meta = json.loads(f.readline().decode('utf-8'))
+                    body = f.read()
+                meta['stored'] -= seconds
+                with gzip.open(os.path.join(path, name), 'wb') as f:
+                    f.write(json.dumps(meta).encode('utf-8')+b'\n'+body)
+
+@mock.patch.object(Crossref, 'pageSize', 2)
+class CrossrefPagingTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, 'review-search-acm.csv')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def titles(self):
+        return [row[5] for row in readCsv(self.output)[1:]]
+
+    def test_pages_with_cursors(self):
+        transport = CursorTransport()
+        quietly(makeLitfetch(self.directory.name, transport, searchLimit='5').runConnector, 'acm')
+        self.assertEqual(transport.sent, ['*', '0:2', '0:4'])
+        self.assertEqual(len(set(self.titles())), 5)
+
+    def test_expired_cursor_after_cached_first_page(self):
+        # The first page is cached by a smaller search, and its cursor has long expired by the next run
+        transport = CursorTransport()
+        quietly(makeLitfetch(self.directory.name, transport, searchLimit='2').runConnector, 'acm')
+        transport.expire()
+        ageCache(os.path.join(self.directory.name, 'cache'), 3600)
+
+        quietly(makeLitfetch(self.directory.name, transport, searchLimit='5').runConnector, 'acm')
+        self.assertEqual(transport.refused, [])
+        titles = self.titles()
+        self.assertEqual(len(titles), 5)
+        self.assertEqual(len(set(titles)), 5)
+
+    def test_cached_chain_needs_no_requests(self):
+        transport = CursorTransport()
+        quietly(makeLitfetch(self.directory.name, transport, searchLimit='5').runConnector, 'acm')
+        transport.expire()
+        ageCache(os.path.join(self.directory.name, 'cache'), 3600)
+        requests = len(transport.sent)
+
+        quietly(makeLitfetch(self.directory.name, transport, searchLimit='5').runConnector, 'acm')
+        self.assertEqual(len(transport.sent), requests)
+        self.assertEqual(len(set(self.titles())), 5)
+
+    def test_resume_with_saved_cursor(self):
+        transport = CursorTransport(failAfter=4)
+        with self.assertRaises(urllib.error.URLError):
+            quietly(makeLitfetch(self.directory.name, transport, searchLimit='5', maxRetries='0').runConnector, 'acm')
+
+        transport.failAfter = None
+        quietly(makeLitfetch(self.directory.name, transport, searchLimit='5', resume='yes').runConnector, 'acm')
+        # Carries on from the third page with the saved cursor
+        self.assertEqual(transport.sent, ['*', '0:2', '0:4', '0:4'])
+        self.assertEqual(len(set(self.titles())), 5)
+        self.assertEqual(len(self.titles()), 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+De-duplication: the identifier, title and near-duplicate stages, in memory and on disk.
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+# The package on sys.path
+import support
+
+from litfetch import Deduplicator, SqliteDedupIndex, identifier, normaliseTitle
+
+class DeduplicatorTest(unittest.TestCase):
+    title = 'Activity prediction in smart home environments using hidden Markov models'
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def deduplicators(self):
+        # The same checks against the in-memory and the SQLite index
+        yield Deduplicator()
+        yield Deduplicator(index=SqliteDedupIndex(os.path.join(self.directory.name, 'dedup.sqlite')))
+
+    def test_identifiers_and_titles(self):
+        self.assertEqual(identifier('https://doi.org/10.1145/3290605.3300233'), 'doi:10.1145/3290605.3300233')
+        self.assertEqual(identifier('https://www.ncbi.nlm.nih.gov/pubmed/31234567'), 'pmid:31234567')
+        self.assertEqual(identifier('http://arxiv.org/abs/2101.00001v3'), 'arxiv:2101.00001')
+        self.assertEqual(identifier('https://example.org/paper/'), 'url:example.org/paper')
+        self.assertEqual(normaliseTitle('Caf&eacute; <i>Behaviour</i>: A Study!'), 'cafe behaviour a study')
+
+    def test_id_stage(self):
+        for dedup in self.deduplicators():
+            with dedup:
+                self.assertIsNone(dedup.add('A first title', 'Cook, D', 'https://doi.org/10.1000/ABC.1'))
+                self.assertEqual(dedup.add('Another title altogether', 'Cook, D', '', '10.1000/abc.1')[2], 'id')
+
+    def test_title_stage(self):
+        for dedup in self.deduplicators():
+            with dedup:
+                self.assertIsNone(dedup.add(self.title, 'Cook, D'))
+                self.assertEqual(dedup.add(self.title.upper()+'.', 'Cook, D')[2], 'title')
+
+    def test_near_stage(self):
+        for dedup in self.deduplicators():
+            with dedup:
+                self.assertIsNone(dedup.add(self.title, 'Cook, Diane; Holder, Lawrence'))
+                match = dedup.add(self.title+' revisited', 'Cook, D; Holder, L')
+                self.assertEqual(match[2], 'near')
+                self.assertGreaterEqual(match[3], 0.8)
+                # Similar titles by other authors are kept
+                self.assertIsNone(dedup.add(self.title+' extended', 'Riboni, Daniele; Bettini, Claudio'))
+                self.assertEqual(dedup.mergeCount, 1)
+
+    def test_near_stage_keeps_different_dois_apart(self):
+        for dedup in self.deduplicators():
+            with dedup, contextlib.redirect_stdout(io.StringIO()) as output:
+                self.assertIsNone(dedup.add(self.title, 'Cook, D', '', '10.5555/synthetic.1'))
+                self.assertIsNone(dedup.add(self.title+' revisited', 'Cook, D', '', '10.5555/synthetic.2'))
+                # Without a DOI on one side the near stage still applies
+                self.assertEqual(dedup.add(self.title+' extended', 'Cook, D')[2], 'near')
+            self.assertEqual(dedup.rejected, 1)
+            self.assertIn('10.5555/synthetic.2', output.getvalue())
+
+    def test_stages_switched_off(self):
+        dedup = Deduplicator(useIds=False, useTitles=False, nearThreshold=0)
+        self.assertIsNone(dedup.add(self.title, '', 'https://doi.org/10.1000/abc.1'))
+        self.assertIsNone(dedup.add(self.title, '', 'https://doi.org/10.1000/abc.1'))
+
+if __name__ == '__main__':
+    unittest.main()
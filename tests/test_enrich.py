@@ -0,0 +1,108 @@
+"""
+Crossref enrichment: DOI lookups in batches, title resolution and the cache by identifier.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+import urllib.error
+import urllib.parse
+
+from support import quietly
+
+from litfetch import CacheMissError, EnrichmentCache, Enricher, Paper
+
+class CrossrefLookup():
+    # Stands in for the HttpClient, answering filter=doi:... lookups and query.bibliographic ones (the first title
+    # starting with the query) from records, {doi: title}. failure, when set, is raised instead.
+    def __init__(self, records):
+        self.records = records
+        self.urls = []
+        self.failure = None
+
+    def get(self, url, headers=None):
+        self.urls.append(url)
+        if self.failure is not None:
+            raise self.failure
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query))
+        if 'filter' in query:
+            dois = [doi[4:] for doi in query['filter'].split(',')]
+        else:
+            dois = [doi for (doi, title) in self.records.items() if title.lower().startswith(query['query.bibliographic'])][:1]
+        items = [{'DOI': doi, 'title': [self.records[doi]], 'abstract': '<jats:p>About '+doi+'</jats:p>', 'author': [{'family': 'Author', 'given': 'A'}],
+                  'container-title': ['Journal']} for doi in dois if doi in self.records]
+        return json.dumps({'message': {'items': items}}).encode('utf-8')
+
+    def requests(self):
+        return [dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query)) for url in self.urls]
+
+class EnricherTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.records = {'10.5555/'+str(i): 'Smart home study '+str(i) for i in range(120)}
+        self.http = CrossrefLookup(self.records)
+        self.cache = EnrichmentCache(os.path.join(self.directory.name, 'cache', 'enrichment.db'))
+        self.enricher = Enricher(self.http, self.cache)
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def papers(self, count):
+        return [Paper(title='Smart home study '+str(i), authors='A Author', doi='10.5555/'+str(i)) for i in range(count)]
+
+    def test_dois_looked_up_in_batches(self):
+        papers = self.papers(120)
+        self.assertEqual(self.enricher.enrich(papers), 120)
+        self.assertEqual(sorted(len(query['filter'].split(',')) for query in self.http.requests()), [20, 50, 50])
+        self.assertEqual((papers[7].abstract, papers[7].venue), ('About 10.5555/7', 'Journal'))
+
+        # Found in the cache next time
+        self.http.urls = []
+        papers = self.papers(120)
+        self.assertEqual(self.enricher.enrich(papers), 120)
+        self.assertEqual(self.http.urls, [])
+        self.assertEqual(papers[119].abstract, 'About 10.5555/119')
+
+    def test_complete_papers_not_looked_up(self):
+        papers = [Paper(title='Smart home study 1', authors='A Author', doi='10.5555/1', abstract='Known')]
+        self.assertEqual(self.enricher.enrich(papers), 0)
+        self.assertEqual(self.http.urls, [])
+
+    def test_title_resolved_and_aliases_cached(self):
+        paper = Paper(title='Smart Home Study 3', authors='A Author…', source='https://www.ncbi.nlm.nih.gov/pubmed/123')
+        self.assertEqual(self.enricher.enrich([paper]), 1)
+        self.assertEqual((paper.doi, paper.authors), ('10.5555/3', 'Author,A'))
+        self.assertEqual(self.http.requests(), [{'query.bibliographic': 'smart home study 3', 'rows': '1'}])
+
+        # The PubMed id and the DOI now find the same record without a request
+        self.assertEqual(set(self.cache.get(['pmid:123', 'doi:10.5555/3', 'title:smart home study 3'])), {'pmid:123', 'doi:10.5555/3', 'title:smart home study 3'})
+        retitled = Paper(title='A different title', source='https://www.ncbi.nlm.nih.gov/pubmed/123')
+        self.assertEqual(self.enricher.enrich([retitled]), 1)
+        self.assertEqual((retitled.doi, len(self.http.urls)), ('10.5555/3', 1))
+
+    def test_titles_that_disagree_not_accepted(self):
+        # The best match is Smart home study 0
+        paper = Paper(title='Smart home', source='https://scholar.example/1')
+        self.assertEqual(self.enricher.enrich([paper]), 0)
+        self.assertEqual(paper.doi, '')
+        # Not found is cached, the title is not asked again
+        self.assertEqual(self.cache.get(['title:smart home']), {'title:smart home': {}})
+        self.enricher.enrich([Paper(title='Smart home')])
+        self.assertEqual(len(self.http.urls), 1)
+
+    def test_failed_lookups_asked_again(self):
+        for failure in (CacheMissError('not cached'), urllib.error.URLError('connection reset')):
+            self.http.failure = failure
+            papers = self.papers(2)
+            self.assertEqual(quietly(self.enricher.enrich, papers), 0)
+            self.assertEqual(self.cache.get(['doi:10.5555/0', 'doi:10.5555/1']), {})
+
+        self.http.failure = None
+        self.http.urls = []
+        self.assertEqual(self.enricher.enrich(self.papers(2)), 2)
+        self.assertEqual(len(self.http.urls), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,218 @@
+"""
+The fetch layer: the concurrent engine, the response cache, the HTTP client's retries and the pooled transport.
+"""
+
+import email.utils
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+import urllib.error
+from unittest import mock
+
+from support import quietly
+
+from litfetch import CacheMissError, FetchEngine, HttpClient, ResponseCache, Transport
+from mock_server import MockServer
+
+class FetchEngineTest(unittest.TestCase):
+    def test_limits_and_failures(self):
+        lock = threading.Lock()
+        running = {}
+        peak = {}
+
+        def job(host, fail=False):
+            def run():
+                with lock:
+                    for key in (host, 'all'):
+                        running[key] = running.get(key, 0)+1
+                        peak[key] = max(peak.get(key, 0), running[key])
+                time.sleep(0.05)
+                with lock:
+                    for key in (host, 'all'):
+                        running[key] -= 1
+                if fail:
+                    raise ValueError('no results')
+            return run
+
+        jobs = [('ACM', 'crossref', job('crossref')), ('IEEE', 'crossref', job('crossref')), ('Wiley', 'crossref', job('crossref')),
+                ('arXiv', 'arxiv', job('arxiv')), ('Zenodo', 'zenodo', job('zenodo', True)), ('PubMed', 'ncbi', job('ncbi'))]
+        errors = quietly(FetchEngine(maxConcurrency=3, maxPerHost=1).run, jobs)
+        self.assertEqual(peak['crossref'], 1)
+        self.assertLessEqual(peak['all'], 3)
+        self.assertGreater(peak['all'], 1)
+        self.assertIsInstance(errors['Zenodo'], ValueError)
+        self.assertEqual([name for (name, error) in errors.items() if error is None], ['ACM', 'IEEE', 'Wiley', 'arXiv', 'PubMed'])
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(self.directory.name)
+        self.loads = []
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def loader(self, body):
+        def load():
+            self.loads.append(body)
+            return body
+        return load
+
+    def age(self, url, seconds, params=None):
+        # Rewrite the stored time of an entry as if it was fetched seconds ago
+        path = self.cache.path(self.cache.key(url, params))
+        (stored, body) = self.cache.read(path)
+        key = self.cache.key(url, params)
+        with gzip.open(path, 'wb') as f:
+            f.write(json.dumps({'url': key, 'stored': stored-seconds}).encode('utf-8')+b'\n')
+            f.write(body)
+
+    def test_hit_within_time_to_live(self):
+        url = 'https://api.crossref.org/works?rows=2&query=smart'
+        self.assertEqual(self.cache.fetch(url, self.loader(b'first')), b'first')
+        self.assertEqual(self.cache.fetch('HTTPS://API.crossref.org/works?query=smart&rows=2', self.loader(b'second')), b'first')
+        self.assertEqual(self.loads, [b'first'])
+
+    def test_time_to_live_by_host(self):
+        # Six hours for NCBI, a week for Crossref
+        pubmed = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi?term=smart'
+        crossref = 'https://api.crossref.org/works?query=smart'
+        for url in (pubmed, crossref):
+            self.cache.fetch(url, self.loader(b'old'))
+            self.age(url, 7*3600)
+        self.assertEqual(self.cache.fetch(pubmed, self.loader(b'new')), b'new')
+        self.assertEqual(self.cache.fetch(crossref, self.loader(b'new')), b'old')
+        self.assertEqual(self.cache.fetch(crossref, self.loader(b'live'), maxAge=0), b'live')
+
+    def test_credentials_left_out_of_the_key(self):
+        self.cache.fetch('https://api.elsevier.com/content/search/sciencedirect?query=smart', self.loader(b'body'), params={'apiKey': 'one'})
+        self.assertEqual(self.cache.fetch('https://api.elsevier.com/content/search/sciencedirect?query=smart&apiKey=two', self.loader(b'other')), b'body')
+        self.assertNotIn('one', self.cache.key('https://api.springer.com/meta/v2/json?q=smart&api_key=one'))
+
+    def test_offline_uses_expired_entries_and_raises_on_a_miss(self):
+        url = 'https://zenodo.org/api/records?q=smart'
+        self.cache.fetch(url, self.loader(b'old'))
+        self.age(url, 30*86400)
+        offline = ResponseCache(self.directory.name, offline=True)
+        self.assertEqual(offline.fetch(url, self.loader(b'new')), b'old')
+        with self.assertRaises(CacheMissError):
+            offline.fetch('https://zenodo.org/api/records?q=home', self.loader(b'new'))
+        self.assertEqual(self.loads, [b'old'])
+
+    def test_least_recently_used_evicted(self):
+        urls = ['https://zenodo.org/api/records?page='+str(page) for page in range(4)]
+        bodies = [os.urandom(4000) for url in urls]
+        cache = ResponseCache(self.directory.name, maxSize=14000)
+        for (index, (url, body)) in enumerate(zip(urls[:3], bodies)):
+            cache.fetch(url, self.loader(body))
+            os.utime(cache.path(cache.key(url)), (1000+index, 1000+index))
+        # Reading the oldest entry makes it the most recently used
+        cache.fetch(urls[0], self.loader(b'unused'))
+        cache.fetch(urls[3], self.loader(bodies[3]))
+        kept = [url for url in urls if os.path.exists(cache.path(cache.key(url)))]
+        self.assertEqual(kept, [urls[0], urls[2], urls[3]])
+        self.assertLessEqual(cache.size, 14000*0.9)
+
+class ScriptedTransport():
+    # Answers each request with the next (status, headers) in responses, a status of None drops the connection
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.urls = []
+
+    def get(self, url, headers=None):
+        self.urls.append(url)
+        (status, responseHeaders) = self.responses.pop(0)
+        if status is None:
+            raise urllib.error.URLError('connection reset')
+        return (status, 'OK' if status < 400 else 'Error', responseHeaders, b'body' if status < 400 else b'')
+
+class Limiter():
+    # Records the pauses asked for instead of waiting
+    def __init__(self):
+        self.pauses = []
+
+    def acquire(self, host):
+        pass
+
+    def pause(self, host, seconds):
+        self.pauses.append((host, round(seconds)))
+
+class HttpClientRetryTest(unittest.TestCase):
+    url = 'https://api.crossref.org/works?query=smart'
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.limiter = Limiter()
+        self.sleeps = []
+        patcher = mock.patch('time.sleep', self.sleeps.append)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def client(self, responses, maxRetries=3):
+        self.transport = ScriptedTransport(responses)
+        return HttpClient(ResponseCache(self.directory.name), self.limiter, maxRetries=maxRetries, backoff=0, transport=self.transport)
+
+    def test_server_errors_retried(self):
+        client = self.client([(503, {}), (None, {}), (200, {})])
+        self.assertEqual(quietly(client.get, self.url), b'body')
+        self.assertEqual(len(self.transport.urls), 3)
+        self.assertEqual(client.metrics.hosts['api.crossref.org']['retries'], 2)
+
+    def test_retry_after_seconds_and_date(self):
+        date = email.utils.formatdate(time.time()+120, usegmt=True)
+        client = self.client([(429, {'Retry-After': '30'}), (503, {'Retry-After': date}), (200, {})])
+        self.assertEqual(quietly(client.get, self.url), b'body')
+        self.assertEqual(self.sleeps[0], 30)
+        self.assertGreater(self.sleeps[1], 100)
+        self.assertEqual([host for (host, seconds) in self.limiter.pauses], ['api.crossref.org']*2)
+        self.assertEqual(self.limiter.pauses[0][1], 30)
+
+    def test_retries_used_up(self):
+        client = self.client([(503, {})]*3, maxRetries=2)
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            quietly(client.get, self.url)
+        self.assertEqual(raised.exception.code, 503)
+        self.assertEqual(len(self.transport.urls), 3)
+
+    def test_client_errors_not_retried(self):
+        client = self.client([(404, {}), (200, {})])
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            quietly(client.get, self.url)
+        self.assertEqual(raised.exception.code, 404)
+        self.assertEqual((len(self.transport.urls), self.sleeps), (1, []))
+
+class TransportProxyTest(unittest.TestCase):
+    environment = {'HTTP_PROXY': 'http://proxy.invalid:3128', 'HTTPS_PROXY': 'http://proxy.invalid:3128', 'NO_PROXY': '127.0.0.1,.intranet'}
+
+    def setUp(self):
+        self.transport = Transport(connectTimeout=2, readTimeout=5)
+
+    def tearDown(self):
+        self.transport.close()
+
+    def test_no_proxy_hosts_are_reached_directly(self):
+        with mock.patch.dict(os.environ, self.environment):
+            self.transport.getSession()
+            self.assertEqual(self.transport.proxiesFor('http://127.0.0.1:8765/https/api.crossref.org/works'), {})
+            self.assertEqual(self.transport.proxiesFor('http://wiki.intranet/page'), {})
+            self.assertEqual(self.transport.proxiesFor('https://api.crossref.org/works'), {'http': 'http://proxy.invalid:3128', 'https': 'http://proxy.invalid:3128'})
+
+    def test_replay_server_is_not_proxied(self):
+        server = MockServer(total=10).start()
+        try:
+            with mock.patch.dict(os.environ, self.environment):
+                (status, reason, headers, body) = self.transport.get(server.url+'/https/zenodo.org/api/records?q=smart&size=2')
+        finally:
+            server.stop()
+        self.assertEqual(status, 200)
+        self.assertIn(b'"hits"', body)
+
+if __name__ == '__main__':
+    unittest.main()
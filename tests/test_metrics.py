@@ -0,0 +1,62 @@
+"""
+Run metrics: request counters, cache hits, stage timings and the Prometheus output.
+"""
+
+import os
+import tempfile
+import unittest
+
+from support import MockTransport, makeLitfetch, quietly
+
+from litfetch import Metrics
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def search(self, output, transport):
+        # Searches Zenodo with a cache shared by every run, returns the metrics summary
+        lf = makeLitfetch(os.path.join(self.directory.name, output), transport, cacheDir=os.path.join(self.directory.name, 'cache'))
+        quietly(lf.runConnector, 'zenodo')
+        return lf.metrics
+
+    def test_network_and_cache_counted(self):
+        transport = MockTransport()
+        summary = self.search('first', transport).summary()
+        host = summary['hosts']['zenodo.org']
+        self.assertEqual((host['requests'], host['errors'], host['cached']), (len(transport.urls), 0, 0))
+        self.assertEqual(host['statuses'], {'200': len(transport.urls)})
+        source = summary['sources']['zenodo']
+        self.assertEqual(source['records']['parsed'], 20)
+        self.assertIn('fetch', source['stages'])
+        self.assertGreater(source['recordsPerSecond'], 0)
+
+        again = MockTransport()
+        host = self.search('second', again).summary()['hosts']['zenodo.org']
+        self.assertEqual(again.urls, [])
+        self.assertEqual((host['requests'], host['cached']), (0, len(transport.urls)))
+        self.assertGreater(host['cachedBytes'], 0)
+
+    def test_failed_attempts_and_retries(self):
+        metrics = Metrics()
+        metrics.request('api.crossref.org', 503, 0.5, 0)
+        metrics.retry('api.crossref.org')
+        metrics.request('api.crossref.org', 'error', 2.0, 0)
+        metrics.retry('api.crossref.org')
+        metrics.request('api.crossref.org', 200, 0.25, 1000)
+        metrics.response('api.crossref.org', 1000)
+        host = metrics.summary()['hosts']['api.crossref.org']
+        self.assertEqual((host['requests'], host['errors'], host['retries'], host['cached'], host['maxSeconds']), (3, 2, 2, 0, 2.0))
+        self.assertEqual(host['meanSeconds'], 2.75/3)
+
+        prometheus = metrics.prometheus()
+        self.assertIn('litfetch_http_requests_total{host="api.crossref.org",status="503"} 1.0\n', prometheus)
+        self.assertIn('litfetch_http_requests_total{host="api.crossref.org",status="error"} 1.0\n', prometheus)
+        self.assertIn('litfetch_http_retries_total{host="api.crossref.org"} 2.0\n', prometheus)
+        self.assertIn('# TYPE litfetch_http_request_seconds summary\n', prometheus)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+"""
+The package: every exported name resolves, and importing it loads nothing else.
+"""
+
+import importlib
+import subprocess
+import sys
+import unittest
+
+from support import root
+
+import litfetch
+
+class PackageTest(unittest.TestCase):
+    def test_exports_resolve(self):
+        for (module, names) in litfetch.exports.items():
+            for name in names:
+                with self.subTest(name):
+                    self.assertIs(getattr(litfetch, name), getattr(importlib.import_module('litfetch.'+module), name))
+        self.assertEqual([name for name in dir(litfetch) if name in litfetch.modules], litfetch.__all__)
+        with self.assertRaises(AttributeError):
+            litfetch.missing
+
+    def test_import_loads_no_submodules(self):
+        check = 'import sys, litfetch\nprint(",".join(sorted(name for name in sys.modules if name.startswith("litfetch.") or name in ("bs4", "lxml", "sqlite3", "requests"))))'
+        loaded = subprocess.run([sys.executable, '-c', check], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+        self.assertEqual(loaded, '')
+
+        check = 'import sys\nfrom litfetch import Deduplicator\nprint(",".join(sorted(name for name in sys.modules if name.startswith("litfetch."))))'
+        loaded = subprocess.run([sys.executable, '-c', check], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+        self.assertEqual(loaded, 'litfetch.dedup')
+
+if __name__ == '__main__':
+    unittest.main()
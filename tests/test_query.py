@@ -0,0 +1,86 @@
+"""
+The boolean search string (parsing, the per-database dialects and widened queries) and the screening rules.
+"""
+
+import unittest
+
+# The package on sys.path
+import support
+
+from litfetch import Screener, SearchQuery
+
+class SearchQueryTest(unittest.TestCase):
+    def test_dialects(self):
+        query = SearchQuery('predict* "smart home" -survey')
+        self.assertEqual(query.emit('arxiv'), 'all:predict AND all:"smart home" ANDNOT all:survey')
+        self.assertEqual(query.emit('pubmed'), 'predict*[tiab] AND "smart home"[tiab] NOT survey[tiab]')
+        self.assertEqual(query.emit('elsevier'), 'predict* AND "smart home" AND NOT survey')
+        self.assertEqual(query.emit('scholar'), 'predict "smart home" -survey')
+        self.assertEqual(query.emit('keywords'), 'predict smart home')
+
+    def test_groups(self):
+        query = SearchQuery('(human OR person) AND (predict OR forecast) NOT (survey OR review)')
+        self.assertEqual(query.emit('springer'), '(human OR person) AND (predict OR forecast) NOT (survey OR review)')
+        self.assertEqual(query.emit('scholar'), '(human OR person) (predict OR forecast) -survey -review')
+        self.assertFalse(query.widened('springer'))
+        self.assertFalse(query.widened('scholar'))
+
+    def test_not_inside_or_broadens(self):
+        query = SearchQuery('prediction AND (home OR NOT survey)')
+        self.assertEqual(query.emit('arxiv'), 'all:prediction')
+        self.assertTrue(query.widened('arxiv'))
+        self.assertTrue(query.matches('Prediction at home'))
+        self.assertTrue(query.matches('Prediction in offices'))
+        self.assertFalse(query.matches('A survey of prediction'))
+
+    def test_everything_unsendable_falls_back_to_keywords(self):
+        query = SearchQuery('smart home OR NOT survey')
+        self.assertEqual(query.emit('pubmed'), 'smart[tiab] OR home[tiab]')
+        self.assertTrue(query.widened('pubmed'))
+        self.assertFalse(query.widened('keywords'))
+
+    def test_scholar_cannot_exclude_groups(self):
+        query = SearchQuery('activity NOT (survey AND review)')
+        self.assertEqual(query.emit('scholar'), 'activity')
+        self.assertTrue(query.widened('scholar'))
+        self.assertFalse(query.widened('zenodo'))
+
+    def test_only_exclusions_are_rejected(self):
+        for text in ('NOT survey', '-survey', 'NOT (survey OR review)'):
+            with self.assertRaises(ValueError):
+                SearchQuery(text)
+
+    def test_parse_errors(self):
+        for text in ('(smart home', 'smart home)', 'smart AND', 'smart OR OR home'):
+            with self.assertRaises(ValueError):
+                SearchQuery(text)
+
+class ScreenerTest(unittest.TestCase):
+    def test_plurals_in_ies(self):
+        for (term, text) in (('activity', 'Recognising daily activities'), ('activities', 'Daily activity recognition'),
+                             ('study', 'Two case studies'), ('technologies', 'An assistive technology')):
+            self.assertEqual(Screener([('IC1', [term])]).screen(text), '', term+' / '+text)
+
+    def test_stemming(self):
+        screener = Screener([('IC1', ['prediction', 'forecast*'])])
+        for text in ('We predict routines', 'Predictive models', 'Forecasting occupancy'):
+            self.assertEqual(screener.screen(text), '', text)
+        self.assertEqual(screener.screen('Recognising activities'), 'IC1')
+        # A y after a vowel stays, a survey is not surveillance
+        self.assertEqual(Screener(exclude=[('EC1', ['survey'])]).screen('Video surveillance at home'), '')
+
+    def test_overlapping_rules(self):
+        self.assertEqual(Screener([('IC1', ['smart home']), ('IC2', ['home'])]).screen('Activity prediction in the smart home'), '')
+        screener = Screener([('IC1', ['learning'])], [('EC1', ['deep learning'])])
+        self.assertEqual(screener.screen('Deep learning for behaviour prediction'), 'EC1')
+        self.assertEqual(screener.screen('Routine learning in homes'), '')
+        self.assertEqual(screener.screen('Rule mining in homes'), 'IC1')
+
+    def test_rules_from_config(self):
+        screener = Screener.fromConfig({'include.IC1': 'predict, forecast', 'exclude.EC1': 'survey, systematic review', 'searchLimit': '10'})
+        self.assertEqual(screener.screen('Forecasting behaviour'), '')
+        self.assertEqual(screener.screen('A systematic review of forecasting'), 'EC1')
+        self.assertEqual(Screener.fromConfig({}, [('IC1', ['predict'])]).screen('Nothing relevant'), 'IC1')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Incremental refreshes: the watermark each database is sent, and records appended only once.
+"""
+
+import os
+import tempfile
+import unittest
+import urllib.parse
+
+from support import makeLitfetch, quietly, readCsv
+
+class RefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def refresh(self, name, watermark, **config):
+        lf = makeLitfetch(self.directory.name, sdKey='key', springerKey='key', **config)
+        lf.incremental = True
+        if watermark:
+            lf.setWatermark(name, watermark)
+        quietly(lf.runConnector, name)
+        return (lf, [dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query)) for url in lf.http.transport.urls])
+
+    def test_sciencedirect_starts_at_the_watermark_year(self):
+        (lf, queries) = self.refresh('sciencedirect', '2012-03-01')
+        self.assertEqual(queries[0]['date'], '2012-2014')
+        years = {row[3][:4] for row in readCsv(os.path.join(self.directory.name, 'review-search-sciencedirect.csv'))[1:]}
+        self.assertEqual(years, {'2012', '2013', '2014'})
+
+    def test_springer_starts_at_the_watermark_year(self):
+        (lf, queries) = self.refresh('springer', '2013-06-30')
+        self.assertIn('(year:2013 OR year:2014)', queries[0]['q'])
+        self.assertNotIn('year:2012', queries[0]['q'])
+
+    def test_watermark_after_the_window_searches_nothing(self):
+        (lf, queries) = self.refresh('sciencedirect', '2020-01-01')
+        self.assertEqual(queries, [])
+        (lf, queries) = self.refresh('springer', '2020-01-01')
+        self.assertEqual(queries, [])
+
+    def test_first_run_searches_the_whole_window(self):
+        (lf, queries) = self.refresh('sciencedirect', None)
+        self.assertEqual(queries[0]['date'], '2005-2014')
+        self.assertEqual(lf.getWatermark('sciencedirect'), lf.runDate)
+
+    def test_crossref_from_index_date(self):
+        (lf, queries) = self.refresh('acm', '2024-05-01')
+        self.assertIn('from-index-date:2024-05-01', queries[0]['filter'])
+
+    def test_refresh_appends_new_records_once(self):
+        self.refresh('springer', None, searchLimit='5')
+        self.refresh('springer', '2005-01-01', searchLimit='8')
+        rows = readCsv(os.path.join(self.directory.name, 'review-search-springer.csv'))
+        self.assertEqual(len(rows)-1, 8)
+        self.assertEqual(len({row[1] for row in rows[1:]}), 8)
+
+if __name__ == '__main__':
+    unittest.main()
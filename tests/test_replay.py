@@ -0,0 +1,67 @@
+"""
+Recording responses as fixtures and replaying them from the mock server.
+"""
+
+import os
+import tempfile
+import unittest
+
+from support import MockTransport, makeLitfetch, quietly, readCsv
+
+from litfetch import FixtureStore, Transport
+from mock_server import MockServer
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.fixtures = os.path.join(self.directory.name, 'fixtures')
+        self.cacheDir = os.path.join(self.directory.name, 'cache')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def search(self, output, transport, **config):
+        # Searches Zenodo writing to output, returns the Litfetch and the rows written
+        directory = os.path.join(self.directory.name, output)
+        config = dict({'cacheDir': self.cacheDir, 'rate.zenodo.org': '1000'}, **config)
+        lf = makeLitfetch(directory, transport, **config)
+        quietly(lf.runConnector, 'zenodo')
+        return (lf, readCsv(os.path.join(directory, 'review-search-zenodo.csv'))[1:])
+
+    def test_recorded_run_replayed(self):
+        recording = MockTransport()
+        (recorded, rows) = self.search('recorded', recording, record=self.fixtures)
+        self.assertTrue(rows)
+        fixtures = FixtureStore(self.fixtures)
+        self.assertTrue(all(fixtures.lookup(url) for url in recording.urls))
+
+        # Only the fixtures are served, any other request is a 404
+        server = MockServer(fixtures=self.fixtures, synthetic=False).start()
+        transport = Transport()
+        try:
+            (replayed, replayedRows) = self.search('replayed', transport, replay=server.url, cacheDir=os.path.join(self.directory.name, 'replay-cache'))
+        finally:
+            transport.close()
+            server.stop()
+        stats = server.stats()
+        self.assertEqual((stats['requests'], stats['recorded'], stats['missing']), (len(recording.urls), len(recording.urls), 0))
+        self.assertEqual([row[1:] for row in replayedRows], [row[1:] for row in rows])
+
+    def test_replayed_responses_not_served_live(self):
+        server = MockServer(total=30).start()
+        transport = Transport()
+        try:
+            (replayed, rows) = self.search('replayed', transport, replay=server.url)
+        finally:
+            transport.close()
+            server.stop()
+        self.assertTrue(rows)
+
+        # The same cache, but a live run asks the database again
+        live = MockTransport(total=30)
+        (lf, liveRows) = self.search('live', live)
+        self.assertEqual(len(live.urls), server.stats()['requests'])
+        self.assertEqual(len(liveRows), len(rows))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+Citation snowballing against the mock Crossref and OpenCitations APIs: expansion, offline runs and resuming.
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from support import makeLitfetch
+
+from litfetch import SnowballStore, Snowballer
+
+class SnowballTest(unittest.TestCase):
+    seeds = ['10.5555/synthetic.1', '10.5555/synthetic.2']
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.storeFile = os.path.join(self.directory.name, 'snowball.sqlite')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def snowball(self, depth=1, resume=False, **config):
+        lf = makeLitfetch(self.directory.name, **config)
+        enricher = lf.getEnricher()
+        store = SnowballStore(self.storeFile, 'seeds', resume)
+        snowballer = Snowballer(enricher, store, workers=2)
+        with contextlib.redirect_stdout(io.StringIO()):
+            found = snowballer.run(self.seeds, depth)
+        papers = list(store.papers())
+        citations = store.citations()
+        store.close()
+        enricher.cache.close()
+        return (snowballer, found, papers, citations, lf.http.transport)
+
+    def test_expands_backward_and_forward(self):
+        (snowballer, found, papers, citations, transport) = self.snowball()
+        self.assertEqual(snowballer.failed, 0)
+        self.assertEqual(found, len(papers))
+        self.assertEqual({direction for (doi, depth, direction, via, metadata) in papers}, {'backward', 'forward'})
+        # Every paper reached has its metadata, and every edge touches a seed
+        self.assertTrue(all(metadata and metadata['doi'] == doi for (doi, depth, direction, via, metadata) in papers))
+        self.assertTrue(all(citing in self.seeds or cited in self.seeds for (citing, cited) in citations))
+        # One Crossref request expands both seeds
+        self.assertEqual(len([url for url in transport.requests('api.crossref.org') if 'filter=doi' in url]), 2)
+
+    def test_offline_misses_are_left_for_the_next_run(self):
+        (snowballer, found, papers, citations, transport) = self.snowball(offline='yes')
+        self.assertEqual(snowballer.failed, len(self.seeds))
+        self.assertEqual(papers, [])
+
+        (snowballer, found, papers, citations, transport) = self.snowball(resume=True)
+        self.assertEqual(snowballer.failed, 0)
+        self.assertTrue(papers)
+
+    def test_resume_goes_a_level_deeper(self):
+        (snowballer, found, first, citations, transport) = self.snowball(depth=1)
+        (snowballer, found, second, citations, transport) = self.snowball(depth=2, resume=True)
+        self.assertEqual(second[:len(first)], first)
+        self.assertTrue(any(depth == 2 for (doi, depth, direction, via, metadata) in second))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+Everything written to disk: the CSV writer, checkpoints and the SQLite corpus.
+"""
+
+import os
+import tempfile
+import unittest
+
+from support import readCsv
+
+from litfetch import Checkpoint, CorpusStore, Paper, ResultWriter
+
+class ResultWriterTest(unittest.TestCase):
+    header = ['title', 'doi']
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.fileName = os.path.join(self.directory.name, 'results.csv')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, rows, **options):
+        with ResultWriter(self.fileName, self.header, **options) as writer:
+            writer.writerows(rows)
+
+    def test_target_replaced_on_close(self):
+        self.write([['Old', '10.1/old']])
+        writer = ResultWriter(self.fileName, self.header, flushRows=1)
+        writer.writerow(['New', '10.1/new'])
+        self.assertEqual(readCsv(self.fileName), [self.header, ['Old', '10.1/old']])
+        writer.close()
+        self.assertEqual(readCsv(self.fileName), [self.header, ['New', '10.1/new']])
+        self.assertEqual(os.listdir(self.directory.name), ['results.csv'])
+
+    def test_failure_keeps_previous_results(self):
+        self.write([['Old', '10.1/old']])
+        with self.assertRaises(RuntimeError):
+            with ResultWriter(self.fileName, self.header, flushRows=1) as writer:
+                writer.writerow(['New', '10.1/new'])
+                raise RuntimeError('search failed')
+        self.assertEqual(readCsv(self.fileName), [self.header, ['Old', '10.1/old']])
+        self.assertEqual(os.listdir(self.directory.name), ['results.csv'])
+
+    def test_append_skips_known_keys(self):
+        self.write([['Old', '10.1/old']])
+        with ResultWriter(self.fileName, self.header, append=True, keyColumn=1) as writer:
+            self.assertFalse(writer.writerow(['Old again', '10.1/old']))
+            self.assertTrue(writer.writerow(['New', '10.1/new']))
+            self.assertFalse(writer.writerow(['New again', '10.1/new']))
+        self.assertEqual(readCsv(self.fileName), [self.header, ['Old', '10.1/old'], ['New', '10.1/new']])
+
+    def test_partial_resumed_from_checkpoint_size(self):
+        with self.assertRaises(RuntimeError):
+            with ResultWriter(self.fileName, self.header, partial=True, keyColumn=1) as writer:
+                writer.writerow(['First', '10.1/first'])
+                size = writer.sync()
+                writer.writerow(['After the checkpoint', '10.1/lost'])
+                raise RuntimeError('interrupted')
+        self.assertFalse(os.path.exists(self.fileName))
+        self.assertEqual(len(readCsv(self.fileName+'.partial')), 3)
+
+        with ResultWriter(self.fileName, self.header, partial=True, keyColumn=1, resumeSize=size) as writer:
+            self.assertFalse(writer.writerow(['First', '10.1/first']))
+            self.assertTrue(writer.writerow(['After the checkpoint', '10.1/lost']))
+        self.assertEqual(readCsv(self.fileName), [self.header, ['First', '10.1/first'], ['After the checkpoint', '10.1/lost']])
+        self.assertFalse(os.path.exists(self.fileName+'.partial'))
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.fileName = os.path.join(self.directory.name, 'review-search-arxiv.checkpoint')
+        self.checkpoint = Checkpoint(self.fileName, 'smart home|2005|2014')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_nothing_to_resume(self):
+        self.assertIsNone(self.checkpoint.load())
+        self.checkpoint.start()
+        self.assertIsNone(self.checkpoint.load())
+
+    def test_last_complete_page(self):
+        self.checkpoint.start()
+        self.checkpoint.save({'start': 2}, '2013-07-01', ['arxiv:1301.0001', 'arxiv:1205.0002'], [120, 40])
+        self.checkpoint.save({'start': 4}, '2013-07-01', ['arxiv:1001.0003'], [180, 40])
+        # The line being written when the run was killed
+        with open(self.fileName, 'a', encoding='utf-8') as f:
+            f.write('{"position": {"start": 6}, "ids": ["arxiv:')
+
+        state = self.checkpoint.load()
+        self.assertEqual((state['position'], state['watermark'], state['sizes']), ({'start': 4}, '2013-07-01', [180, 40]))
+        self.assertEqual(state['ids'], {'arxiv:1301.0001', 'arxiv:1205.0002', 'arxiv:1001.0003'})
+
+    def test_different_search_not_resumed(self):
+        self.checkpoint.start()
+        self.checkpoint.save({'start': 2}, None, ['arxiv:1301.0001'], [120, 40])
+        self.assertIsNone(Checkpoint(self.fileName, 'smart home|2005|2020').load())
+
+    def test_finished_source(self):
+        self.checkpoint.start()
+        self.checkpoint.save({'start': 2}, None, ['arxiv:1301.0001'], [120, 40])
+        self.checkpoint.finish()
+        self.assertEqual(self.checkpoint.load(), {'done': True})
+        self.assertIsNone(Checkpoint(self.fileName, 'activity recognition|2005|2014').load())
+        self.assertEqual(os.listdir(self.directory.name), ['review-search-arxiv.checkpoint'])
+
+class CorpusStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.corpus = CorpusStore(os.path.join(self.directory.name, 'corpus.db'), batchSize=2)
+
+    def tearDown(self):
+        self.corpus.close()
+        self.directory.cleanup()
+
+    def paper(self, title, source, abstract=''):
+        return Paper(title=title, authors='A Author', published='2013', database='Crossref', source=source, abstract=abstract)
+
+    def test_upsert_on_source_and_identifier(self):
+        self.corpus.add(self.paper('Activity recognition in smart homes', 'https://doi.org/10.5555/1'), 'crossref')
+        self.corpus.add(self.paper('Activity Recognition in Smart Homes', 'https://doi.org/10.5555/1', 'Updated abstract'), 'crossref')
+        self.corpus.add(self.paper('Activity recognition in smart homes', 'https://doi.org/10.5555/1'), 'arxiv')
+        self.corpus.add(self.paper('Wearable sensing', ''), 'crossref')
+        self.corpus.add(self.paper('Wearable  sensing!', ''), 'crossref')
+        self.assertEqual(self.corpus.count(), 3)
+
+        rows = self.corpus.db.execute('SELECT source, key, doi, title, abstract FROM papers ORDER BY source, key').fetchall()
+        self.assertEqual(rows, [('arxiv', 'doi:10.5555/1', '10.5555/1', 'Activity recognition in smart homes', ''),
+                                ('crossref', 'doi:10.5555/1', '10.5555/1', 'Activity Recognition in Smart Homes', 'Updated abstract'),
+                                ('crossref', 'title:wearable sensing', '', 'Wearable  sensing!', '')])
+
+    def test_find_follows_updates(self):
+        self.corpus.add(self.paper('Activity recognition in smart homes', 'https://doi.org/10.5555/1', 'Accelerometer data'), 'crossref')
+        self.corpus.add(self.paper('Wearable sensing', 'https://doi.org/10.5555/2', 'A survey of wearable devices'), 'crossref')
+        self.assertEqual([row[0] for row in self.corpus.find('wearable')], ['Wearable sensing'])
+        self.assertEqual(self.corpus.find('accelerometer AND activity')[0][4], 'https://doi.org/10.5555/1')
+
+        self.corpus.add(self.paper('Activity recognition in smart homes', 'https://doi.org/10.5555/1', 'Wearable sensors'), 'crossref')
+        self.assertEqual(len(self.corpus.find('wearable')), 2)
+        self.assertEqual(self.corpus.find('accelerometer AND activity'), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Streaming the grey literature search straight into de-duplication through the bounded queue.
+"""
+
+import os
+import tempfile
+import unittest
+
+from support import makeLitfetch, quietly, readCsv
+
+from litfetch.dedup import normaliseTitle
+
+class StreamTest(unittest.TestCase):
+    sources = ('researchgate', 'arxiv', 'zenodo')
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def output(self, fileName):
+        return os.path.join(self.directory.name, fileName)
+
+    def written(self):
+        # Rows written by each grey source
+        return {name: readCsv(self.output('review-search-'+name+'.csv'))[1:] for name in self.sources}
+
+    def test_unique_papers_yielded(self):
+        lf = makeLitfetch(self.directory.name, streamQueue='5')
+        merges = []
+        idle = []
+        papers = quietly(lambda: list(lf.streamPapers(True, merges.append, onIdle=lambda: idle.append(1))))
+        written = self.written()
+        self.assertEqual(len(papers)+len(merges), sum(len(rows) for rows in written.values()))
+        self.assertTrue(merges)
+        self.assertTrue(idle)
+        titles = [normaliseTitle(paper.title) for paper in papers]
+        self.assertEqual(len(titles), len(set(titles)))
+
+    def test_closed_early_lets_the_sources_finish(self):
+        lf = makeLitfetch(self.directory.name, streamQueue='1')
+        stream = lf.streamPapers(True)
+        quietly(lambda: [next(stream) for i in range(3)])
+        quietly(stream.close)
+        self.assertTrue(all(len(rows) == 20 for rows in self.written().values()))
+
+    def test_deduplicated_csv(self):
+        lf = makeLitfetch(self.directory.name)
+        errors = quietly(lf.runAction, 'stream-grey')
+        self.assertEqual(errors, {'ResearchGate': None, 'arXiv': None, 'Zenodo': None})
+        deduped = readCsv(self.output('review-search-deduped-grey.csv'))
+        merges = readCsv(self.output('review-search-merges-grey.csv'))
+        self.assertEqual(deduped[0], lf.greyHeader)
+        self.assertEqual(len(deduped)+len(merges)-2, sum(len(rows) for rows in self.written().values()))
+        self.assertFalse(os.path.exists(self.output('review-search-deduped-grey.csv.partial')))
+
+if __name__ == '__main__':
+    unittest.main()